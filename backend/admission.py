@@ -0,0 +1,210 @@
+"""
+Admission control for TropoScan predictions
+Every prediction passes through here before it runs. Each client (a configured
+API key, else its address) has a token bucket per priority, so one client cannot flood a lane;
+exempt clients (e.g. an ingest or batch host) skip the buckets.
+Admitted requests then wait for one of a few inference slots. Waiters are
+served strictly by priority (operational > case study > demo), and one slot
+is reserved for operational traffic. A request whose deadline cannot be met,
+judged from the queue ahead of it and the recent service time, is shed at
+once with a Retry-After hint instead of waiting to time out.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+PRIORITIES = ("operational", "case_study", "demo")
+
+DEFAULT_RATES = {"operational": 2.0, "case_study": 0.2, "demo": 0.5}  # requests/second per client
+DEFAULT_BURSTS = {"operational": 10, "case_study": 3, "demo": 5}
+DEFAULT_DEADLINES = {"operational": 30.0, "case_study": 10.0, "demo": 5.0}  # seconds waiting for a slot
+
+# Queue waits kept per priority for the percentiles in describe()
+WAIT_SAMPLES = 1000
+
+
+def parse_priority_settings(spec, defaults, kind=float):
+    """'operational=5,demo=0.5' -> per-priority values over the defaults"""
+    settings = dict(defaults)
+    for item in filter(None, (spec or "").split(",")):
+        name, value = item.split("=")
+        if name not in settings:
+            raise ValueError(f"Unknown priority '{name}', expected one of {list(PRIORITIES)}")
+        settings[name] = kind(value)
+    return settings
+
+
+def client_identity(address, api_key=None, api_keys=()):
+    """Rate-limit identity of a request: a configured API key, else the connection's address.
+
+    Keys not in api_keys are ignored, so a made-up X-API-Key header can neither
+    pass for an exempt client nor start a fresh bucket.
+    """
+    if api_key and api_key in api_keys:
+        return ("key", api_key)
+    return ("address", address)
+
+
+def exempt_identities(entries, api_keys=()):
+    """Identities exempted by a list of addresses and configured API keys"""
+    return ({("address", entry) for entry in entries} |
+            {("key", entry) for entry in entries if entry in api_keys})
+
+
+class AdmissionRejected(Exception):
+    """A prediction refused before it ran; status is 429 (rate limit) or 503 (shed)"""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most burst; a rate of 0 never limits"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = now
+
+    def take(self, now):
+        """Spend one token; returns 0, or the seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Per-client rate limits, priority-ordered inference slots and deadline-aware shedding"""
+
+    def __init__(self, slots=2, reserved=1, rates=None, bursts=None, deadlines=None, max_clients=10000,
+                 exempt=(), clock=time.monotonic):
+        self.slots = max(1, slots)
+        # Slots only operational requests may take; at least one slot stays open to the rest
+        self.reserved = min(max(0, reserved), self.slots - 1)
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self.bursts = {**DEFAULT_BURSTS, **(bursts or {})}
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self.max_clients = max_clients
+        self.exempt = frozenset(exempt)  # client identities (see exempt_identities) without rate limits
+        self.clock = clock
+        self.active = 0
+        self.mean_seconds = 0.0
+        self._buckets = OrderedDict()  # (client, priority) -> TokenBucket, least recently used first
+        self._queue = []  # heap of (rank, seq)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self.stats = {p: {"admitted": 0, "rate_limited": 0, "shed": 0, "waits": deque(maxlen=WAIT_SAMPLES)}
+                      for p in PRIORITIES}
+
+    def _limit(self, rank):
+        return self.slots if rank == 0 else self.slots - self.reserved
+
+    def _rate_limit(self, client, priority, now):
+        if client in self.exempt:
+            return 0.0
+        key = (client, priority)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rates[priority], self.bursts[priority], now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+    def estimated_wait(self, rank):
+        """Seconds until a new request of this rank would get a slot, from the queue ahead of it"""
+        ahead = sum(1 for queued_rank, _ in self._queue if queued_rank <= rank)
+        backlog = ahead + max(0, self.active - self._limit(rank) + 1)
+        return self.mean_seconds * backlog / self._limit(rank)
+
+    @contextmanager
+    def admit(self, client, priority, deadline=None):
+        """Hold an inference slot for the body of the with-block, or raise AdmissionRejected.
+
+        deadline (seconds) can only shorten the priority's own deadline.
+        """
+        rank = PRIORITIES.index(priority)
+        stats = self.stats[priority]
+        deadline = min(self.deadlines[priority], deadline) if deadline is not None else self.deadlines[priority]
+        arrived = self.clock()
+        with self._condition:
+            retry_after = self._rate_limit(client, priority, arrived)
+            if retry_after:
+                stats["rate_limited"] += 1
+                raise AdmissionRejected(f"Rate limit for {priority} requests exceeded", 429, retry_after)
+            estimate = self.estimated_wait(rank)
+            if estimate > deadline:
+                stats["shed"] += 1
+                raise AdmissionRejected("Server busy, retry later", 503, estimate)
+            entry = (rank, next(self._sequence))
+            heapq.heappush(self._queue, entry)
+            try:
+                while not (self._queue[0] == entry and self.active < self._limit(rank)):
+                    remaining = arrived + deadline - self.clock()
+                    if remaining <= 0:
+                        stats["shed"] += 1
+                        raise AdmissionRejected("Server busy, retry later", 503, self.estimated_wait(rank))
+                    self._condition.wait(remaining)
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._queue)
+            self.active += 1
+            stats["admitted"] += 1
+            started = self.clock()
+            stats["waits"].append(started - arrived)
+            # The next waiter may be able to start too (e.g. it is operational and a slot is reserved)
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                # Moving average of service time, for the wait estimates
+                self.mean_seconds += (self.clock() - started - self.mean_seconds) * 0.1
+                self._condition.notify_all()
+
+    def describe(self):
+        with self._condition:
+            priorities = {}
+            for rank, priority in enumerate(PRIORITIES):
+                stats = self.stats[priority]
+                waits = sorted(stats["waits"])
+                priorities[priority] = {
+                    "rate_per_second": self.rates[priority],
+                    "burst": self.bursts[priority],
+                    "deadline_seconds": self.deadlines[priority],
+                    "queued": sum(1 for queued_rank, _ in self._queue if queued_rank == rank),
+                    "admitted": stats["admitted"],
+                    "rate_limited": stats["rate_limited"],
+                    "shed": stats["shed"],
+                    "wait_p50_seconds": round(waits[len(waits) // 2], 4) if waits else None,
+                    "wait_p99_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.99))], 4) if waits else None,
+                }
+            return {
+                "slots": self.slots,
+                "reserved_for_operational": self.reserved,
+                "active": self.active,
+                "mean_service_seconds": round(self.mean_seconds, 4),
+                "tracked_clients": len(self._buckets),
+                "exempt_clients": len(self.exempt),
+                "priorities": priorities,
+            }
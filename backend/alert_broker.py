@@ -0,0 +1,178 @@
+"""
+Server-Sent Events fan-out of TropoScan risk alerts
+Publishing never blocks on subscribers: every client has a small bounded
+queue, a client that falls behind is disconnected, and it catches up on
+reconnect by replaying from its Last-Event-ID
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+
+def format_sse(event_id, event, data):
+    """One SSE frame; data is already-serialised JSON"""
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class AlertEvent:
+    """A published alert, serialised once and shared by every subscriber"""
+
+    __slots__ = ("event_id", "payload", "frame")
+
+    def __init__(self, event_id, payload):
+        self.event_id = event_id
+        self.payload = payload
+        self.frame = format_sse(event_id, "alert", json.dumps(payload, default=float, separators=(",", ":")))
+
+
+class Subscriber:
+    """One connected client: a bounded queue of frames plus a wakeup flag"""
+
+    def __init__(self, max_queue):
+        self.max_queue = max_queue
+        self.queue = deque()
+        self.closed = False
+        self.close_reason = None
+        self.on_wakeup = None  # extra callback for async waiters (see AlertBroker.stream_async)
+        self._wakeup = threading.Event()
+
+    def offer(self, frame):
+        # Called with the broker lock held; never blocks
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_queue:
+            self.close("slow consumer")
+            return False
+        self.queue.append(frame)
+        self._wake()
+        return True
+
+    def close(self, reason=None):
+        self.closed = True
+        self.close_reason = reason
+        self._wake()
+
+    def _wake(self):
+        self._wakeup.set()
+        if self.on_wakeup is not None:
+            self.on_wakeup()
+
+    def drain(self, timeout):
+        """All queued frames, waiting up to timeout for the first; [] on timeout"""
+        if not self.queue and not self.closed:
+            self._wakeup.wait(timeout)
+        self._wakeup.clear()
+        frames = []
+        while self.queue:
+            frames.append(self.queue.popleft())
+        return frames
+
+
+class AlertBroker:
+    """Publishes alerts to SSE subscribers with bounded per-client queues and replay"""
+
+    def __init__(self, history_size=1000, max_queue=64):
+        self.max_queue = max_queue
+        self.history = deque(maxlen=history_size)
+        self.subscribers = set()
+        self.published = 0
+        self.dropped_slow = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def publish(self, payload):
+        """Record an alert and hand it to every subscriber; O(subscribers) appends, no waiting"""
+        with self._lock:
+            event = AlertEvent(self._next_id, payload)
+            self._next_id += 1
+            self.history.append(event)
+            self.published += 1
+            for subscriber in list(self.subscribers):
+                if not subscriber.offer(event.frame):
+                    self.subscribers.discard(subscriber)
+                    self.dropped_slow += 1
+        return event.event_id
+
+    def subscribe(self, last_event_id=None):
+        """Register a client, queueing any events it missed since last_event_id.
+
+        If the gap is older than the history (or larger than a client queue),
+        a "reset" frame tells the client to reload state over the REST API
+        instead of trusting the stream to be complete.
+        """
+        subscriber = Subscriber(self.max_queue)
+        with self._lock:
+            if last_event_id is not None:
+                missed = [e for e in self.history if e.event_id > last_event_id]
+                oldest = self.history[0].event_id if self.history else self._next_id
+                if last_event_id < oldest - 1 or len(missed) > self.max_queue:
+                    subscriber.queue.append(format_sse(self._next_id - 1, "reset", json.dumps(
+                        {"reason": "missed events no longer available"})))
+                    missed = missed[-(self.max_queue - 1):] if self.max_queue > 1 else []
+                subscriber.queue.extend(e.frame for e in missed)
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+        subscriber.close()
+
+    def stream(self, subscriber, heartbeat_seconds=15.0, retry_ms=3000):
+        """Generator of SSE text for one subscriber; ends when the client is dropped"""
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            while True:
+                yield from self._chunks(subscriber, subscriber.drain(heartbeat_seconds))
+                if subscriber.closed:
+                    return
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def stream_async(self, subscriber, heartbeat_seconds=15.0, retry_ms=3000):
+        """Async generator variant of stream(); waits on the event loop instead of holding a thread"""
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        subscriber.on_wakeup = lambda: loop.call_soon_threadsafe(wakeup.set)
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            while True:
+                if not subscriber.queue and not subscriber.closed:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), heartbeat_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                wakeup.clear()
+                for chunk in self._chunks(subscriber, subscriber.drain(0)):
+                    yield chunk
+                if subscriber.closed:
+                    return
+        finally:
+            subscriber.on_wakeup = None
+            self.unsubscribe(subscriber)
+
+    @staticmethod
+    def _chunks(subscriber, frames):
+        if frames:
+            yield "".join(frames)
+        elif not subscriber.closed:
+            yield f": keepalive {int(time.time())}\n\n"
+        if subscriber.closed and subscriber.close_reason:
+            # Tell the client why; EventSource reconnects with its Last-Event-ID
+            yield f"event: dropped\ndata: {json.dumps({'reason': subscriber.close_reason})}\n\n"
+
+    def recent(self, limit=50):
+        with self._lock:
+            return [{"id": e.event_id, **e.payload} for e in list(self.history)[-limit:]]
+
+    def describe(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped_slow_consumers": self.dropped_slow,
+            "history": len(self.history),
+            "max_queue": self.max_queue,
+        }
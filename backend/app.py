@@ -6,7 +6,13 @@ Combines frontend requirements with mainbackend real AI model functionality
 
 import os
 import sys
-from flask import Flask, request, jsonify, send_file
+import threading
+import time
+import importlib.util
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import numpy as np
 from PIL import Image
@@ -14,49 +20,233 @@ import io
 import base64
 import json
 from datetime import datetime, timedelta
-try:
-    from scipy.ndimage import sobel
-    SCIPY_AVAILABLE = True
-except ImportError:
-    SCIPY_AVAILABLE = False
+from model_registry import ModelRegistry
+from result_store import ResultStore, StoredResult, content_digest
+from alert_broker import AlertBroker
+from ingest_pipeline import build_troposcan_pipeline, parse_stage_workers
+from request_profiler import RequestProfiler, ProfilingMiddleware
+from upload_guard import GuardedRequest, UploadRejected, read_upload
+from admission import (AdmissionController, AdmissionRejected, DEFAULT_BURSTS, DEFAULT_DEADLINES, DEFAULT_RATES,
+                       client_identity, exempt_identities, parse_priority_settings)
+
+# Heavy modules (torch, torchvision, scipy) are imported lazily so the server
+# can answer liveness probes immediately while the model loads in the background
+SCIPY_AVAILABLE = importlib.util.find_spec("scipy") is not None
 
 
 # Add mainbackend to path for utils imports
 mainbackend_path = os.path.join(os.path.dirname(__file__), '..', 'mainbackend')
 sys.path.append(mainbackend_path)
 
-try:
-    from utils.predict_mask import load_model, predict_mask
-    from utils.generate_overlay import create_overlay
-    from utils.risk_score import calculate_risk
-    REAL_MODEL_AVAILABLE = True
-    print("✅ Real AI model utilities loaded successfully")
-except ImportError as e:
-    print(f"⚠️ Could not load real model utilities: {e}")
+from utils.probability_map import (ENCODERS as PROBABILITY_ENCODERS, DECODERS as PROBABILITY_DECODERS,
+                                   quantize_probabilities, threshold_probabilities)
+from utils.risk_score import calculate_risk_from_array, RISK_LEVELS
+from utils.image_decode import DecodedImage
+from utils.overlay_renderer import COLORMAPS
+from utils.ensemble_forecast import ensemble_forecast
+from utils.perceptual_hash import MultiIndexHash, dct_hash
+from tile_server import TileCache, TileServer
+
+# How worker processes get model weights:
+#   eager - every process torch.load()s its own private copy (default)
+#   mmap  - weights are converted once to a flat .safetensors file and mapped
+#           copy-on-write, so all workers share the same physical pages
+WEIGHTS_MODE = os.environ.get("TROPOSCAN_WEIGHTS_MODE", "eager").lower()
+
+# Load the model synchronously at import instead of in a background thread
+# (required with `gunicorn --preload`, since threads do not survive fork)
+EAGER_LOAD = os.environ.get("TROPOSCAN_EAGER_LOAD", "0") == "1"
+
+# How long a prediction request waits for the background model load to finish
+READY_TIMEOUT_SECONDS = float(os.environ.get("TROPOSCAN_READY_TIMEOUT", "60"))
+
+# Directory holding model weights; registry paths are resolved inside it
+MODEL_DIR = os.path.join(mainbackend_path, "model")
+DEFAULT_MODEL_NAME = "unet_insat"
+DEFAULT_MODEL_VERSION = "v1"
+
+# Number of recent probability maps kept for re-thresholding without inference
+RESULT_CACHE_SIZE = int(os.environ.get("TROPOSCAN_RESULT_CACHE_SIZE", "256"))
+
+# Map tile caches: in-memory and on-disk LRU budgets, and the directory ("" disables the disk cache)
+TILE_MEMORY_CACHE_MB = int(os.environ.get("TROPOSCAN_TILE_MEMORY_MB", "64"))
+TILE_DISK_CACHE_MB = int(os.environ.get("TROPOSCAN_TILE_DISK_MB", "512"))
+TILE_CACHE_DIR = os.environ.get("TROPOSCAN_TILE_CACHE_DIR",
+                                os.path.join(tempfile.gettempdir(), "troposcan_tiles"))
+
+# Activation memory budget for one forward pass; larger batches are split to fit
+INFERENCE_MEMORY_MB = int(os.environ.get("TROPOSCAN_INFERENCE_MEMORY_MB", "512"))
+# Forward passes allowed to run at once; each gets an equal share of the memory budget
+INFERENCE_CONCURRENCY = int(os.environ.get("TROPOSCAN_INFERENCE_CONCURRENCY", "2"))
+
+# Alert push channel: lowest risk level published, per-client queue and replay history sizes
+ALERT_MIN_RISK = os.environ.get("TROPOSCAN_ALERT_MIN_RISK", "HIGH").upper()
+if ALERT_MIN_RISK not in RISK_LEVELS:
+    print(f"⚠️ TROPOSCAN_ALERT_MIN_RISK={ALERT_MIN_RISK!r} is not one of {', '.join(RISK_LEVELS)}; using HIGH")
+    ALERT_MIN_RISK = "HIGH"
+ALERT_QUEUE_SIZE = int(os.environ.get("TROPOSCAN_ALERT_QUEUE_SIZE", "64"))
+ALERT_HISTORY_SIZE = int(os.environ.get("TROPOSCAN_ALERT_HISTORY", "1000"))
+ALERT_HEARTBEAT_SECONDS = float(os.environ.get("TROPOSCAN_ALERT_HEARTBEAT", "15"))
+
+# Drop-folder ingest: set an inbox directory to run the pipeline inside the server
+INGEST_DIR = os.environ.get("TROPOSCAN_INGEST_DIR", "")
+INGEST_OUTBOX = os.environ.get("TROPOSCAN_INGEST_OUTBOX", "") or None
+INGEST_WORKERS = os.environ.get("TROPOSCAN_INGEST_WORKERS", "")  # e.g. "decode=2,assess=2"
+INGEST_QUEUE_SIZE = int(os.environ.get("TROPOSCAN_INGEST_QUEUE_SIZE", "8"))
+
+# Perturbed members per cluster in the ensemble track forecast
+FORECAST_MEMBERS = int(os.environ.get("TROPOSCAN_FORECAST_MEMBERS", "1000"))
+
+# Uploads larger than this are refused while they are being received
+MAX_UPLOAD_BYTES = int(float(os.environ.get("TROPOSCAN_MAX_UPLOAD_MB", "20")) * 1024 * 1024)
+# Images with more pixels are refused after reading only their header (decompression bombs)
+MAX_UPLOAD_PIXELS = int(os.environ.get("TROPOSCAN_MAX_UPLOAD_PIXELS", "50000000"))
+
+# Opt-in request profiling: set a directory to enable; requests are picked by the
+# X-TroposCan-Profile header (must equal the token if one is set) or sampled at a rate
+PROFILE_DIR = os.environ.get("TROPOSCAN_PROFILE_DIR", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("TROPOSCAN_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.environ.get("TROPOSCAN_PROFILE_MODE", "both").lower()  # cprofile, torch or both
+PROFILE_TOKEN = os.environ.get("TROPOSCAN_PROFILE_TOKEN", "") or None
+
+# Uploads whose perceptual hash is within this many bits (of 64) of a cached result reuse
+# its probability map instead of running inference. Off (negative) by default: with reuse an
+# output depends on which results happen to be cached, not only on the request; 4 is a good value
+NEAR_DUPLICATE_DISTANCE = int(os.environ.get("TROPOSCAN_NEAR_DUPLICATE_DISTANCE", "-1"))
+
+# Admission control in front of predict_image: concurrent inference slots (some reserved for
+# /api/detect), per-client token buckets and how long each priority may wait for a slot,
+# e.g. TROPOSCAN_ADMISSION_RATES="operational=2,case_study=0.2,demo=0.5" (requests/second, 0 = unlimited)
+ADMISSION_SLOTS = int(os.environ.get("TROPOSCAN_ADMISSION_SLOTS", "2"))
+ADMISSION_RESERVED = int(os.environ.get("TROPOSCAN_ADMISSION_RESERVED", "1"))
+ADMISSION_RATES = parse_priority_settings(os.environ.get("TROPOSCAN_ADMISSION_RATES"), DEFAULT_RATES)
+ADMISSION_BURSTS = parse_priority_settings(os.environ.get("TROPOSCAN_ADMISSION_BURSTS"), DEFAULT_BURSTS, int)
+ADMISSION_DEADLINES = parse_priority_settings(os.environ.get("TROPOSCAN_ADMISSION_DEADLINES"), DEFAULT_DEADLINES)
+# X-API-Key values that identify a client; any other key is ignored and the client's address is used
+ADMISSION_API_KEYS = frozenset(k.strip() for k in os.environ.get("TROPOSCAN_API_KEYS", "").split(",") if k.strip())
+# Addresses, or keys from TROPOSCAN_API_KEYS, never rate limited (they still queue for slots by
+# priority), e.g. a satellite feed or batch job: TROPOSCAN_ADMISSION_EXEMPT="feed-key,10.0.0.5"
+ADMISSION_EXEMPT = [c.strip() for c in os.environ.get("TROPOSCAN_ADMISSION_EXEMPT", "").split(",") if c.strip()]
+# Retry-After for predictions refused while the model is still loading
+NOT_READY_RETRY_SECONDS = 5
+
+# Deterministic analysis: random choices in the risk analysis are seeded from the image
+# content and times come from a reference clock, so identical inputs give identical responses
+DETERMINISTIC = os.environ.get("TROPOSCAN_DETERMINISTIC", "1") == "1"
+# Pin the reference clock (ISO time, e.g. for benchmarks); otherwise deterministic mode
+# rounds the current time down to this many seconds
+REFERENCE_TIME = os.environ.get("TROPOSCAN_REFERENCE_TIME", "")
+CLOCK_RESOLUTION_SECONDS = int(os.environ.get("TROPOSCAN_CLOCK_RESOLUTION", "3600"))
+
+# Per-call measurements left out of responses in deterministic mode (see /api/models for latency)
+VOLATILE_INFERENCE_KEYS = ("seconds", "process_peak_rss_bytes", "process_peak_rss_delta_bytes")
+
+# Bundled image used for the warmup inference before the server reports ready
+WARMUP_IMAGE_PATH = os.path.join(mainbackend_path, "data", "images", "33.jpg")
+
+REAL_MODEL_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("torch", "torchvision"))
+if REAL_MODEL_AVAILABLE:
+    print("✅ Real AI model utilities available (loaded in background)")
+else:
+    print("⚠️ Could not find torch/torchvision for the real model utilities")
     print("💡 Falling back to mock implementation")
-    REAL_MODEL_AVAILABLE = False
+
+
+def import_real_utilities():
+    """Import the torch-backed mainbackend utilities on first use"""
+    global load_model, predict_mask, predict_probabilities, InferenceEngine, predict_probabilities_tta, convert_checkpoint, render_overlay, calculate_risk, mask_to_geojson
+    from utils.predict_mask import load_model, predict_mask, predict_probabilities
+    from utils.inference_engine import InferenceEngine
+    from utils.tta import predict_probabilities_tta
+    from utils.weight_store import convert_checkpoint
+    from utils.generate_overlay import render_overlay
+    from utils.risk_score import calculate_risk
+    from utils.mask_contours import mask_to_geojson
 
 app = Flask(__name__)
+# Uploads are buffered in memory, bounded and format-checked as they stream in
+app.request_class = GuardedRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
 CORS(app)
 
 class TropoScanModel:
-    def __init__(self):
-        self.model = None
+    def __init__(self, background=True):
         self.model_loaded = False
-        self.model_path = os.path.join(mainbackend_path, "model", "unet_insat.pt")
+        self.model_path = os.path.join(MODEL_DIR, "unet_insat.pt")
+        self.state = "starting"
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._ready = threading.Event()
+        self.registry = ModelRegistry(loader=self._load_weights, warmup=self._warmup_model)
+        # Shadow comparisons run off the request path; at most one queued at a time
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._shadow_slots = threading.BoundedSemaphore(2)
+        self.results = ResultStore(RESULT_CACHE_SIZE, on_evict=self._forget_near_duplicate)
+        # Perceptual hashes of cached results; entries leave with their result
+        self.near_duplicates = MultiIndexHash()
+        self.near_duplicate_stats = {"hits": 0, "misses": 0}
+        self._near_duplicate_lock = threading.Lock()
+        self.inference = None  # InferenceEngine, created once torch is imported
+        self.alerts = AlertBroker(ALERT_HISTORY_SIZE, ALERT_QUEUE_SIZE)
+        self.admission = AdmissionController(ADMISSION_SLOTS, ADMISSION_RESERVED, ADMISSION_RATES, ADMISSION_BURSTS,
+                                             ADMISSION_DEADLINES,
+                                             exempt=exempt_identities(ADMISSION_EXEMPT, ADMISSION_API_KEYS))
         
+        if background:
+            threading.Thread(target=self.initialize, name="model-loader", daemon=True).start()
+        else:
+            self.initialize()
+    
+    @property
+    def ready(self):
+        return self._ready.is_set()
+    
+    @property
+    def model(self):
+        """The active model version's network (None when running the mock)"""
+        active = self.registry.active
+        return active.model if active else None
+    
+    def initialize(self):
+        """Load the model, pay the first-inference cost, then mark the model ready"""
+        self.state = "loading"
         if REAL_MODEL_AVAILABLE:
             self.load_real_model()
         else:
             self.setup_mock_model()
+        
+        self.state = "ready"
+        self._ready.set()
+        print(f"✅ Model ready (load {self.load_seconds}s, warmup {self.warmup_seconds}s)")
+    
+    def _warmup_model(self, model):
+        """Run one inference on a bundled image so real requests don't pay allocator warmup"""
+        try:
+            if os.path.exists(WARMUP_IMAGE_PATH):
+                # Also sizes the engine's chunks and input buffer for this model
+                self.inference.predict(model, DecodedImage(WARMUP_IMAGE_PATH).gray_array)
+            else:
+                print(f"⚠️ Warmup image not found at {WARMUP_IMAGE_PATH}, skipping warmup")
+        except Exception as e:
+            print(f"⚠️ Warmup inference failed: {e}")
+    
+    def wait_until_ready(self, timeout=READY_TIMEOUT_SECONDS):
+        return self._ready.wait(timeout)
     
     def load_real_model(self):
         """Load the real PyTorch U-Net model"""
         try:
+            import_real_utilities()
+            self.inference = InferenceEngine(INFERENCE_MEMORY_MB * 1024 * 1024, INFERENCE_CONCURRENCY)
             if os.path.exists(self.model_path):
-                self.model = load_model(self.model_path)
+                entry = self.registry.register(DEFAULT_MODEL_NAME, DEFAULT_MODEL_VERSION, self.model_path,
+                                               activate=True, background=False)
+                if entry.state != "ready":
+                    raise RuntimeError(entry.error)
+                self.load_seconds = entry.load_seconds
+                self.warmup_seconds = entry.warmup_seconds
                 self.model_loaded = True
-                print(f"✅ Real PyTorch model loaded from {self.model_path}")
+                print(f"✅ Real PyTorch model loaded from {self.model_path} ({WEIGHTS_MODE} weights)")
             else:
                 print(f"❌ Model file not found at {self.model_path}")
                 print("💡 Using mock implementation instead")
@@ -66,98 +256,310 @@ class TropoScanModel:
             print("💡 Using mock implementation instead")
             self.setup_mock_model()
     
+    def _load_weights(self, model_path):
+        """Registry loader: build a U-Net from a checkpoint in the configured weights mode"""
+        import_real_utilities()
+        return load_model(self._weights_path(model_path))
+    
+    def _weights_path(self, model_path):
+        """Resolve the file to load weights from for the configured weights mode"""
+        if WEIGHTS_MODE != "mmap" or model_path.endswith(".safetensors"):
+            return model_path
+        flat_path = os.path.splitext(model_path)[0] + ".safetensors"
+        if not os.path.exists(flat_path) or os.path.getmtime(flat_path) < os.path.getmtime(model_path):
+            print(f"🔄 Converting {model_path} to shared flat weights...")
+            convert_checkpoint(model_path, flat_path)
+        return flat_path
+    
+    def _find_near_duplicate(self, perceptual_hash, model_version, tta):
+        """(stored result, distance) of the closest cached result from the same model and tta, or None"""
+        if NEAR_DUPLICATE_DISTANCE < 0:
+            return None
+        with self._near_duplicate_lock:
+            matches = self.near_duplicates.query(perceptual_hash, NEAR_DUPLICATE_DISTANCE)
+        # Looked up outside our lock, so store lookups never nest inside it
+        found = None
+        for distance, result_id in matches:
+            stored = self.results.get(result_id)
+            if stored is not None and stored.model_version == model_version and stored.tta == tta:
+                found = stored, distance
+                break
+        with self._near_duplicate_lock:
+            self.near_duplicate_stats["hits" if found else "misses"] += 1
+        return found
+    
+    def _remember_near_duplicate(self, stored):
+        if NEAR_DUPLICATE_DISTANCE >= 0:
+            with self._near_duplicate_lock:
+                self.near_duplicates.add(stored.result_id, stored.perceptual_hash)
+    
+    def _forget_near_duplicate(self, stored):
+        if stored.perceptual_hash is not None:
+            with self._near_duplicate_lock:
+                self.near_duplicates.remove(stored.result_id)
+    
+    def new_result(self, quantized, image_name, model_version, digest, perceptual_hash, bounds, tta=0,
+                   inference_report=None):
+        """StoredResult of a prediction, shared by the API and the ingest pipeline"""
+        # The same image, region (taken from its name), model and options always get the same id
+        # in deterministic mode; tiles and ETags are cached by it
+        result_id = content_digest(f"{digest}:{bounds}:{model_version}:{tta}".encode()) if DETERMINISTIC else None
+        stored = StoredResult(quantized, image_name, model_version, result_id)
+        stored.source_digest, stored.perceptual_hash, stored.tta = digest, perceptual_hash, tta
+        stored.bounds, stored.inference_report = bounds, inference_report
+        return stored
+    
+    def describe_near_duplicates(self):
+        lookups = self.near_duplicate_stats["hits"] + self.near_duplicate_stats["misses"]
+        return {
+            "max_distance": NEAR_DUPLICATE_DISTANCE,
+            "indexed": len(self.near_duplicates),
+            **self.near_duplicate_stats,
+            "hit_rate": round(self.near_duplicate_stats["hits"] / lookups, 4) if lookups else None,
+        }
+    
+    def analysis_rng(self, key):
+        """Random generator for one analysis; seeded from key (e.g. the image digest) when deterministic"""
+        if not DETERMINISTIC:
+            return np.random.default_rng()
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        return np.random.default_rng(int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little"))
+    
+    def analysis_time(self):
+        """Reference time for timestamps and forecast times"""
+        if REFERENCE_TIME:
+            return datetime.fromisoformat(REFERENCE_TIME)
+        now = datetime.now()
+        if not DETERMINISTIC or CLOCK_RESOLUTION_SECONDS <= 0:
+            return now
+        return datetime.fromtimestamp(int(now.timestamp()) // CLOCK_RESOLUTION_SECONDS * CLOCK_RESOLUTION_SECONDS)
+    
     def setup_mock_model(self):
         """Setup mock model for demo purposes"""
         self.model_loaded = True
         print("🎭 Mock model initialized for demonstration")
     
-    def predict_image(self, image_path):
-        """Predict mask and generate risk assessment for an image"""
+    def predict_image(self, image_path, probability_encoding=None, output="raster", tolerance=1.0, colormap="red", tta=0,
+                      decoded=None, publish_alert=False, reuse=None):
+        """Predict mask and generate risk assessment for an image
+        
+        decoded is an already-decoded DecodedImage (e.g. an upload); image_path is then only its name.
+        probability_encoding ("png" or "rle") also returns the compact probability map.
+        output="geojson" returns simplified cluster outlines instead of the overlay PNG.
+        colormap selects the overlay palette ("red" mask, "heat", "viridis", "risk" bands).
+        tta=4 or 8 averages flipped/rotated variants, run as one batch, for steadier edges.
+        publish_alert pushes a high-risk result to dashboards; only operational uploads set it,
+        so samples and case studies never raise alerts.
+        reuse, if a dict, is filled with near_duplicate_of and hash_distance when a cached
+        result's probabilities were reused; the result itself does not say so.
+        """
+        if not self.wait_until_ready():
+            print(f"⏳ Model still {self.state} after {READY_TIMEOUT_SECONDS}s")
         print(f"🔍 Analyzing image: {image_path}")
         print(f"📊 Real model available: {REAL_MODEL_AVAILABLE}")
         print(f"🤖 Model loaded: {self.model is not None}")
-        print(f"📁 Image exists: {os.path.exists(image_path) if image_path else False}")
+        has_image = decoded is not None or bool(image_path and os.path.exists(image_path))
+        print(f"📁 Image exists: {has_image}")
         
         # Always try real model first if available
-        if REAL_MODEL_AVAILABLE and self.model and image_path and os.path.exists(image_path):
+        if REAL_MODEL_AVAILABLE and self.model and has_image:
             print("✅ Using REAL PyTorch model for prediction")
-            return self._predict_real(image_path)
+            result = self._predict_real(image_path, probability_encoding, output, tolerance, colormap, tta, decoded,
+                                        reuse)
         else:
             print("🎭 Using mock implementation for prediction")
             if not REAL_MODEL_AVAILABLE:
                 print("❌ Real model utilities not available")
             if not self.model:
                 print("❌ Model not loaded")
-            if not image_path or not os.path.exists(image_path):
+            if not has_image:
                 print("❌ Image path invalid or file doesn't exist")
-            return self._predict_mock(image_path)
+            result = self._predict_mock(image_path, decoded)
+        if publish_alert:
+            self._publish_alert(result, image_path)
+        return result
+    
+    def _publish_alert(self, result, image_path):
+        """Push real-model results at or above ALERT_MIN_RISK to connected dashboards"""
+        risk_data = result.get("risk_data") if result.get("success") else None
+        if not risk_data or result.get("model_type") != "real_pytorch":
+            return
+        level = str(risk_data.get("risk_level", "")).upper()
+        if level not in RISK_LEVELS or RISK_LEVELS.index(level) < RISK_LEVELS.index(ALERT_MIN_RISK):
+            return
+        event_id = self.alerts.publish({
+            "result_id": result.get("result_id"),
+            "risk_level": level,
+            "coverage_percent": risk_data.get("coverage_percent"),
+            "confidence": risk_data.get("confidence"),
+            "location": risk_data.get("current_location"),
+            "landfall": risk_data.get("impact_prediction"),
+            "image_name": os.path.basename(image_path) if image_path else None,
+            "model_type": result.get("model_type"),
+            "model_version": result.get("model_version"),
+            "timestamp": result.get("timestamp"),
+        })
+        print(f"📣 Published {level} alert #{event_id} to {len(self.alerts.subscribers)} subscriber(s)")
     
-    def _predict_real(self, image_path):
+    def _predict_real(self, image_path, probability_encoding=None, output="raster", tolerance=1.0, colormap="red", tta=0,
+                      decoded=None, reuse=None):
         """Real prediction using PyTorch model and mainbackend utilities"""
         print(f"🧠 Starting real AI prediction for: {image_path}")
         try:
-            # Generate prediction mask using your trained model
-            print("🔮 Generating mask prediction...")
-            mask_img = predict_mask(self.model, image_path)
+            # Pin the active version for the whole request so a swap can't split it
+            active = self.registry.active
             
-            # Save temporary mask file
-            temp_mask_path = f"temp_mask_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            mask_img.save(temp_mask_path)
-            print(f"💾 Mask saved to: {temp_mask_path}")
+            # Read and decode the image once; every step below shares this decode
+            decoded = decoded or DecodedImage(image_path)
+            digest = content_digest(decoded.data)
+            perceptual_hash = dct_hash(decoded.gray_array)
+            near_duplicate = self._find_near_duplicate(perceptual_hash, active.key, tta)
+            
+            if near_duplicate is not None:
+                # A re-encoded or slightly cropped copy of a cached input: reuse its probabilities and the
+                # report of the pass that made them. Name, digest and seed stay this request's own, so an
+                # exact re-upload gets the same response as the first one.
+                reused, distance = near_duplicate
+                print(f"♻️ Near-duplicate of result {reused.result_id} (hash distance {distance}), skipping inference")
+                quantized = reused.probabilities
+                inference_report = reused.inference_report
+                if reuse is not None:
+                    reuse.update(near_duplicate_of=reused.result_id, hash_distance=distance)
+            else:
+                # Generate prediction mask using your trained model
+                print("🔮 Generating mask prediction...")
+                inference_start = time.perf_counter()
+                # Keep the quantized probabilities so other thresholds don't need inference
+                if tta:
+                    probabilities, inference_report = predict_probabilities_tta(active.model, decoded.gray_array,
+                                                                                self.inference, tta)
+                    quantized = quantize_probabilities(probabilities)
+                else:
+                    # Quantized straight from the engine's reused output buffer
+                    quantized, inference_report = self.inference.predict(
+                        active.model, decoded.gray_array,
+                        consume=lambda probabilities: quantize_probabilities(probabilities[0]))
+                active.record_latency(time.perf_counter() - inference_start)
+                print(f"💾 Process peak RSS {inference_report['process_peak_rss_bytes'] // (1024 * 1024)} MiB "
+                      f"({inference_report['chunks']} chunk(s) of {inference_report['chunk_size']})")
+            # Thresholded from the quantized map in both paths, so a reused map gives the same mask
+            mask_array = threshold_probabilities(quantized, 0.5)
+            rng = self.analysis_rng(digest)
+            mask_img = Image.fromarray(mask_array)
             
-            # Generate overlay using your utilities
-            print("🎨 Creating overlay visualization...")
-            temp_overlay_path = f"temp_overlay_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            create_overlay(image_path, temp_mask_path, temp_overlay_path)
-            print(f"🖼️ Overlay saved to: {temp_overlay_path}")
+            # Generate overlay using your utilities (vector output skips the raster overlay)
+            overlay_data = None
+            if output != "geojson":
+                print("🎨 Creating overlay visualization...")
+                overlay_data = self._array_to_base64(render_overlay(decoded, quantized, colormap))
             
             # Calculate risk using your risk assessment
             print("📊 Calculating risk assessment...")
-            risk_level, coverage_percent = calculate_risk(temp_mask_path)
+            risk_level, coverage_percent = calculate_risk_from_array(mask_array)
             print(f"⚡ Risk Level: {risk_level}, Coverage: {coverage_percent}%")
             
-            # Read generated files
-            with open(temp_overlay_path, 'rb') as f:
-                overlay_data = base64.b64encode(f.read()).decode('utf-8')
-            
-            with open(image_path, 'rb') as f:
-                original_data = base64.b64encode(f.read()).decode('utf-8')
+            original_data = base64.b64encode(decoded.data).decode('utf-8')
             
-            # Clean up temp files
-            if os.path.exists(temp_mask_path):
-                os.remove(temp_mask_path)
-            if os.path.exists(temp_overlay_path):
-                os.remove(temp_overlay_path)
+            shadow = self.registry.pick_shadow() if near_duplicate is None else None
+            if shadow is not None:
+                self._submit_shadow(shadow, decoded, mask_img, risk_level, coverage_percent)
             
             # Generate precise risk data using actual model outputs
-            risk_data = self._generate_precise_risk_data(risk_level, coverage_percent, mask_img, image_path)
+            risk_data = self._generate_precise_risk_data(risk_level, coverage_percent, mask_img, image_path, rng)
+            bounds = risk_data["region_bounds"]
+            bounds = (bounds["west"], bounds["south"], bounds["east"], bounds["north"])
+            
+            stored = self.new_result(quantized, os.path.basename(image_path), active.key, digest, perceptual_hash,
+                                     bounds, tta, inference_report)
+            self.results.put(stored)
+            if near_duplicate is None:
+                self._remember_near_duplicate(stored)
+            result_id = stored.result_id
             
             print("✅ Real AI prediction completed successfully!")
-            return {
+            if DETERMINISTIC:
+                inference_report = {k: v for k, v in inference_report.items() if k not in VOLATILE_INFERENCE_KEYS}
+            result = {
                 "success": True,
+                "result_id": result_id,
                 "risk_data": risk_data,
                 "overlay_image": overlay_data,
                 "processed_image": original_data,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": self.analysis_time().isoformat(),
                 "model_type": "real_pytorch",
-                "model_source": "mainbackend_trained_model"
+                "model_source": "mainbackend_trained_model",
+                "model_version": active.key,
+                "inference": inference_report
             }
+            if output == "geojson":
+                # Vector mode: a few KB of outlines instead of two base64 images
+                del result["overlay_image"], result["processed_image"]
+                result["clusters_geojson"] = mask_to_geojson(mask_array, stored.bounds,
+                                                             tolerance=tolerance, probabilities=quantized)
+            if probability_encoding:
+                result["probability_map"] = {
+                    "encoding": probability_encoding,
+                    "shape": list(quantized.shape),
+                    "data": base64.b64encode(PROBABILITY_ENCODERS[probability_encoding](quantized)).decode('utf-8')
+                }
+            return result
             
         except Exception as e:
             print(f"❌ Error in real prediction: {e}")
             print("🔄 Falling back to mock implementation...")
             import traceback
             traceback.print_exc()
-            return self._predict_mock(image_path)
+            return self._predict_mock(image_path, decoded)
     
-    def _predict_mock(self, image_path):
+    def rethreshold(self, quantized, threshold, image_name="unknown", source_digest=None):
+        """Re-derive mask, coverage and risk from a quantized probability map
+
+        source_digest (the input image's content_digest) seeds the analysis like the original
+        prediction; a map supplied without one is seeded from its own bytes.
+        """
+        mask_array = threshold_probabilities(quantized, threshold)
+        risk_level, coverage_percent = calculate_risk_from_array(mask_array)
+        rng = self.analysis_rng(source_digest or content_digest(np.ascontiguousarray(quantized).tobytes()))
+        risk_data = self._generate_precise_risk_data(risk_level, coverage_percent, Image.fromarray(mask_array),
+                                                     image_name, rng)
+        return {
+            "success": True,
+            "threshold": threshold,
+            "risk_data": risk_data,
+            "mask_image": self._array_to_base64(mask_array),
+            "timestamp": self.analysis_time().isoformat()
+        }
+    
+    def _submit_shadow(self, shadow, decoded, primary_mask, primary_risk, primary_coverage):
+        """Queue a shadow prediction; skipped when the shadow worker is saturated"""
+        if not self._shadow_slots.acquire(blocking=False):
+            return
+        future = self._shadow_executor.submit(self._run_shadow, shadow, decoded,
+                                              primary_mask, primary_risk, primary_coverage)
+        future.add_done_callback(lambda _: self._shadow_slots.release())
+    
+    def _run_shadow(self, shadow, decoded, primary_mask, primary_risk, primary_coverage):
+        """Run the shadow candidate on the same image and record how it compares"""
+        try:
+            start = time.perf_counter()
+            shadow_mask = predict_mask(shadow.model, decoded, engine=self.inference)
+            shadow.record_latency(time.perf_counter() - start)
+            shadow_risk, shadow_coverage = calculate_risk(shadow_mask)
+            self.registry.shadow_stats.record(primary_mask, shadow_mask, primary_risk, shadow_risk,
+                                              primary_coverage, shadow_coverage)
+        except Exception as e:
+            print(f"⚠️ Shadow prediction with {shadow.key} failed: {e}")
+    
+    def _predict_mock(self, image_path, decoded=None):
         """Mock prediction for demo purposes"""
         try:
             # Generate mock data based on image properties
-            if os.path.exists(image_path):
-                img = Image.open(image_path).convert('L')
-                img_array = np.array(img.resize((256, 256)))
-                avg_intensity = np.mean(img_array)
+            if decoded is None and image_path and os.path.exists(image_path):
+                decoded = DecodedImage(image_path)
+            rng = self.analysis_rng(content_digest(decoded.data) if decoded is not None else (image_path or "mock"))
+            if decoded is not None:
+                avg_intensity = np.mean(decoded.gray_array)
                 
                 # Mock risk assessment based on image brightness
                 if avg_intensity > 180:  # Bright areas (cold clouds)
@@ -176,23 +578,22 @@ class TropoScanModel:
             # Generate mock overlay
             mock_overlay = self._generate_mock_overlay()
             
-            # Read original image
-            if os.path.exists(image_path):
-                with open(image_path, 'rb') as f:
-                    original_data = base64.b64encode(f.read()).decode('utf-8')
+            # Original image bytes were already read by the decode
+            if decoded is not None:
+                original_data = base64.b64encode(decoded.data).decode('utf-8')
             else:
                 # Generate mock image
-                mock_img = np.random.randint(0, 255, (256, 256), dtype=np.uint8)
+                mock_img = rng.integers(0, 255, (256, 256), dtype=np.uint8)
                 original_data = self._array_to_base64(mock_img)
             
-            risk_data = self._generate_risk_data(risk_level, coverage, model_type="mock")
+            risk_data = self._generate_risk_data(risk_level, coverage, model_type="mock", rng=rng)
             
             return {
                 "success": True,
                 "risk_data": risk_data,
                 "overlay_image": mock_overlay,
                 "processed_image": original_data,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": self.analysis_time().isoformat(),
                 "model_type": "mock_demo"
             }
             
@@ -200,41 +601,42 @@ class TropoScanModel:
             print(f"Error in mock prediction: {e}")
             return {"success": False, "error": str(e)}
     
-    def _generate_risk_data(self, risk_level, coverage_percent, model_type="mock"):
+    def _generate_risk_data(self, risk_level, coverage_percent, model_type="mock", rng=None):
         """Generate detailed risk assessment data based on model output"""
+        rng = rng if rng is not None else self.analysis_rng(f"{risk_level}:{coverage_percent}")
         # For real model predictions, generate more sophisticated analysis
         if model_type == "real_pytorch":
             # Real model-based temperature estimation
             if risk_level == "HIGH":
-                temperature = -75.0 + np.random.uniform(-8, 3)
-                confidence = 88 + np.random.uniform(0, 8)
+                temperature = -75.0 + rng.uniform(-8, 3)
+                confidence = 88 + rng.uniform(0, 8)
                 cluster_area = 2200 + coverage_percent * 60
                 prediction = f"🌪️ REAL AI MODEL ANALYSIS: Deep convective system identified with extremely cold cloud tops ({temperature:.1f}°C). My trained U-Net model detected organized spiral patterns with {coverage_percent:.1f}% coverage. CYCLONE FORMATION HIGHLY PROBABLE within 6-12 hours. Predicted storm intensity: Severe to Very Severe. Wind speeds may exceed 120 km/h. Immediate evacuation warnings recommended for coastal areas."
             elif risk_level == "MODERATE":
-                temperature = -62.0 + np.random.uniform(-7, 4)
-                confidence = 75 + np.random.uniform(0, 12)
+                temperature = -62.0 + rng.uniform(-7, 4)
+                confidence = 75 + rng.uniform(0, 12)
                 cluster_area = 1200 + coverage_percent * 40
                 prediction = f"⚠️ REAL AI MODEL ANALYSIS: Organized convective cluster detected at {temperature:.1f}°C with {coverage_percent:.1f}% area coverage. My U-Net model identified developing circulation patterns. MODERATE CYCLONE RISK - system shows signs of intensification. Predicted development time: 12-24 hours. Continue intensive monitoring. Alert coastal authorities for preparation."
             else:
-                temperature = -48.0 + np.random.uniform(-8, 8)
-                confidence = 65 + np.random.uniform(0, 15)
+                temperature = -48.0 + rng.uniform(-8, 8)
+                confidence = 65 + rng.uniform(0, 15)
                 cluster_area = coverage_percent * 25
                 prediction = f"✅ REAL AI MODEL ANALYSIS: Normal cloud patterns at {temperature:.1f}°C with {coverage_percent:.1f}% coverage. My trained model shows no significant cyclonic organization. LOW THREAT LEVEL - typical monsoon clouds detected. No immediate storm development expected. Routine monitoring sufficient."
         else:
             # Fallback to original mock logic
             if risk_level == "HIGH":
-                temperature = -75.0 + np.random.uniform(-5, 2)
-                confidence = 85 + np.random.uniform(0, 10)
+                temperature = -75.0 + rng.uniform(-5, 2)
+                confidence = 85 + rng.uniform(0, 10)
                 cluster_area = 2000 + coverage_percent * 50
                 prediction = f"Deep convective system detected with very cold cloud tops ({temperature:.1f}°C). High probability of tropical cyclone development within 6-12 hours. Immediate monitoring recommended."
             elif risk_level == "MODERATE":
-                temperature = -60.0 + np.random.uniform(-8, 5)
-                confidence = 70 + np.random.uniform(0, 15)
+                temperature = -60.0 + rng.uniform(-8, 5)
+                confidence = 70 + rng.uniform(0, 15)
                 cluster_area = 1000 + coverage_percent * 30
                 prediction = f"Organized cloud cluster identified with moderate convection ({temperature:.1f}°C). System shows potential for intensification. Continue monitoring for 12-24 hours."
             else:
-                temperature = -45.0 + np.random.uniform(-10, 10)
-                confidence = 60 + np.random.uniform(0, 20)
+                temperature = -45.0 + rng.uniform(-10, 10)
+                confidence = 60 + rng.uniform(0, 20)
                 cluster_area = coverage_percent * 20
                 prediction = f"Normal cloud patterns observed ({temperature:.1f}°C). No significant threat detected. Routine monitoring sufficient."
         
@@ -276,10 +678,15 @@ class TropoScanModel:
         img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
         return img_str
     
-    def _generate_precise_risk_data(self, risk_level, coverage_percent, mask_img, image_path):
-        """Generate precise risk assessment data based on actual model outputs"""
+    def _generate_precise_risk_data(self, risk_level, coverage_percent, mask_img, image_path, rng=None):
+        """Generate precise risk assessment data based on actual model outputs
+        
+        rng drives every random choice (region, jitter, forecast ensemble); by default it is
+        seeded from the mask, so a given mask always gives the same assessment when deterministic.
+        """
         # Calculate precise metrics from actual model outputs
         mask_array = np.array(mask_img)
+        rng = rng if rng is not None else self.analysis_rng(mask_array.tobytes())
         
         # Calculate actual detected features
         total_pixels = mask_array.size
@@ -287,6 +694,7 @@ class TropoScanModel:
         
         # Calculate confidence based on prediction certainty
         if SCIPY_AVAILABLE:
+            from scipy.ndimage import sobel
             # More defined edges = higher confidence
             edges = sobel(mask_array.astype(float))
             edge_strength = np.mean(np.abs(edges))
@@ -306,7 +714,7 @@ class TropoScanModel:
             center_x = np.mean(high_intensity_coords[1]) / mask_array.shape[1]
             
             # Determine geographical region based on image properties and cyclone center
-            region_info = self._determine_geographical_region(mask_array, center_x, center_y, image_path)
+            region_info = self._determine_geographical_region(mask_array, center_x, center_y, image_path, rng)
             longitude = region_info["longitude"]
             latitude = region_info["latitude"]
             region_name = region_info["region_name"]
@@ -314,35 +722,37 @@ class TropoScanModel:
         else:
             # Default to a central location but still try to determine region
             center_x, center_y = 0.5, 0.5
-            region_info = self._determine_geographical_region(mask_array, center_x, center_y, image_path)
+            region_info = self._determine_geographical_region(mask_array, center_x, center_y, image_path, rng)
             longitude = region_info["longitude"]
             latitude = region_info["latitude"]
             region_name = region_info["region_name"]
             coast_info = region_info["coast_info"]
         
         # Calculate movement vector and predict path using region-specific parameters
-        current_time = datetime.now()
+        current_time = self.analysis_time()
         movement_speed = 15 + coverage_percent * 0.8  # km/h, based on system intensity
         movement_direction = region_info["movement_direction"]  # Use region-specific movement direction
         
-        # Predict future positions (every 6 hours for next 48 hours)
+        # Ensemble forecast for the main system (centroid of all cloud) and each sizeable cluster in one pass
+        origins = [(latitude, longitude, movement_speed)] + self._cluster_origins(mask_array, region_info)
+        coast_info_point = (coast_info["lat"], coast_info["lon"])
+        forecasts = ensemble_forecast([o[0] for o in origins], [o[1] for o in origins], [o[2] for o in origins],
+                                      [movement_direction] * len(origins), coast=coast_info_point,
+                                      members=FORECAST_MEMBERS, rng=rng)
+        
+        # Predict future positions (every 6 hours for next 48 hours) as the ensemble mean track
         future_positions = []
-        for hours in [6, 12, 18, 24, 36, 48]:
-            distance_km = movement_speed * hours
-            # Convert to lat/lon offset (rough approximation)
-            lat_offset = (distance_km * np.cos(np.radians(movement_direction))) / 111.0  # 1 degree ≈ 111 km
-            lon_offset = (distance_km * np.sin(np.radians(movement_direction))) / (111.0 * np.cos(np.radians(latitude)))
-            
-            future_lat = latitude + lat_offset
-            future_lon = longitude + lon_offset
+        for point in forecasts[0]["track"]:
+            hours = point["hours_from_now"]
             future_time = current_time + timedelta(hours=hours)
-            
             future_positions.append({
                 "time": future_time.strftime("%Y-%m-%d %H:%M UTC"),
-                "latitude": round(future_lat, 2),
-                "longitude": round(future_lon, 2),
+                "latitude": point["latitude"],
+                "longitude": point["longitude"],
                 "hours_from_now": hours,
-                "predicted_intensity": max(40, 180 - hours * 2.5) if risk_level == "HIGH" else max(30, 120 - hours * 1.8)
+                "predicted_intensity": max(40, 180 - hours * 2.5) if risk_level == "HIGH" else max(30, 120 - hours * 1.8),
+                "cone_radius_km": point["cone_radius_km_p90"],
+                "landfall_probability": point["landfall_probability"]
             })
         
         # Calculate landfall prediction using region-specific coast information
@@ -365,7 +775,7 @@ class TropoScanModel:
             max_wind_speed = 120 + confidence * 0.5
             prediction = f"⚠️ DEVELOPING CYCLONE: Cloud cluster at {latitude:.2f}°N, {longitude:.2f}°E in the {region_name} with {coverage_percent:.2f}% coverage. Organized patterns detected. Cloud tops: {base_temp:.1f}°C. Pressure: {central_pressure:.0f} hPa. Winds: {max_wind_speed:.0f} km/h. Moving at {movement_speed:.1f} km/h. Potential landfall: {landfall_time.strftime('%H:%M UTC on %d %b')} near {coast_name}."
         else:
-            central_pressure = 1005 + np.random.uniform(-5, 5)
+            central_pressure = 1005 + rng.uniform(-5, 5)
             base_temp = -40.0 - coverage_percent * 1.5
             max_wind_speed = 60 + coverage_percent * 2
             prediction = f"✅ NORMAL CONDITIONS: Weather system at {latitude:.2f}°N, {longitude:.2f}°E in the {region_name} with {coverage_percent:.2f}% cloud coverage. Cloud tops: {base_temp:.1f}°C. Pressure: {central_pressure:.0f} hPa. No cyclonic threat detected."
@@ -405,12 +815,50 @@ class TropoScanModel:
                     "region": coast_name
                 },
                 "hours_to_landfall": round(hours_to_landfall, 1),
+                "landfall_probability": forecasts[0]["landfall_probability"],
+                "median_hours_to_landfall": forecasts[0]["median_hours_to_landfall"],
                 "affected_areas": affected_areas
             },
-            "future_track": future_positions
+            "future_track": future_positions,
+            "ensemble_forecast": {
+                "members": FORECAST_MEMBERS,
+                "clusters": [{"source": "system" if i == 0 else "cluster",
+                              "origin": {"latitude": round(o[0], 2), "longitude": round(o[1], 2)},
+                              "speed_kmh": round(o[2], 1), **forecast}
+                             for i, (o, forecast) in enumerate(zip(origins, forecasts))]
+            },
+            "region_bounds": {
+                "west": region_info["bounds"][0],
+                "south": region_info["bounds"][1],
+                "east": region_info["bounds"][2],
+                "north": region_info["bounds"][3]
+            }
         }
     
-    def _determine_geographical_region(self, mask_array, center_x, center_y, image_path):
+    def _cluster_origins(self, mask_array, region_info, max_clusters=4, min_coverage=0.5):
+        """(lat, lon, speed) at the centroid of each of the largest clusters, for the ensemble forecast
+
+        A single cluster is already forecast as the main system, so it is not repeated.
+        """
+        if not SCIPY_AVAILABLE:
+            return []
+        from scipy import ndimage
+        labels, count = ndimage.label(mask_array > 128)
+        if count < 2:
+            return []
+        areas = np.bincount(labels.ravel())[1:]
+        order = np.argsort(areas)[::-1][:max_clusters]
+        order = [i for i in order if areas[i] / mask_array.size * 100 >= min_coverage]
+        if not order:
+            return []
+        centers = ndimage.center_of_mass(mask_array > 128, labels, [i + 1 for i in order])
+        lon_min, lat_min, lon_max, lat_max = region_info["bounds"]
+        height, width = mask_array.shape
+        return [(float(lat_max - row / height * (lat_max - lat_min)), float(lon_min + col / width * (lon_max - lon_min)),
+                 float(15 + areas[i] / mask_array.size * 100 * 0.8))
+                for i, (row, col) in zip(order, centers)]
+    
+    def _determine_geographical_region(self, mask_array, center_x, center_y, image_path, rng):
         """
         Determine geographical region and coordinates based on image analysis
         This method analyzes the image and mask to determine the most likely geographical region
@@ -460,7 +908,7 @@ class TropoScanModel:
         }
         
         # Analyze image properties to determine most likely region
-        region_key = self._analyze_image_for_region(mask_array, image_path)
+        region_key = self._analyze_image_for_region(mask_array, image_path, rng)
         
         # Get the determined region
         region = regions[region_key]
@@ -469,13 +917,13 @@ class TropoScanModel:
         lat_min, lat_max = region["lat_range"]
         lon_min, lon_max = region["lon_range"]
         
-        # Map normalized center coordinates to actual lat/lon within the region
+        # Map normalized center coordinates to actual lat/lon within the region (image row 0 is north)
         longitude = lon_min + center_x * (lon_max - lon_min)
-        latitude = lat_min + center_y * (lat_max - lat_min)
+        latitude = lat_max - center_y * (lat_max - lat_min)
         
         # Add some randomization to make it more realistic for different images
-        longitude += np.random.uniform(-0.5, 0.5)
-        latitude += np.random.uniform(-0.3, 0.3)
+        longitude += rng.uniform(-0.5, 0.5)
+        latitude += rng.uniform(-0.3, 0.3)
         
         return {
             "longitude": longitude,
@@ -483,10 +931,11 @@ class TropoScanModel:
             "region_name": region["name"],
             "coast_info": region["coast"],
             "movement_direction": region["movement_dir"],
-            "affected_areas": region["affected_areas"]
+            "affected_areas": region["affected_areas"],
+            "bounds": (lon_min, lat_min, lon_max, lat_max)
         }
     
-    def _analyze_image_for_region(self, mask_array, image_path):
+    def _analyze_image_for_region(self, mask_array, image_path, rng):
         """
         Analyze image characteristics to determine the most likely geographical region
         This is a simplified analysis - in a real system, this could use:
@@ -514,19 +963,19 @@ class TropoScanModel:
             return "arabian_sea"
         elif mean_intensity > 150 and mask_coverage > 0.15:
             # High intensity systems - likely major ocean basins
-            if np.random.random() > 0.6:
+            if rng.random() > 0.6:
                 return "pacific_northwest"
             else:
                 return "bay_of_bengal"
         elif mean_intensity > 100:
             # Moderate systems
             regions = ["bay_of_bengal", "arabian_sea", "north_indian_ocean"]
-            return np.random.choice(regions)
+            return rng.choice(regions)
         else:
             # Lower intensity - vary more
             regions = ["bay_of_bengal", "arabian_sea", "north_indian_ocean", "atlantic"]
             weights = [0.4, 0.3, 0.2, 0.1]  # Bias toward Indian Ocean
-            return np.random.choice(regions, p=weights)
+            return rng.choice(regions, p=weights)
         
         return "bay_of_bengal"  # Default to Bay of Bengal if unsure
     
@@ -674,8 +1123,35 @@ SAMPLE_IMAGES = [
     }
 ]
 
-# Initialize model
-troposcope_model = TropoScanModel()
+# Initialize model (loads and warms up in the background unless TROPOSCAN_EAGER_LOAD=1)
+troposcope_model = TropoScanModel(background=not EAGER_LOAD)
+tile_server = TileServer(troposcope_model.results,
+                         TileCache(TILE_CACHE_DIR or None, TILE_MEMORY_CACHE_MB * 1024 * 1024,
+                                   TILE_DISK_CACHE_MB * 1024 * 1024))
+# Tiles of a result are deleted when the result leaves the store
+troposcope_model.results.add_evict_listener(lambda stored: tile_server.forget_result(stored.result_id))
+
+ingest_pipeline = None
+if INGEST_DIR:
+    ingest_pipeline = build_troposcan_pipeline(troposcope_model, INGEST_DIR, INGEST_OUTBOX,
+                                               parse_stage_workers(INGEST_WORKERS), INGEST_QUEUE_SIZE)
+
+
+def start_ingest_pipeline():
+    """Start watching the drop folder; only the serving entry points call this, never the import"""
+    if ingest_pipeline is not None and not ingest_pipeline.started:
+        ingest_pipeline.start()
+
+
+def stop_ingest_pipeline():
+    if ingest_pipeline is not None and ingest_pipeline.started:
+        ingest_pipeline.stop()
+
+# Without a profile directory the middleware is not installed at all
+request_profiler = None
+if PROFILE_DIR:
+    request_profiler = RequestProfiler(PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_TOKEN)
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, request_profiler)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -687,33 +1163,305 @@ def health_check():
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route('/api/live', methods=['GET'])
+def liveness_check():
+    """Liveness probe - the process is up and serving requests"""
+    return jsonify({"status": "alive", "timestamp": datetime.now().isoformat()})
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe - the model is loaded and the first inference has been paid"""
+    return jsonify({
+        "ready": troposcope_model.ready,
+        "state": troposcope_model.state,
+        "load_seconds": troposcope_model.load_seconds,
+        "warmup_seconds": troposcope_model.warmup_seconds,
+        "timestamp": datetime.now().isoformat()
+    }), 200 if troposcope_model.ready else 503
+
+def resolve_model_path(path):
+    """Resolve a registry weights path, refusing anything outside MODEL_DIR"""
+    model_dir = os.path.realpath(MODEL_DIR)
+    resolved = os.path.realpath(os.path.join(model_dir, path))
+    if not resolved.startswith(model_dir + os.sep):
+        raise ValueError("Model path must be inside the model directory")
+    if not os.path.exists(resolved):
+        raise ValueError(f"Model file not found: {path}")
+    return resolved
+
+@app.route('/api/models', methods=['GET'])
+def list_models():
+    """List registered model versions with their memory and latency statistics"""
+    inference = troposcope_model.inference.describe() if troposcope_model.inference else None
+    return jsonify({"success": True, **troposcope_model.registry.describe(), "inference": inference,
+                    "near_duplicates": troposcope_model.describe_near_duplicates()})
+
+@app.route('/api/models', methods=['POST'])
+def register_model():
+    """Load and warm a new model version in the background"""
+    data = request.get_json(silent=True) or {}
+    name, version, path = data.get("name"), data.get("version"), data.get("path")
+    if not name or not version or not path:
+        return jsonify({"success": False, "error": "name, version and path are required"}), 400
+    try:
+        entry = troposcope_model.registry.register(name, str(version), resolve_model_path(path),
+                                                   activate=bool(data.get("activate", False)))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 409
+    return jsonify({"success": True, "model": entry.describe()}), 202
+
+@app.route('/api/models/<name>/<version>/activate', methods=['POST'])
+def activate_model(name, version):
+    """Atomically switch serving traffic to a ready model version"""
+    try:
+        entry = troposcope_model.registry.activate(name, version)
+    except KeyError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 409
+    return jsonify({"success": True, "active": entry.key})
+
+@app.route('/api/models/<name>/<version>', methods=['DELETE'])
+def unregister_model(name, version):
+    """Drop an inactive model version and release its weights"""
+    try:
+        entry = troposcope_model.registry.unregister(name, version)
+    except KeyError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 409
+    return jsonify({"success": True, "removed": entry.key})
+
+@app.route('/api/models/shadow', methods=['POST'])
+def set_shadow_model():
+    """Mirror a percentage of real requests to a candidate model for comparison"""
+    data = request.get_json(silent=True) or {}
+    try:
+        entry = troposcope_model.registry.set_shadow(data.get("name"), str(data.get("version")),
+                                                     float(data.get("percent", 0)))
+    except KeyError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "shadow": entry.key if entry else None,
+                    "percent": troposcope_model.registry.shadow_percent})
+
+def requested_prediction_options():
+    """Read optional prediction options from the form or query string
+    
+    probability_map: png|rle, output: raster|geojson, tolerance: contour simplification in pixels,
+    colormap: overlay palette, tta: 4|8 test-time augmentation variants
+    """
+    def option(name, default=''):
+        return (request.form.get(name) or request.args.get(name) or default).lower()
+    
+    encoding = option('probability_map')
+    if encoding and encoding not in PROBABILITY_ENCODERS:
+        raise ValueError(f"probability_map must be one of {sorted(PROBABILITY_ENCODERS)}")
+    output = option('output', 'raster')
+    if output not in ("raster", "geojson"):
+        raise ValueError("output must be 'raster' or 'geojson'")
+    try:
+        tolerance = float(option('tolerance', '1.0'))
+    except ValueError:
+        raise ValueError("tolerance must be a number")
+    if not tolerance >= 0:  # also rejects NaN
+        raise ValueError("tolerance must not be negative")
+    colormap = option('colormap', 'red')
+    if colormap not in COLORMAPS:
+        raise ValueError(f"colormap must be one of {sorted(COLORMAPS)}")
+    tta = option('tta', '0')
+    if tta not in ("0", "4", "8"):
+        raise ValueError("tta must be 4 or 8 (or 0 to disable)")
+    return {"probability_encoding": encoding or None, "output": output, "tolerance": tolerance,
+            "colormap": colormap, "tta": int(tta)}
+
+def prediction_response(result, reuse=None):
+    """JSON response for a prediction, with an ETag when responses are deterministic
+
+    A reused near-duplicate result is reported in the X-TroposCan-Near-Duplicate header
+    ("<result id>; distance=<bits>"), never in the body, so the body depends only on the request.
+    """
+    response = jsonify(result)
+    if reuse:
+        response.headers["X-TroposCan-Near-Duplicate"] = f"{reuse['near_duplicate_of']}; distance={reuse['hash_distance']}"
+    if DETERMINISTIC and result.get("success"):
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+def admitted(priority):
+    """Inference slot for this request's client (a configured X-API-Key, else its address); raises AdmissionRejected.
+
+    An X-TroposCan-Deadline header (seconds) shortens how long the request may queue.
+    Until the model is ready, requests are refused with 503 rather than holding a slot while they wait.
+    """
+    if not troposcope_model.ready:
+        raise AdmissionRejected(f"Model is {troposcope_model.state}, retry later", 503, NOT_READY_RETRY_SECONDS)
+    client = client_identity(request.remote_addr, request.headers.get("X-API-Key"), ADMISSION_API_KEYS)
+    deadline = request.headers.get("X-TroposCan-Deadline", type=float)
+    return troposcope_model.admission.admit(client, priority, deadline)
+
+def admission_rejected_response(e):
+    """429 or 503 with Retry-After for a prediction refused by admission control"""
+    response = jsonify({"success": False, "error": str(e), "retry_after": e.retry_after})
+    response.status_code = e.status
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+def read_uploaded_image():
+    """(DecodedImage, filename) of the 'image' upload, decoded from memory; raises UploadRejected"""
+    data, filename = read_upload(request)
+    try:
+        return DecodedImage(data, max_pixels=MAX_UPLOAD_PIXELS), filename
+    except Exception as e:
+        raise UploadRejected(f"Could not decode image: {e}")
+
+@app.route('/api/results/<result_id>/geojson', methods=['GET'])
+def get_result_geojson(result_id):
+    """Cluster outlines of a cached result as GeoJSON, at any threshold and tolerance"""
+    stored = troposcope_model.results.get(result_id)
+    if stored is None or stored.bounds is None:
+        return jsonify({"success": False, "error": "Result not found or expired from cache"}), 404
+    try:
+        threshold = float(request.args.get('threshold', 0.5))
+        tolerance = float(request.args.get('tolerance', 1.0))
+    except ValueError:
+        return jsonify({"success": False, "error": "threshold and tolerance must be numbers"}), 400
+    # Written so NaN fails too
+    if not 0.0 < threshold < 1.0:
+        return jsonify({"success": False, "error": "threshold must be between 0 and 1"}), 400
+    if not tolerance >= 0:
+        return jsonify({"success": False, "error": "tolerance must not be negative"}), 400
+    mask_array = threshold_probabilities(stored.probabilities, threshold)
+    return jsonify(mask_to_geojson(mask_array, stored.bounds, tolerance=tolerance, probabilities=stored.probabilities))
+
+@app.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def get_tile(layer, z, x, y):
+    """XYZ map tile (overlay or probability layer) of a stored result (?result=<id>, default latest)"""
+    result_id = request.args.get('result')
+    if not result_id:
+        latest = troposcope_model.results.latest()
+        if latest is None:
+            return jsonify({"success": False, "error": "No results available yet"}), 404
+        result_id = latest.result_id
+    try:
+        data = tile_server.get_tile(result_id, layer, z, x, y)
+    except KeyError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    response = Response(data, mimetype='image/png')
+    # A result id can be re-stored with other probabilities (or survive a restart with new weights),
+    # so tiles are cached briefly and revalidated by ETag; "latest" changes with every prediction
+    response.headers['Cache-Control'] = 'public, max-age=300' if request.args.get('result') else 'no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/api/tiles/stats', methods=['GET'])
+def get_tile_stats():
+    """Tile cache hit/miss statistics"""
+    return jsonify({"success": True, **tile_server.cache.describe()})
+
+@app.route('/api/alerts/stream', methods=['GET'])
+def stream_alerts():
+    """Server-Sent Events stream of risk alerts; resumes after Last-Event-ID"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"success": False, "error": "Last-Event-ID must be an integer"}), 400
+    broker = troposcope_model.alerts
+    subscriber = broker.subscribe(last_event_id)
+    return Response(stream_with_context(broker.stream(subscriber, ALERT_HEARTBEAT_SECONDS)),
+                    mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/alerts', methods=['GET'])
+def list_alerts():
+    """Recent alerts plus fan-out statistics"""
+    limit = min(request.args.get('limit', 50, type=int), ALERT_HISTORY_SIZE)
+    return jsonify({
+        "success": True,
+        "min_risk_level": ALERT_MIN_RISK,
+        "alerts": troposcope_model.alerts.recent(limit),
+        **troposcope_model.alerts.describe()
+    })
+
+@app.route('/api/ingest/stats', methods=['GET'])
+def get_ingest_stats():
+    """Per-stage queue depth, throughput and utilization of the drop-folder ingest"""
+    if ingest_pipeline is None:
+        return jsonify({"success": False, "error": "Ingest is not enabled (set TROPOSCAN_INGEST_DIR)"}), 404
+    return jsonify({"success": True, **ingest_pipeline.describe()})
+
+@app.route('/api/profiling', methods=['GET'])
+def get_profiling_stats():
+    """Request profiling settings and counts"""
+    if request_profiler is None:
+        return jsonify({"success": False, "error": "Profiling is not enabled (set TROPOSCAN_PROFILE_DIR)"}), 404
+    return jsonify({"success": True, **request_profiler.describe()})
+
+@app.route('/api/admission', methods=['GET'])
+def get_admission_stats():
+    """Inference slots, per-priority queues, rate limiting and shedding counts"""
+    return jsonify({"success": True, **troposcope_model.admission.describe()})
+
+@app.route('/api/rethreshold', methods=['POST'])
+def rethreshold_prediction():
+    """Re-derive mask, coverage and risk at a new threshold from a cached or supplied probability map"""
+    data = request.get_json(silent=True) or {}
+    try:
+        threshold = float(data.get("threshold", 0.5))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "threshold must be a number"}), 400
+    if not 0.0 < threshold < 1.0:
+        return jsonify({"success": False, "error": "threshold must be between 0 and 1"}), 400
+    
+    if data.get("result_id"):
+        stored = troposcope_model.results.get(data["result_id"])
+        if stored is None:
+            return jsonify({"success": False, "error": "Result not found or expired from cache"}), 404
+        result = troposcope_model.rethreshold(stored.probabilities, threshold, stored.image_name,
+                                              stored.source_digest)
+        result["result_id"] = stored.result_id
+        result["model_version"] = stored.model_version
+        return jsonify(result)
+    
+    probability_map = data.get("probability_map") or {}
+    encoding = probability_map.get("encoding", "png")
+    if encoding not in PROBABILITY_DECODERS or not probability_map.get("data"):
+        return jsonify({"success": False, "error": "Provide result_id or probability_map {encoding, data}"}), 400
+    try:
+        # Same pixel limit as uploads, checked from the header before anything is expanded
+        quantized = PROBABILITY_DECODERS[encoding](base64.b64decode(probability_map["data"]),
+                                                   max_pixels=MAX_UPLOAD_PIXELS)
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Could not decode probability map: {e}"}), 400
+    return jsonify(troposcope_model.rethreshold(quantized, threshold))
+
 @app.route('/api/detect', methods=['POST'])
 def detect_clusters():
     """Main detection endpoint for uploaded images"""
     try:
-        # Check if image file is provided
-        if 'image' not in request.files:
-            return jsonify({"success": False, "error": "No image file provided"}), 400
-        
-        image_file = request.files['image']
-        
-        if image_file.filename == '':
-            return jsonify({"success": False, "error": "No file selected"}), 400
-        
-        # Save uploaded file temporarily
-        temp_image_path = f"temp_upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        image_file.save(temp_image_path)
-        
         try:
-            # Process image
-            result = troposcope_model.predict_image(temp_image_path)
-            return jsonify(result)
+            # Parsing the upload comes first: it is what enforces the size and format limits
+            decoded, filename = read_uploaded_image()
+            options = requested_prediction_options()
+        except UploadRejected as e:
+            return jsonify({"success": False, "error": str(e)}), e.status
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        finally:
-            # Clean up uploaded file
-            if os.path.exists(temp_image_path):
-                os.remove(temp_image_path)
+        # Process image straight from memory; nothing is written to disk
+        reuse = {}
+        with admitted("operational"):
+            result = troposcope_model.predict_image(filename, decoded=decoded, publish_alert=True, reuse=reuse,
+                                                    **options)
+        return prediction_response(result, reuse)
         
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -788,8 +1536,15 @@ def process_sample_image(sample_id):
         if not os.path.exists(sample_path):
             return jsonify({"success": False, "error": "Sample image file not found"}), 404
         
+        try:
+            options = requested_prediction_options()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
         # Process the sample image
-        result = troposcope_model.predict_image(sample_path)
+        reuse = {}
+        with admitted("demo"):
+            result = troposcope_model.predict_image(sample_path, reuse=reuse, **options)
         
         if result["success"]:
             # Add sample-specific metadata
@@ -807,10 +1562,12 @@ def process_sample_image(sample_id):
             
             print(f"✅ Sample analysis complete: {sample['name']} | Risk: {result['risk_data']['risk_level']} | Expected: {sample['risk_level']}")
             
-            return jsonify(result)
+            return prediction_response(result, reuse)
         else:
             return jsonify({"success": False, "error": "Failed to process sample image"}), 500
         
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     except Exception as e:
         print(f"❌ Error processing sample {sample_id}: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
@@ -895,7 +1652,8 @@ def process_case_study(case_id):
                 print(f"🎯 PROOF: This demonstrates actual AI model detection on real satellite data")
                 
                 # Process the image with REAL AI model - this is the actual proof
-                result = troposcope_model.predict_image(sample_path)
+                with admitted("case_study"):
+                    result = troposcope_model.predict_image(sample_path)
                 
                 if result["success"]:
                     # Add the PROOF metadata - this is what makes it real
@@ -959,6 +1717,8 @@ def process_case_study(case_id):
         
         return jsonify(mock_result)
         
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -966,102 +1726,91 @@ def process_case_study(case_id):
 def upload_case_study():
     """Process an uploaded image and generate a case study analysis"""
     try:
-        # Check if image file is provided
-        if 'image' not in request.files:
-            return jsonify({"success": False, "error": "No image file provided"}), 400
+        try:
+            decoded, filename = read_uploaded_image()
+        except UploadRejected as e:
+            return jsonify({"success": False, "error": str(e)}), e.status
         
-        image_file = request.files['image']
+        print(f"🔬 CUSTOM IMAGE CASE STUDY: Processing uploaded image: {filename}")
+        print(f"🎯 REAL-TIME PROOF: Demonstrating AI model on user-provided satellite data")
         
-        if image_file.filename == '':
-            return jsonify({"success": False, "error": "No file selected"}), 400
+        # Capture real processing start time
+        processing_start_time = datetime.now()
+        print(f"🕐 AI Model processing started at: {processing_start_time.strftime('%H:%M:%S UTC')}")
         
-        # Save uploaded file temporarily
-        temp_image_path = f"temp_upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        image_file.save(temp_image_path)
+        # Process image with real AI model
+        with admitted("case_study"):
+            result = troposcope_model.predict_image(filename, decoded=decoded)
         
-        try:
-            print(f"🔬 CUSTOM IMAGE CASE STUDY: Processing uploaded image: {image_file.filename}")
-            print(f"🎯 REAL-TIME PROOF: Demonstrating AI model on user-provided satellite data")
+        # Capture real processing end time
+        processing_end_time = datetime.now()
+        processing_duration = (processing_end_time - processing_start_time).total_seconds()
+        print(f"🕐 AI Model processing completed at: {processing_end_time.strftime('%H:%M:%S UTC')}")
+        print(f"⏱️  Processing duration: {processing_duration:.2f} seconds")
+        
+        if result["success"]:
+            # Generate realistic timing scenario based on actual processing
+            # Simulate: AI detected at actual processing time, traditional methods would alert later
+            ai_detection_time = processing_end_time
             
-            # Capture real processing start time
-            processing_start_time = datetime.now()
-            print(f"🕐 AI Model processing started at: {processing_start_time.strftime('%H:%M:%S UTC')}")
+            # Calculate realistic early detection advantage (2-4 hours typical for AI vs traditional)
+            # Base the early detection on risk level and model confidence
+            confidence = result["risk_data"].get("confidence", 85)
+            risk_level = result["risk_data"].get("risk_level", "moderate")
             
-            # Process image with real AI model
-            result = troposcope_model.predict_image(temp_image_path)
+            # Higher confidence and risk = more early detection advantage
+            if risk_level == "high" and confidence > 90:
+                early_hours = 3.5 + (confidence - 90) * 0.1  # 3.5-4.5 hours
+            elif risk_level == "high":
+                early_hours = 2.5 + (confidence - 70) * 0.05  # 2.5-3.5 hours  
+            elif risk_level == "moderate" and confidence > 85:
+                early_hours = 2.0 + (confidence - 85) * 0.1   # 2.0-3.0 hours
+            else:
+                early_hours = 1.5 + (confidence - 60) * 0.02  # 1.5-2.0 hours
             
-            # Capture real processing end time
-            processing_end_time = datetime.now()
-            processing_duration = (processing_end_time - processing_start_time).total_seconds()
-            print(f"🕐 AI Model processing completed at: {processing_end_time.strftime('%H:%M:%S UTC')}")
-            print(f"⏱️  Processing duration: {processing_duration:.2f} seconds")
+            # Simulate traditional detection time (IMD alert would come later)
+            traditional_alert_time = ai_detection_time + timedelta(hours=early_hours)
             
-            if result["success"]:
-                # Generate realistic timing scenario based on actual processing
-                # Simulate: AI detected at actual processing time, traditional methods would alert later
-                ai_detection_time = processing_end_time
-                
-                # Calculate realistic early detection advantage (2-4 hours typical for AI vs traditional)
-                # Base the early detection on risk level and model confidence
-                confidence = result["risk_data"].get("confidence", 85)
-                risk_level = result["risk_data"].get("risk_level", "moderate")
-                
-                # Higher confidence and risk = more early detection advantage
-                if risk_level == "high" and confidence > 90:
-                    early_hours = 3.5 + (confidence - 90) * 0.1  # 3.5-4.5 hours
-                elif risk_level == "high":
-                    early_hours = 2.5 + (confidence - 70) * 0.05  # 2.5-3.5 hours  
-                elif risk_level == "moderate" and confidence > 85:
-                    early_hours = 2.0 + (confidence - 85) * 0.1   # 2.0-3.0 hours
-                else:
-                    early_hours = 1.5 + (confidence - 60) * 0.02  # 1.5-2.0 hours
-                
-                # Simulate traditional detection time (IMD alert would come later)
-                traditional_alert_time = ai_detection_time + timedelta(hours=early_hours)
-                
-                print(f"🤖 AI Detection Time: {ai_detection_time.strftime('%H:%M UTC')}")
-                print(f"🏛️  Traditional Alert Time: {traditional_alert_time.strftime('%H:%M UTC')}")
-                print(f"⚡ Early Detection Advantage: {early_hours:.1f} hours")
-                
-                # Add case study metadata for uploaded image
-                result["case_study"] = {
-                    "name": f"Real-time Analysis - {image_file.filename}",
-                    "date": processing_end_time.strftime("%Y-%m-%d"),
-                    "ai_detection_time": ai_detection_time.strftime("%H:%M UTC"),
-                    "imd_alert_time": traditional_alert_time.strftime("%H:%M UTC"),
-                    "early_detection_hours": round(early_hours, 1),
-                    "actual_landfall": "Real-time Analysis",
-                    "severity": "Severe Cyclonic Storm" if result["risk_data"]["risk_level"] == "high" else "Cyclonic Storm",
-                    "wind_speed": f"{120 + int(confidence/5)}-{150 + int(confidence/4)} km/h" if result["risk_data"]["risk_level"] == "high" else f"{80 + int(confidence/10)}-{110 + int(confidence/8)} km/h",
-                    "location": "User Upload Analysis",
-                    "image_filename": image_file.filename,
-                    "model_type": result["model_type"],
-                    "processing_time_seconds": round(processing_duration, 2),
-                    "real_time_stamp": processing_end_time.isoformat(),
-                    "validation_message": f"🎯 REAL AI DETECTION: Model processed '{image_file.filename}' at {ai_detection_time.strftime('%H:%M UTC')} (took {processing_duration:.1f}s) | Traditional methods would alert at {traditional_alert_time.strftime('%H:%M UTC')} | AI Advantage: {early_hours:.1f} hours",
-                    "proof_statement": f"✅ LIVE PROOF: AI Model analyzed '{image_file.filename}' in {processing_duration:.1f} seconds, demonstrating {early_hours:.1f}+ hour early detection advantage over traditional methods"
-                }
-                
-                # Mark as real-time validation with actual timing data
-                result["risk_data"]["real_time_validation"] = True
-                result["risk_data"]["uploaded_image"] = image_file.filename
-                result["risk_data"]["proof_type"] = "REAL_TIME_AI_MODEL_ON_UPLOADED_DATA"
-                result["risk_data"]["processing_duration_seconds"] = processing_duration
-                result["risk_data"]["early_detection_proven"] = f"{early_hours:.1f} hours"
-                result["risk_data"]["real_timing_basis"] = f"Based on actual AI processing at {ai_detection_time.strftime('%H:%M:%S UTC')}"
-                
-                # Enhanced prediction for uploaded image with real timing
-                result["risk_data"]["prediction"] = f"🌪️ REAL-TIME AI ANALYSIS: Processed '{image_file.filename}' in {processing_duration:.1f} seconds at {ai_detection_time.strftime('%H:%M UTC')}. {result['risk_data']['prediction']} | 🎯 PROVEN EARLY WARNING: AI detection provides {early_hours:.1f} hours advantage over traditional methods (would alert at {traditional_alert_time.strftime('%H:%M UTC')})."
-                
-                return jsonify(result)
-            else:
-                return jsonify({"success": False, "error": "Failed to process image"}), 500
-        
-        finally:
-            # Clean up uploaded file
-            if os.path.exists(temp_image_path):
-                os.remove(temp_image_path)
+            print(f"🤖 AI Detection Time: {ai_detection_time.strftime('%H:%M UTC')}")
+            print(f"🏛️  Traditional Alert Time: {traditional_alert_time.strftime('%H:%M UTC')}")
+            print(f"⚡ Early Detection Advantage: {early_hours:.1f} hours")
+            
+            # Add case study metadata for uploaded image
+            result["case_study"] = {
+                "name": f"Real-time Analysis - {filename}",
+                "date": processing_end_time.strftime("%Y-%m-%d"),
+                "ai_detection_time": ai_detection_time.strftime("%H:%M UTC"),
+                "imd_alert_time": traditional_alert_time.strftime("%H:%M UTC"),
+                "early_detection_hours": round(early_hours, 1),
+                "actual_landfall": "Real-time Analysis",
+                "severity": "Severe Cyclonic Storm" if result["risk_data"]["risk_level"] == "high" else "Cyclonic Storm",
+                "wind_speed": f"{120 + int(confidence/5)}-{150 + int(confidence/4)} km/h" if result["risk_data"]["risk_level"] == "high" else f"{80 + int(confidence/10)}-{110 + int(confidence/8)} km/h",
+                "location": "User Upload Analysis",
+                "image_filename": filename,
+                "model_type": result["model_type"],
+                "processing_time_seconds": round(processing_duration, 2),
+                "real_time_stamp": processing_end_time.isoformat(),
+                "validation_message": f"🎯 REAL AI DETECTION: Model processed '{filename}' at {ai_detection_time.strftime('%H:%M UTC')} (took {processing_duration:.1f}s) | Traditional methods would alert at {traditional_alert_time.strftime('%H:%M UTC')} | AI Advantage: {early_hours:.1f} hours",
+                "proof_statement": f"✅ LIVE PROOF: AI Model analyzed '{filename}' in {processing_duration:.1f} seconds, demonstrating {early_hours:.1f}+ hour early detection advantage over traditional methods"
+            }
+            
+            # Mark as real-time validation with actual timing data
+            result["risk_data"]["real_time_validation"] = True
+            result["risk_data"]["uploaded_image"] = filename
+            result["risk_data"]["proof_type"] = "REAL_TIME_AI_MODEL_ON_UPLOADED_DATA"
+            result["risk_data"]["processing_duration_seconds"] = processing_duration
+            result["risk_data"]["early_detection_proven"] = f"{early_hours:.1f} hours"
+            result["risk_data"]["real_timing_basis"] = f"Based on actual AI processing at {ai_detection_time.strftime('%H:%M:%S UTC')}"
+            
+            # Enhanced prediction for uploaded image with real timing
+            result["risk_data"]["prediction"] = f"🌪️ REAL-TIME AI ANALYSIS: Processed '{filename}' in {processing_duration:.1f} seconds at {ai_detection_time.strftime('%H:%M UTC')}. {result['risk_data']['prediction']} | 🎯 PROVEN EARLY WARNING: AI detection provides {early_hours:.1f} hours advantage over traditional methods (would alert at {traditional_alert_time.strftime('%H:%M UTC')})."
+            
+            return jsonify(result)
+        else:
+                    return jsonify({"success": False, "error": "Failed to process image"}), 500
         
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -1071,15 +1820,29 @@ if __name__ == '__main__':
     print(f"📁 Mainbackend path: {mainbackend_path}")
     print(f"🤖 Model available: {REAL_MODEL_AVAILABLE}")
     print(f"📍 Model path: {troposcope_model.model_path if REAL_MODEL_AVAILABLE else 'N/A'}")
-    print(f"✅ Model loaded: {troposcope_model.model_loaded}")
+    print(f"✅ Model state: {troposcope_model.state}")
     print("="*50)
     print("🚀 Starting server on http://localhost:5000")
     print("📊 Endpoints:")
     print("   • GET  /api/health - Server health check")
+    print("   • GET  /api/live - Liveness probe")
+    print("   • GET  /api/ready - Readiness probe (model loaded and warmed up)")
     print("   • POST /api/detect - Upload and analyze images")
+    print("   • POST /api/rethreshold - Re-derive mask/risk at a new threshold without inference")
+    print("   • GET  /api/results/<id>/geojson - Cluster outlines of a cached result as GeoJSON")
+    print("   • GET  /tiles/<layer>/<z>/<x>/<y>.png - XYZ overlay/probability tiles (?result=<id>)")
+    print("   • GET  /api/alerts/stream - Server-Sent Events push of risk alerts (Last-Event-ID replay)")
+    print("   • GET  /api/alerts - Recent alerts and subscriber statistics")
+    print("   • GET  /api/ingest/stats - Drop-folder ingest stage queues and throughput")
+    print("   • GET  /api/profiling - Request profiling settings (X-TroposCan-Profile header)")
+    print("   • GET  /api/admission - Admission control slots, queues and shedding per priority")
     print("   • GET  /api/sample-images - Get available samples")
     print("   • POST /api/sample/<id> - Analyze sample images")
     print("   • GET  /api/model-info - Get model information")
+    print("   • GET  /api/models - List model versions with memory/latency stats")
+    print("   • POST /api/models - Load a new model version in the background")
+    print("   • POST /api/models/<name>/<version>/activate - Swap the active model")
+    print("   • POST /api/models/shadow - Mirror traffic to a candidate model")
     print("   • GET  /api/case-studies - Get historical cyclone case studies")
     print("   • POST /api/case-study/<id> - Process historical case study")
     print("   • POST /api/upload-case-study - Generate case study from uploaded image")
@@ -1088,4 +1851,7 @@ if __name__ == '__main__':
     print("   • POST /api/sample/<id> - Process sample image")
     print("-"*50)
     
+    # The debug reloader runs this module in a parent and a child process; only the child serves
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_ingest_pipeline()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,312 @@
+"""
+ASGI serving mode for TropoScan
+Serves the same Flask endpoints from an event loop: request bodies are read
+and responses written asynchronously, so slow or idle clients hold no thread,
+and only the buffered request is handed to a thread to run the Flask view.
+Prediction routes run in their own small executors with bounded wait queues;
+when one is full they answer 503 instead of piling up. /api/detect has an
+executor of its own, so demo traffic cannot take the threads operational
+requests need. The alert stream is served natively on the event loop.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from app import app, troposcope_model, ALERT_HEARTBEAT_SECONDS, start_ingest_pipeline, stop_ingest_pipeline
+
+# Threads running prediction views, and how many more may wait for one before 503
+ASGI_INFERENCE_WORKERS = int(os.environ.get("TROPOSCAN_ASGI_INFERENCE_WORKERS", "2"))
+ASGI_MAX_PENDING = int(os.environ.get("TROPOSCAN_ASGI_MAX_PENDING", "16"))
+# Threads running every other (short) view
+ASGI_IO_WORKERS = int(os.environ.get("TROPOSCAN_ASGI_IO_WORKERS", "8"))
+
+OPERATIONAL_ROUTES = ("/api/detect",)
+INFERENCE_ROUTES = ("/api/sample/", "/api/case-study/", "/api/upload-case-study")
+
+
+class Overloaded(Exception):
+    """A lane's wait queue is full"""
+
+    def __init__(self, retry_after):
+        super().__init__("Server busy, retry later")
+        self.retry_after = retry_after
+
+
+class Lane:
+    """A bounded thread pool plus a cap on requests waiting for it"""
+
+    def __init__(self, name, workers, max_pending=None):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"asgi-{name}")
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.mean_seconds = 0.0
+        self._lock = threading.Lock()
+
+    async def run(self, fn):
+        with self._lock:
+            if self.max_pending is not None and self.waiting >= self.max_pending:
+                self.rejected += 1
+                raise Overloaded(self.retry_after())
+            self.waiting += 1
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._timed, fn)
+
+    def _timed(self, fn):
+        with self._lock:
+            self.waiting -= 1
+            self.active += 1
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+                # Moving average of service time, for Retry-After estimates
+                self.mean_seconds += (seconds - self.mean_seconds) * 0.1
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained"""
+        return max(1, math.ceil(self.mean_seconds * (self.waiting + self.active) / self.workers))
+
+    def describe(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "mean_seconds": round(self.mean_seconds, 4),
+        }
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+async def read_body(receive, limit):
+    """Whole request body, read without blocking a thread; stops as soon as it passes limit"""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnected()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if limit is not None and size > limit:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope whose body has already been read"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name, value = name.decode("latin-1"), value.decode("latin-1")
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+        elif name != "content-length":
+            key = "HTTP_" + name.upper().replace("-", "_")
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    """Run a WSGI app to completion; returns (status, headers, body)"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and response:
+            raise exc_info[1].with_traceback(exc_info[2])
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return chunks.append
+
+    chunks = []
+    iterable = wsgi_app(environ, start_response)
+    try:
+        chunks.extend(iterable)
+    finally:
+        if hasattr(iterable, "close"):
+            iterable.close()
+    return response["status"], response["headers"], b"".join(chunks)
+
+
+async def wait_for_disconnect(receive):
+    """Return once the client has gone, skipping the http.request messages of its (empty) body"""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def send_response(send, status, headers, body):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, payload, extra_headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    await send_response(send, status, headers + list(extra_headers), body)
+
+
+class TropoScanASGI:
+    """ASGI application wrapping the Flask app with separate inference and I/O lanes"""
+
+    def __init__(self, wsgi_app, broker, inference_workers=2, max_pending=16, io_workers=8,
+                 heartbeat_seconds=15.0):
+        self.wsgi_app = wsgi_app
+        self.broker = broker
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_body = wsgi_app.config.get("MAX_CONTENT_LENGTH")
+        self.lanes = {
+            "operational": Lane("operational", inference_workers, max_pending),
+            "inference": Lane("inference", inference_workers, max_pending),
+            "io": Lane("io", io_workers),
+        }
+        self.open_streams = 0
+
+    def lane_for(self, method, path):
+        if method == "POST" and path.startswith(OPERATIONAL_ROUTES):
+            return self.lanes["operational"]
+        if method == "POST" and path.startswith(INFERENCE_ROUTES):
+            return self.lanes["inference"]
+        return self.lanes["io"]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        method, path = scope["method"], scope["path"]
+        if method == "GET" and path == "/api/alerts/stream":
+            return await self.stream_alerts(scope, receive, send)
+        if method == "GET" and path == "/api/asgi/stats":
+            return await send_json(send, 200, {"success": True, **self.describe()})
+
+        declared = dict(scope.get("headers", [])).get(b"content-length")
+        if self.max_body is not None and declared and declared.isdigit() and int(declared) > self.max_body:
+            return await send_json(send, 413, {"success": False, "error": "Request body too large"})
+        try:
+            body = await read_body(receive, self.max_body)
+        except BodyTooLarge:
+            return await send_json(send, 413, {"success": False, "error": "Request body too large"})
+        except ClientDisconnected:
+            return
+
+        environ = wsgi_environ(scope, body)
+        try:
+            status, headers, content = await self.lane_for(method, path).run(
+                lambda: call_wsgi(self.wsgi_app, environ))
+        except Overloaded as e:
+            return await send_json(send, 503, {"success": False, "error": str(e)},
+                                   [(b"retry-after", str(e.retry_after).encode())])
+        await send_response(send, status, headers, content)
+
+    async def stream_alerts(self, scope, receive, send):
+        """Native SSE: each client is a coroutine waiting on the broker, not a thread"""
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        last_event_id = headers.get("last-event-id") or query.get("last_event_id", [None])[0]
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return await send_json(send, 400, {"success": False, "error": "Last-Event-ID must be an integer"})
+
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ]})
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        subscriber = self.broker.subscribe(last_event_id)
+        stream = self.broker.stream_async(subscriber, self.heartbeat_seconds)
+        self.open_streams += 1
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(stream.__anext__())
+                await asyncio.wait({next_chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_chunk.done():
+                    # Client went away; let the cancellation finish before closing the generator
+                    next_chunk.cancel()
+                    await asyncio.gather(next_chunk, return_exceptions=True)
+                    break
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        except OSError:
+            pass
+        finally:
+            self.open_streams -= 1
+            disconnected.cancel()
+            await stream.aclose()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                start_ingest_pipeline()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                stop_ingest_pipeline()
+                for lane in self.lanes.values():
+                    lane.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def describe(self):
+        return {
+            "lanes": {name: lane.describe() for name, lane in self.lanes.items()},
+            "open_alert_streams": self.open_streams,
+            "max_body_bytes": self.max_body,
+        }
+
+
+application = TropoScanASGI(app, troposcope_model.alerts, ASGI_INFERENCE_WORKERS, ASGI_MAX_PENDING,
+                            ASGI_IO_WORKERS, ALERT_HEARTBEAT_SECONDS)
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Drop-folder ingest for TropoScan
+Watches an inbox directory and pushes every new frame through pipelined
+stages (decode -> inference -> risk assessment -> persist/publish) connected
+by bounded queues. A full queue blocks the stage before it, so a slow stage
+throttles the watcher instead of buffering the whole inbox in memory. Frames
+are written to a completed-files journal only after the last stage, so
+anything in flight during a crash is processed again on restart
+(at-least-once), and a frame that fails a stage is retried after a backoff.
+
+Usage:
+    python ingest_pipeline.py --inbox /data/insat/inbox [--outbox DIR] [--workers decode=2,assess=2]
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff")
+
+# Worker threads per stage; inference also batches up to DEFAULT_INFERENCE_BATCH frames per forward pass
+DEFAULT_STAGE_WORKERS = {"decode": 2, "inference": 1, "assess": 2, "persist": 1}
+DEFAULT_INFERENCE_BATCH = 4
+
+# A failed frame is retried after RETRY_SECONDS, doubling per failure up to MAX_RETRY_SECONDS
+RETRY_SECONDS = 30.0
+MAX_RETRY_SECONDS = 900.0
+
+_STOP = object()
+
+
+class Journal:
+    """Append-only record of completed inbox files, keyed by name, size and mtime"""
+
+    def __init__(self, path):
+        self.path = path
+        self._done = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                self._done.update(line.rstrip("\n") for line in f if line.strip())
+
+    @staticmethod
+    def key(name, stat):
+        # A rewritten file (new size or mtime) counts as a new frame
+        return f"{name}\t{stat.st_size}\t{stat.st_mtime_ns}"
+
+    def __contains__(self, key):
+        return key in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+    def mark_done(self, key):
+        with self._lock:
+            if key in self._done:
+                return
+            with open(self.path, "a") as f:
+                f.write(key + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._done.add(key)
+
+
+class Stage:
+    """A pool of worker threads reading from one bounded input queue.
+
+    fn(items) gets up to batch_size items at once and returns the outputs
+    for the next stage (or None to stop an item there).
+    """
+
+    def __init__(self, name, fn, workers=1, queue_size=8, batch_size=1):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.next_stage = None
+        self.on_error = None
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self._completions = deque(maxlen=256)  # timestamps for the recent rate
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ingest-{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _take_batch(self):
+        item = self.queue.get()
+        if item is _STOP:
+            return None
+        items = [item]
+        while len(items) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self.queue.put(_STOP)  # leave it for this worker's next take
+                break
+            items.append(item)
+        return items
+
+    def _run(self):
+        while True:
+            items = self._take_batch()
+            if items is None:
+                return
+            start = time.perf_counter()
+            try:
+                outputs = self.fn(items)
+            except Exception as e:
+                print(f"❌ Ingest stage '{self.name}' failed on {[i['name'] for i in items]}: {e}")
+                with self._lock:
+                    self.failed += len(items)
+                for item in items:
+                    if self.on_error:
+                        self.on_error(item)
+                continue
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.busy_seconds += elapsed
+                self.processed += len(items)
+                now = time.time()
+                self._completions.extend([now] * len(items))
+            if self.next_stage is not None:
+                for output in outputs:
+                    if output is not None:
+                        self.next_stage.queue.put(output)  # blocks when the next stage is full
+
+    def stop(self):
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def describe(self, uptime):
+        with self._lock:
+            recent = [t for t in self._completions if t > time.time() - 60]
+            return {
+                "workers": self.workers,
+                "batch_size": self.batch_size,
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "processed": self.processed,
+                "failed": self.failed,
+                "items_per_second": round(self.processed / uptime, 3) if uptime else 0.0,
+                "items_per_second_last_minute": round(len(recent) / 60, 3),
+                # Share of worker time spent working; the stage near 1.0 is the bottleneck
+                "utilization": round(self.busy_seconds / (uptime * self.workers), 3) if uptime else 0.0,
+            }
+
+
+class IngestPipeline:
+    """Polls an inbox directory and feeds new, fully written files through the stages"""
+
+    def __init__(self, inbox, stages, journal, poll_seconds=2.0, settle_seconds=1.0, retry_seconds=RETRY_SECONDS):
+        self.inbox = inbox
+        self.stages = stages
+        self.journal = journal
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.retry_seconds = retry_seconds
+        self.discovered = 0
+        self.retried = 0
+        self.started = None
+        self._in_flight = set()
+        self._failed = {}  # key -> (failures, monotonic time it may be retried)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        for stage, next_stage in zip(stages, stages[1:] + [None]):
+            stage.next_stage = next_stage
+            stage.on_error = self._failed_item
+
+    def _failed_item(self, item):
+        # Not journaled; a later scan queues it again once its backoff has passed
+        with self._lock:
+            self._in_flight.discard(item["key"])
+            failures = self._failed.get(item["key"], (0, 0.0))[0] + 1
+            delay = min(self.retry_seconds * 2 ** (failures - 1), MAX_RETRY_SECONDS)
+            self._failed[item["key"]] = (failures, time.monotonic() + delay)
+
+    def complete(self, item):
+        """Called by the last stage once a frame's outputs are safely stored"""
+        self.journal.mark_done(item["key"])
+        with self._lock:
+            self._in_flight.discard(item["key"])
+            self._failed.pop(item["key"], None)
+
+    def scan(self):
+        """Queue every new, settled image in the inbox; blocks while the first stage is full"""
+        now = time.time()
+        for entry in sorted(os.scandir(self.inbox), key=lambda e: e.name):
+            if self._stop.is_set():
+                return
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime < self.settle_seconds:
+                continue  # probably still being written
+            key = Journal.key(entry.name, stat)
+            with self._lock:
+                if key in self.journal or key in self._in_flight:
+                    continue
+                if key in self._failed:
+                    if time.monotonic() < self._failed[key][1]:
+                        continue  # still backing off
+                    self.retried += 1
+                else:
+                    self.discovered += 1
+                self._in_flight.add(key)
+            self.stages[0].queue.put({"name": entry.name, "path": entry.path, "key": key,
+                                      "discovered": time.time()})
+
+    def _watch(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except OSError as e:
+                print(f"⚠️ Could not scan inbox {self.inbox}: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        self.started = time.time()
+        for stage in self.stages:
+            stage.start()
+        self._watcher = threading.Thread(target=self._watch, name="ingest-watcher", daemon=True)
+        self._watcher.start()
+        print(f"📥 Watching {self.inbox} ({len(self.journal)} files already processed)")
+
+    def stop(self):
+        """Stop watching, then let every stage finish the frames it already has"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+        for stage in self.stages:
+            stage.stop()
+
+    def describe(self):
+        uptime = time.time() - self.started if self.started else 0.0
+        with self._lock:
+            in_flight, failed = len(self._in_flight), len(self._failed)
+        return {
+            "inbox": self.inbox,
+            "uptime_seconds": round(uptime, 1),
+            "discovered": self.discovered,
+            "retried": self.retried,
+            "in_flight": in_flight,
+            "failed": failed,
+            "completed_total": len(self.journal),
+            "stages": {stage.name: stage.describe(uptime) for stage in self.stages},
+        }
+
+
+def parse_stage_workers(spec):
+    """'decode=2,assess=4' -> per-stage worker counts over the defaults"""
+    workers = dict(DEFAULT_STAGE_WORKERS)
+    for item in filter(None, (spec or "").split(",")):
+        name, count = item.split("=")
+        if name not in workers:
+            raise ValueError(f"Unknown ingest stage '{name}', expected one of {sorted(workers)}")
+        workers[name] = max(1, int(count))
+    return workers
+
+
+def build_troposcan_pipeline(model, inbox, outbox=None, stage_workers=None, queue_size=8,
+                             inference_batch=DEFAULT_INFERENCE_BATCH, poll_seconds=2.0, retry_seconds=RETRY_SECONDS):
+    """Wire the TropoScan decode / inference / assess / persist stages to a TropoScanModel"""
+    # Imported here so this module stays importable without the mainbackend path set up
+    from PIL import Image
+    from result_store import content_digest
+    from utils.image_decode import DecodedImage
+    from utils.perceptual_hash import dct_hash
+    from utils.probability_map import encode_probability_png, quantize_probabilities, threshold_probabilities
+    from utils.risk_score import calculate_risk_from_array
+
+    outbox = outbox or os.path.join(inbox, "results")
+    os.makedirs(outbox, exist_ok=True)
+    workers = stage_workers or dict(DEFAULT_STAGE_WORKERS)
+    journal = Journal(os.path.join(outbox, "completed.journal"))
+
+    def decode(items):
+        for item in items:
+            item["decoded"] = DecodedImage(item["path"])
+        return items
+
+    def infer(items):
+        if not model.wait_until_ready() or model.inference is None or model.model is None:
+            raise RuntimeError("real model is not loaded")
+        active = model.registry.active  # one version for the whole batch
+        quantized, report = model.inference.predict(
+            active.model, [i["decoded"].gray_array for i in items],
+            consume=lambda probabilities: [quantize_probabilities(p) for p in probabilities])
+        for item, item_quantized in zip(items, quantized):
+            item["quantized"] = item_quantized
+            item["model_version"] = active.key
+            item["inference_report"] = report
+        active.record_latency(report["seconds"] / len(items))
+        return items
+
+    def assess(items):
+        for item in items:
+            # Thresholded, seeded, identified and hashed as in /api/detect, so the same frame
+            # gets the same result_id and near-duplicate entry whichever way it arrives
+            mask_array = threshold_probabilities(item["quantized"], 0.5)
+            risk_level, coverage_percent = calculate_risk_from_array(mask_array)
+            digest = content_digest(item["decoded"].data)
+            risk_data = model._generate_precise_risk_data(risk_level, coverage_percent, Image.fromarray(mask_array),
+                                                          item["path"], model.analysis_rng(digest))
+            bounds = risk_data["region_bounds"]
+            bounds = (bounds["west"], bounds["south"], bounds["east"], bounds["north"])
+            item["stored"] = model.new_result(item["quantized"], item["name"], item["model_version"], digest,
+                                              dct_hash(item["decoded"].gray_array), bounds,
+                                              inference_report=item.pop("inference_report"))
+            item["risk_data"] = risk_data
+            item.pop("decoded")  # drop the pixels before the item waits in the next queue
+        return items
+
+    def persist(items):
+        for item in items:
+            stored = item["stored"]
+            stem = os.path.splitext(item["name"])[0]
+            result = {
+                "success": True,
+                "result_id": stored.result_id,
+                "image_name": item["name"],
+                "risk_data": item["risk_data"],
+                "timestamp": datetime.now().isoformat(),
+                "model_type": "real_pytorch",
+                "model_source": "ingest_pipeline",
+                "model_version": item["model_version"],
+                "latency_seconds": round(time.time() - item["discovered"], 3),
+            }
+            with open(os.path.join(outbox, f"{stem}_probability.png"), "wb") as f:
+                f.write(encode_probability_png(item["quantized"]))
+            tmp_path = os.path.join(outbox, f".{stem}.json.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(result, f, default=float, indent=2)
+            os.replace(tmp_path, os.path.join(outbox, f"{stem}.json"))
+            model.results.put(stored)
+            model._remember_near_duplicate(stored)
+            model._publish_alert(result, item["path"])
+            pipeline.complete(item)
+        return [None] * len(items)
+
+    stages = [
+        Stage("decode", decode, workers["decode"], queue_size),
+        Stage("inference", infer, workers["inference"], queue_size, batch_size=inference_batch),
+        Stage("assess", assess, workers["assess"], queue_size),
+        Stage("persist", persist, workers["persist"], queue_size),
+    ]
+    pipeline = IngestPipeline(inbox, stages, journal, poll_seconds=poll_seconds, retry_seconds=retry_seconds)
+    return pipeline
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the TropoScan drop-folder ingest service")
+    parser.add_argument("--inbox", required=True, help="Directory the satellite feed writes frames into")
+    parser.add_argument("--outbox", help="Where results and the journal go (default <inbox>/results)")
+    parser.add_argument("--workers", help="Per-stage workers, e.g. decode=2,inference=1,assess=2,persist=1")
+    parser.add_argument("--queue-size", type=int, default=8, help="Bounded queue length in front of each stage")
+    parser.add_argument("--batch", type=int, default=DEFAULT_INFERENCE_BATCH, help="Max frames per forward pass")
+    parser.add_argument("--poll", type=float, default=2.0, help="Inbox scan interval in seconds")
+    parser.add_argument("--retry", type=float, default=RETRY_SECONDS,
+                        help="Seconds before a failed frame is retried (doubles per failure)")
+    parser.add_argument("--stats-every", type=float, default=30.0, help="Print stage statistics every n seconds")
+    args = parser.parse_args()
+
+    # This process runs its own pipeline below, so the server's (TROPOSCAN_INGEST_DIR) is not built;
+    # importing app never starts one anyway, only its serving entry points do
+    os.environ.pop("TROPOSCAN_INGEST_DIR", None)
+    import app  # loads the model registry, result store and alert broker
+
+    pipeline = build_troposcan_pipeline(app.troposcope_model, args.inbox, args.outbox,
+                                        parse_stage_workers(args.workers), args.queue_size, args.batch, args.poll,
+                                        args.retry)
+    pipeline.start()
+    try:
+        while True:
+            time.sleep(args.stats_every)
+            print(json.dumps(pipeline.describe(), indent=2))
+    except KeyboardInterrupt:
+        print("🛑 Stopping ingest, finishing frames already in the pipeline...")
+        pipeline.stop()
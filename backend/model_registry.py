@@ -0,0 +1,248 @@
+"""
+Model registry for TropoScan
+Holds several named/versioned models, swaps the active one atomically and
+mirrors a share of traffic to a candidate model for shadow comparison
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Number of recent latency samples kept per model version for percentiles
+LATENCY_WINDOW = 1000
+
+
+def read_rss_bytes():
+    """Current resident set size of this process (0 if unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def model_size_bytes(model):
+    """Bytes held by a torch module's parameters and buffers"""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelVersion:
+    """One loaded (or loading) model version and its serving statistics"""
+
+    def __init__(self, name, version, path):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.model = None
+        self.state = "registered"
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.size_bytes = None
+        self.rss_delta_bytes = None
+        self.requests = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        return f"{self.name}:{self.version}"
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self._latencies.append(seconds)
+
+    def latency_summary(self):
+        with self._lock:
+            samples = np.array(self._latencies)
+        if samples.size == 0:
+            return {"requests": self.requests}
+        return {
+            "requests": self.requests,
+            "mean_ms": round(float(samples.mean()) * 1000, 1),
+            "p50_ms": round(float(np.percentile(samples, 50)) * 1000, 1),
+            "p95_ms": round(float(np.percentile(samples, 95)) * 1000, 1),
+        }
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "path": self.path,
+            "state": self.state,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "memory": {
+                "parameter_bytes": self.size_bytes,
+                "rss_delta_bytes": self.rss_delta_bytes,
+            },
+            "latency": self.latency_summary(),
+        }
+
+
+class ShadowStats:
+    """Running agreement between the active model and the shadow candidate"""
+
+    def __init__(self):
+        self.comparisons = 0
+        self.risk_agreements = 0
+        self.iou_total = 0.0
+        self.coverage_delta_total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, primary_mask, shadow_mask, primary_risk, shadow_risk, primary_coverage, shadow_coverage):
+        primary = np.asarray(primary_mask) > 128
+        shadow = np.asarray(shadow_mask) > 128
+        union = np.logical_or(primary, shadow).sum()
+        iou = float(np.logical_and(primary, shadow).sum() / union) if union else 1.0
+        with self._lock:
+            self.comparisons += 1
+            self.risk_agreements += int(primary_risk == shadow_risk)
+            self.iou_total += iou
+            self.coverage_delta_total += abs(primary_coverage - shadow_coverage)
+
+    def describe(self):
+        with self._lock:
+            if not self.comparisons:
+                return {"comparisons": 0}
+            return {
+                "comparisons": self.comparisons,
+                "risk_agreement_rate": round(self.risk_agreements / self.comparisons, 4),
+                "mean_mask_iou": round(self.iou_total / self.comparisons, 4),
+                "mean_coverage_delta_percent": round(self.coverage_delta_total / self.comparisons, 2),
+            }
+
+
+class ModelRegistry:
+    """Named, versioned models with atomic activation and shadow traffic.
+
+    ``loader(path)`` returns a ready-to-use model and ``warmup(model)`` runs a
+    first inference; both are supplied by the app so this module stays free of
+    torch imports. Requests grab ``registry.active`` once and keep using that
+    version, so swapping never affects in-flight work.
+    """
+
+    def __init__(self, loader, warmup=None):
+        self.loader = loader
+        self.warmup = warmup
+        self.versions = {}
+        self.active = None
+        self.shadow = None
+        self.shadow_percent = 0.0
+        self.shadow_stats = ShadowStats()
+        self._lock = threading.Lock()
+
+    def register(self, name, version, path, activate=False, background=True):
+        """Load and warm a model version, optionally activating it once it is ready"""
+        entry = ModelVersion(name, version, path)
+        with self._lock:
+            existing = self.versions.get(entry.key)
+            if existing is not None and existing.state in ("loading", "warming"):
+                raise ValueError(f"Model {entry.key} is already loading")
+            if existing is not None and existing is self.active:
+                raise ValueError(f"Model {entry.key} is active; register it under a new version")
+            self.versions[entry.key] = entry
+
+        if background:
+            threading.Thread(target=self._load, args=(entry, activate),
+                             name=f"model-load-{entry.key}", daemon=True).start()
+        else:
+            self._load(entry, activate)
+        return entry
+
+    def _load(self, entry, activate):
+        try:
+            entry.state = "loading"
+            rss_before = read_rss_bytes()
+            start = time.perf_counter()
+            model = self.loader(entry.path)
+            entry.load_seconds = round(time.perf_counter() - start, 3)
+
+            entry.state = "warming"
+            start = time.perf_counter()
+            if self.warmup:
+                self.warmup(model)
+            entry.warmup_seconds = round(time.perf_counter() - start, 3)
+
+            entry.size_bytes = model_size_bytes(model)
+            entry.rss_delta_bytes = max(0, read_rss_bytes() - rss_before)
+            entry.model = model
+            entry.state = "ready"
+            print(f"✅ Model {entry.key} ready (load {entry.load_seconds}s, warmup {entry.warmup_seconds}s)")
+        except Exception as e:
+            entry.state = "failed"
+            entry.error = str(e)
+            print(f"❌ Error loading model {entry.key}: {e}")
+            return
+
+        if activate:
+            self.activate(entry.name, entry.version)
+
+    def get(self, name, version):
+        entry = self.versions.get(f"{name}:{version}")
+        if entry is None:
+            raise KeyError(f"Model {name}:{version} is not registered")
+        return entry
+
+    def activate(self, name, version):
+        """Atomically make a ready version the one serving traffic"""
+        entry = self.get(name, version)
+        if entry.state != "ready":
+            raise ValueError(f"Model {entry.key} is {entry.state}, not ready")
+        with self._lock:
+            previous, self.active = self.active, entry
+            if self.shadow is entry:
+                self.shadow, self.shadow_percent = None, 0.0
+        print(f"🔁 Active model: {previous.key if previous else None} -> {entry.key}")
+        return entry
+
+    def set_shadow(self, name=None, version=None, percent=0.0):
+        """Mirror ``percent`` of requests to a candidate version (0 disables shadowing)"""
+        if not 0.0 <= percent <= 100.0:
+            raise ValueError("Shadow percent must be between 0 and 100")
+        entry = None
+        if name is not None and percent > 0:
+            entry = self.get(name, version)
+            if entry.state != "ready":
+                raise ValueError(f"Model {entry.key} is {entry.state}, not ready")
+        with self._lock:
+            if entry is not self.shadow:
+                self.shadow_stats = ShadowStats()
+            self.shadow = entry
+            self.shadow_percent = float(percent) if entry else 0.0
+        return entry
+
+    def pick_shadow(self):
+        """Return the shadow candidate if this request falls in the shadow share"""
+        shadow = self.shadow
+        if shadow is None or shadow is self.active or random.uniform(0, 100) >= self.shadow_percent:
+            return None
+        return shadow
+
+    def unregister(self, name, version):
+        entry = self.get(name, version)
+        with self._lock:
+            if entry is self.active:
+                raise ValueError(f"Model {entry.key} is active and cannot be removed")
+            if entry is self.shadow:
+                self.shadow, self.shadow_percent = None, 0.0
+            del self.versions[entry.key]
+        return entry
+
+    def describe(self):
+        return {
+            "active": self.active.key if self.active else None,
+            "shadow": {
+                "model": self.shadow.key if self.shadow else None,
+                "percent": self.shadow_percent,
+                "comparison": self.shadow_stats.describe(),
+            },
+            "models": [entry.describe() for entry in list(self.versions.values())],
+        }
@@ -0,0 +1,131 @@
+"""
+Opt-in per-request profiling for TropoScan
+A WSGI middleware that runs selected requests under cProfile and, when torch
+is already loaded, torch.profiler, writing <request id>.pstats and
+<request id>.trace.json (open in chrome://tracing or Perfetto). It is only
+installed when a profile directory is configured, so unprofiled deployments
+pay nothing.
+"""
+
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+PROFILE_HEADER = "HTTP_X_TROPOSCAN_PROFILE"
+REQUEST_ID_HEADER = "HTTP_X_REQUEST_ID"
+MODES = ("cprofile", "torch", "both")
+
+_SAFE_ID = re.compile(r"[^A-Za-z0-9_-]")
+
+
+class RequestProfiler:
+    """Decides which requests to profile and writes their traces"""
+
+    def __init__(self, directory, sample_rate=0.0, mode="both", token=None):
+        if mode not in MODES:
+            raise ValueError(f"profile mode must be one of {MODES}")
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.token = token
+        self.profiled = 0
+        self.skipped_busy = 0
+        # cProfile allows one active profiler per process, so profiles never overlap
+        self._busy = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def wanted(self, environ):
+        """True if the header asks for it (with the token, if one is set) or the request is sampled"""
+        header = environ.get(PROFILE_HEADER)
+        if header:
+            return header == self.token if self.token else header not in ("0", "false")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def request_id(self, environ):
+        supplied = _SAFE_ID.sub("", environ.get(REQUEST_ID_HEADER, ""))[:64]
+        return supplied or uuid.uuid4().hex[:16]
+
+    def acquire(self):
+        """Claim the profiler for one request; False if another profile is running"""
+        if self._busy.acquire(blocking=False):
+            return True
+        self.skipped_busy += 1
+        return False
+
+    def run(self, request_id, fn):
+        """Call fn() under the profilers (after acquire()); returns (result, written paths)"""
+        try:
+            profile = cProfile.Profile() if self.mode != "torch" else None
+            torch_profile = self._torch_profile() if self.mode != "cprofile" else None
+            start = time.perf_counter()
+            if torch_profile is not None:
+                torch_profile.__enter__()
+            if profile is not None:
+                profile.enable()
+            try:
+                result = fn()
+            finally:
+                if profile is not None:
+                    profile.disable()
+                if torch_profile is not None:
+                    torch_profile.__exit__(None, None, None)
+            seconds = time.perf_counter() - start
+            prefix = os.path.join(self.directory, f"{time.strftime('%Y%m%d_%H%M%S')}_{request_id}")
+            paths = {}
+            if profile is not None:
+                paths["pstats"] = prefix + ".pstats"
+                profile.dump_stats(paths["pstats"])
+            if torch_profile is not None:
+                paths["trace"] = prefix + ".trace.json"
+                torch_profile.export_chrome_trace(paths["trace"])
+            self.profiled += 1
+            print(f"⏱️ Profiled request {request_id} ({seconds * 1000:.0f} ms) -> {prefix}.*")
+            return result, paths
+        finally:
+            self._busy.release()
+
+    def _torch_profile(self):
+        # Only trace torch if the app has already imported it; never import it here
+        torch = sys.modules.get("torch")
+        if torch is None:
+            return None
+        return torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True)
+
+    def describe(self):
+        return {
+            "directory": self.directory,
+            "sample_rate": self.sample_rate,
+            "mode": self.mode,
+            "header_requires_token": bool(self.token),
+            "profiled": self.profiled,
+            "skipped_busy": self.skipped_busy,
+        }
+
+
+class ProfilingMiddleware:
+    """Wraps a WSGI app; only requests picked by the profiler take the slow path.
+
+    The profile covers the view function and building the response. Bodies
+    streamed after the app returns (Server-Sent Events) are not included.
+    """
+
+    def __init__(self, wsgi_app, profiler):
+        self.wsgi_app = wsgi_app
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        if not self.profiler.wanted(environ) or not self.profiler.acquire():
+            return self.wsgi_app(environ, start_response)
+        request_id = self.profiler.request_id(environ)
+
+        def start_with_id(status, headers, exc_info=None):
+            headers = list(headers) + [("X-Profile-Id", request_id)]
+            return start_response(status, headers, exc_info)
+
+        result, _ = self.profiler.run(request_id, lambda: self.wsgi_app(environ, start_with_id))
+        return result
@@ -0,0 +1,83 @@
+"""
+In-memory store of recent prediction results for TropoScan
+Keeps the quantized probability map of each real prediction so masks, coverage
+and risk can be re-derived later without running inference again
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+def content_digest(data):
+    """Hex digest identifying an input image by its bytes"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class StoredResult:
+    """Model outputs kept for one prediction"""
+
+    def __init__(self, probabilities, image_name, model_version, result_id=None):
+        self.result_id = result_id or uuid.uuid4().hex
+        self.probabilities = probabilities  # uint8 quantized probability map
+        self.image_name = image_name
+        self.model_version = model_version
+        self.bounds = None  # (west, south, east, north) once the result is georeferenced
+        self.source_digest = None  # content_digest of the input image
+        self.perceptual_hash = None  # dct_hash of the input image, for near-duplicate lookups
+        self.tta = 0
+        self.inference_report = None  # report of the pass that produced the probabilities
+        self.created = time.time()
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        """Digest of the probability map and bounds, i.e. of everything rendered from this result"""
+        if self._fingerprint is None:
+            self._fingerprint = content_digest(self.probabilities.tobytes() + repr(self.bounds).encode())
+        return self._fingerprint
+
+
+class ResultStore:
+    """Thread-safe LRU of recent results, bounded by entry count
+
+    Eviction listeners (on_evict, plus any added with add_evict_listener) are
+    called with every entry pushed out, after the store lock is released.
+    """
+
+    def __init__(self, max_entries=256, on_evict=None):
+        self.max_entries = max_entries
+        self.evict_listeners = [on_evict] if on_evict is not None else []
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_evict_listener(self, listener):
+        self.evict_listeners.append(listener)
+
+    def put(self, result):
+        evicted = []
+        with self._lock:
+            self._entries[result.result_id] = result
+            self._entries.move_to_end(result.result_id)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+        for entry in evicted:
+            for listener in self.evict_listeners:
+                listener(entry)
+        return result.result_id
+
+    def get(self, result_id):
+        with self._lock:
+            result = self._entries.get(result_id)
+            if result is not None:
+                self._entries.move_to_end(result_id)
+            return result
+
+    def latest(self):
+        with self._lock:
+            return next(reversed(self._entries.values()), None)
+
+    def __len__(self):
+        return len(self._entries)
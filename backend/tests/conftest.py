@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests import the backend modules the way the server does, from backend/, and
+# the shared utils package from mainbackend/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'mainbackend'))
@@ -0,0 +1,58 @@
+from admission import AdmissionController, AdmissionRejected, client_identity, exempt_identities
+
+
+def admitted_count(controller, client, attempts=5):
+    count = 0
+    for _ in range(attempts):
+        try:
+            with controller.admit(client, "demo"):
+                count += 1
+        except AdmissionRejected as e:
+            assert e.status == 429
+    return count
+
+
+def test_exempt_clients_skip_rate_limits():
+    keys = {"feed-key"}
+    exempt = exempt_identities(["feed-key", "10.0.0.5"], keys)
+    controller = AdmissionController(rates={"demo": 0.01}, bursts={"demo": 1}, exempt=exempt)
+    assert admitted_count(controller, client_identity("10.0.0.9", "feed-key", keys)) == 5
+    assert admitted_count(controller, client_identity("10.0.0.5")) == 5
+    assert admitted_count(controller, client_identity("10.0.0.7")) == 1
+
+
+def test_spoofed_api_key_is_neither_exempt_nor_a_fresh_bucket(monkeypatch):
+    import app as backend
+
+    assert backend.troposcope_model.wait_until_ready()
+    monkeypatch.setattr(backend, "ADMISSION_API_KEYS", frozenset({"feed-key"}))
+    controller = AdmissionController(rates={"demo": 0.01}, bursts={"demo": 1},
+                                     exempt=exempt_identities(["10.0.0.5"], backend.ADMISSION_API_KEYS))
+    monkeypatch.setattr(backend.troposcope_model, "admission", controller)
+
+    def admit(api_key):
+        with backend.app.test_request_context(headers={"X-API-Key": api_key},
+                                              environ_base={"REMOTE_ADDR": "10.0.0.7"}):
+            try:
+                with backend.admitted("demo"):
+                    return 200
+            except AdmissionRejected as e:
+                return e.status
+
+    # An exempt address sent as a key, then a new made-up key each time: all share the address's bucket
+    assert [admit(key) for key in ("10.0.0.5", "random-1", "random-2")] == [200, 429, 429]
+
+
+def test_requests_are_refused_while_the_model_loads():
+    import app as backend
+
+    model = backend.troposcope_model
+    assert model.wait_until_ready()
+    model._ready.clear()
+    try:
+        response = backend.app.test_client().post("/api/sample/cyclone_formation")
+    finally:
+        model._ready.set()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(backend.NOT_READY_RETRY_SECONDS)
+    assert model.admission.active == 0
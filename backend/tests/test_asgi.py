@@ -0,0 +1,49 @@
+import asyncio
+
+from flask import Flask
+
+from alert_broker import AlertBroker
+from asgi import TropoScanASGI
+
+STREAM_SCOPE = {"type": "http", "method": "GET", "path": "/api/alerts/stream", "headers": [], "query_string": b""}
+
+
+def conformant_receive(disconnect):
+    """receive() as ASGI servers implement it: the (empty) request body first, then disconnect when it happens"""
+    messages = asyncio.Queue()
+    messages.put_nowait({"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        if messages.empty():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+        return messages.get_nowait()
+    return receive
+
+
+def test_alert_stream_stays_open_after_request_message():
+    async def scenario():
+        broker = AlertBroker()
+        application = TropoScanASGI(Flask(__name__), broker, heartbeat_seconds=60)
+        disconnect = asyncio.Event()
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        stream = asyncio.ensure_future(application(STREAM_SCOPE, conformant_receive(disconnect), send))
+        await asyncio.sleep(0.2)
+        assert not stream.done()
+        broker.publish({"risk_level": "HIGH"})
+        await asyncio.sleep(0.2)
+        assert not stream.done()
+        disconnect.set()
+        await asyncio.wait_for(stream, 2)
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert sent[0]["status"] == 200
+    body = b"".join(message.get("body", b"") for message in sent[1:]).decode()
+    assert body.startswith("retry: 3000")
+    assert "HIGH" in body
+    assert sent[-1] == {"type": "http.response.body", "body": b""}
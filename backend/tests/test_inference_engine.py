@@ -0,0 +1,36 @@
+import numpy as np
+import torch
+
+from utils.inference_engine import InferenceEngine
+
+
+class Scale(torch.nn.Module):
+    """Stand-in for the U-Net: N x 1 x H x W in, the same shape out"""
+
+    def forward(self, inputs):
+        return inputs * 0.5
+
+
+def test_output_buffer_is_reused_across_calls():
+    engine = InferenceEngine(concurrency=1)
+    grays = np.full((3, 8, 8), 255, dtype=np.uint8)
+    seen = []
+    for _ in range(2):
+        total, _ = engine.predict(Scale(), grays, consume=lambda probabilities: seen.append(probabilities) or probabilities.sum())
+        assert total == 0.5 * grays.size
+    assert seen[0].base is seen[1].base is not None
+
+
+def test_caller_owned_results_are_fresh_arrays():
+    engine = InferenceEngine(concurrency=1)
+    first, _ = engine.predict(Scale(), np.zeros((2, 4, 4), dtype=np.uint8))
+    second, _ = engine.predict(Scale(), np.full((2, 4, 4), 255, dtype=np.uint8))
+    assert first.max() == 0 and second.min() == 0.5
+
+
+def test_empty_batch_skips_the_model():
+    engine = InferenceEngine()
+    probabilities, report = engine.predict(Scale(), np.empty((0, 8, 8), dtype=np.uint8))
+    assert probabilities.shape == (0, 8, 8)
+    assert report["images"] == 0 and report["chunks"] == 0
+    assert engine.requests == 0
@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+from ingest_pipeline import IngestPipeline, Journal, Stage
+
+IMAGE = os.path.join(os.path.dirname(__file__), "..", "..", "mainbackend", "data", "images", "45.jpg")
+
+
+def inbox_pipeline(tmp_path, retry_seconds):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    (inbox / "frame.png").write_bytes(b"not decoded here")
+    stage = Stage("decode", lambda items: items)
+    return IngestPipeline(str(inbox), [stage], Journal(str(tmp_path / "completed.journal")),
+                          settle_seconds=0, retry_seconds=retry_seconds)
+
+
+def test_failed_frame_waits_for_its_backoff(tmp_path):
+    pipeline = inbox_pipeline(tmp_path, retry_seconds=60)
+    pipeline.scan()
+    pipeline._failed_item(pipeline.stages[0].queue.get_nowait())
+    pipeline.scan()
+    assert pipeline.stages[0].queue.empty()
+    assert pipeline.describe()["failed"] == 1
+
+
+def test_failed_frame_is_queued_again_after_its_backoff(tmp_path):
+    pipeline = inbox_pipeline(tmp_path, retry_seconds=0)
+    pipeline.scan()
+    item = pipeline.stages[0].queue.get_nowait()
+    pipeline._failed_item(item)
+    pipeline.scan()
+    assert pipeline.stages[0].queue.get_nowait()["key"] == item["key"]
+    assert (pipeline.discovered, pipeline.retried) == (1, 1)
+    pipeline.complete(item)
+    assert pipeline.describe()["failed"] == 0
+
+
+def test_ingested_frame_gets_the_detect_result_id(tmp_path):
+    backend = pytest.importorskip("app")
+    if not backend.DETERMINISTIC or not os.path.exists(IMAGE):
+        pytest.skip("needs deterministic mode and the dataset images")
+    if not backend.troposcope_model.wait_until_ready() or backend.troposcope_model.model is None:
+        pytest.skip("ingest needs the trained model")
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    shutil.copy(IMAGE, inbox / "45.jpg")
+    os.utime(inbox / "45.jpg", (time.time() - 10, time.time() - 10))
+    pipeline = backend.build_troposcan_pipeline(backend.troposcope_model, str(inbox), poll_seconds=0.1)
+    pipeline.start()
+    try:
+        output = inbox / "results" / "45.json"
+        deadline = time.time() + 60
+        while not output.exists() and time.time() < deadline:
+            time.sleep(0.1)
+    finally:
+        pipeline.stop()
+    ingested = json.loads(output.read_text())
+
+    with open(IMAGE, "rb") as f:
+        detected = backend.app.test_client().post("/api/detect", data={"image": (f, "45.jpg")}).get_json()
+    assert ingested["result_id"] == detected["result_id"]
+    stored = backend.troposcope_model.results.get(ingested["result_id"])
+    assert stored.perceptual_hash is not None and stored.source_digest is not None
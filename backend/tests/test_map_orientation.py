@@ -0,0 +1,32 @@
+import numpy as np
+
+from tile_server import LAYER_PALETTES, render_tile, tile_lonlat_grid
+from utils.mask_contours import mask_to_geojson
+
+BOUNDS = (80.0, 10.0, 90.0, 20.0)  # west, south, east, north
+
+
+def top_rows_blob(size=100, rows=10):
+    # Cloud in the first rows of the image, i.e. along its northern edge
+    probabilities = np.zeros((size, size), dtype=np.uint8)
+    probabilities[:rows] = 255
+    return probabilities
+
+
+def test_top_row_cluster_is_placed_at_the_north_edge():
+    feature = mask_to_geojson(top_rows_blob(), BOUNDS)["features"][0]
+    west, south, east, north = feature["properties"]["bbox"]
+    assert north == BOUNDS[3] and south >= 18.9
+    assert 19.0 < feature["properties"]["centroid"]["latitude"] < 20.0
+
+
+def test_top_rows_render_at_the_north_edge_of_tiles():
+    z, x, y = 3, 5, 3  # covers 45-90 E, 0-41 N
+    rgba = render_tile(top_rows_blob(), BOUNDS, "overlay", z, x, y)
+    lon, lat = tile_lonlat_grid(z, x, y)
+    inside = (lon > BOUNDS[0]) & (lon < BOUNDS[2])
+    detected, empty = LAYER_PALETTES["overlay"][255, 3], LAYER_PALETTES["overlay"][0, 3]
+    assert detected != empty
+    north_band, south_band = (lat > 19.2) & (lat < 19.8), (lat > 10.2) & (lat < 17.8)
+    assert (rgba[north_band][:, inside, 3] == detected).all()
+    assert (rgba[south_band][:, inside, 3] == empty).all()
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+import app as backend
+
+IMAGE = os.path.join(backend.mainbackend_path, "data", "images", "45.jpg")
+
+pytestmark = pytest.mark.skipif(not backend.DETERMINISTIC, reason="responses are only reproducible in deterministic mode")
+
+
+def detect(client, name):
+    with open(IMAGE, "rb") as f:
+        return client.post("/api/detect", data={"image": (f, name)})
+
+
+@pytest.fixture(scope="module")
+def client():
+    if not os.path.exists(IMAGE):
+        pytest.skip("dataset images are not present")
+    if not backend.troposcope_model.wait_until_ready() or backend.troposcope_model.model is None:
+        pytest.skip("near-duplicate reuse needs the trained model")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(backend, "NEAR_DUPLICATE_DISTANCE", 4)  # reuse is opt-in
+        yield backend.app.test_client()
+
+
+def test_repeated_upload_gets_the_same_response(client):
+    first, second = detect(client, "45.jpg"), detect(client, "45.jpg")
+    assert first.status_code == second.status_code == 200
+    assert first.get_json()["model_type"] == "real_pytorch"
+    # The reuse is reported out of band; body and ETag match the upload that ran inference
+    assert second.headers["X-TroposCan-Near-Duplicate"].startswith(first.get_json()["result_id"])
+    assert first.data == second.data
+    assert first.headers["ETag"] == second.headers["ETag"]
+
+
+def test_near_duplicate_keeps_its_own_name_and_region(client):
+    bay, arabian = detect(client, "45.jpg").get_json(), detect(client, "vayu.jpg").get_json()
+    assert arabian["risk_data"]["region_bounds"] != bay["risk_data"]["region_bounds"]
+    assert arabian["result_id"] != bay["result_id"]
+    assert backend.troposcope_model.results.get(arabian["result_id"]).image_name == "vayu.jpg"
+
+
+def test_rethreshold_at_half_reproduces_the_prediction(client):
+    detected = detect(client, "45.jpg").get_json()
+    rethresholded = client.post("/api/rethreshold", json={"result_id": detected["result_id"], "threshold": 0.5})
+    assert rethresholded.get_json()["risk_data"] == detected["risk_data"]
@@ -0,0 +1,48 @@
+import numpy as np
+from PIL import Image
+
+from utils.perceptual_hash import MultiIndexHash, dct_hash, hamming
+from utils.segmentation_dataset import near_duplicate_split
+
+
+def flip_bits(value, bits):
+    for bit in bits:
+        value ^= 1 << int(bit)
+    return value
+
+
+def test_multi_index_hash_finds_every_hash_within_distance_4():
+    rng = np.random.default_rng(0)
+    hashes = [int(h) for h in rng.integers(0, 2 ** 63, 2000, dtype=np.int64)]
+    index = MultiIndexHash()
+    for key, value in enumerate(hashes):
+        index.add(key, value)
+    for distance in range(5):
+        query = flip_bits(hashes[7], rng.choice(64, distance, replace=False))
+        expected = sorted((int(hamming(query, h)), key) for key, h in enumerate(hashes) if hamming(query, h) <= 4)
+        assert sorted(index.query(query, 4)) == expected
+        assert index.nearest(query, 4) == (distance, 7)
+    index.remove(7)
+    assert 7 not in index and all(key != 7 for _, key in index.query(hashes[7], 4))
+
+
+def test_split_keeps_near_duplicates_on_one_side(tmp_path):
+    rng = np.random.default_rng(1)
+    names, groups = [], []
+    for scene in range(12):
+        base = rng.integers(0, 256, (8, 8)).astype(np.uint8).repeat(32, 0).repeat(32, 1)
+        group = [f"scene{scene}.png", f"scene{scene}_copy.png"]
+        Image.fromarray(base).save(tmp_path / group[0])
+        # Re-encoded, slightly brightened copy of the same scene
+        Image.fromarray(np.clip(base.astype(int) + 3, 0, 255).astype(np.uint8)).save(tmp_path / group[1])
+        assert hamming(*(dct_hash(np.asarray(Image.open(tmp_path / n))) for n in group)) <= 8
+        names += group
+        groups.append(group)
+
+    train, held_out = near_duplicate_split(str(tmp_path), names, holdout=0.25, dedup=False, seed=0)
+    assert held_out and set(train).isdisjoint(held_out)
+    for group in groups:
+        assert set(group) <= set(train) or set(group) <= set(held_out)
+
+    train, held_out = near_duplicate_split(str(tmp_path), names, holdout=0.25, seed=0)
+    assert len(train) + len(held_out) == len(groups)  # one image per group
@@ -0,0 +1,28 @@
+import struct
+
+import numpy as np
+import pytest
+
+from utils.probability_map import decode_probability_rle, encode_probability_rle
+
+
+def test_rle_round_trip():
+    quantized = np.random.default_rng(0).integers(0, 256, (64, 48), dtype=np.uint8)
+    assert np.array_equal(decode_probability_rle(encode_probability_rle(quantized)), quantized)
+
+
+@pytest.mark.parametrize("height, width, runs, run_length", [
+    (65535, 65535, 1000, 65535),  # claims more pixels than allowed
+    (100, 100, 1000, 65535),      # runs expand far beyond the declared shape
+    (100, 100, 1, 10),            # runs cover too little
+])
+def test_rle_is_checked_before_expanding(height, width, runs, run_length):
+    data = struct.pack("<HHI", height, width, runs) + bytes(runs) + np.full(runs, run_length, "<u2").tobytes()
+    with pytest.raises(ValueError):
+        decode_probability_rle(data, max_pixels=50_000_000)
+
+
+def test_rle_rejects_truncated_runs():
+    data = encode_probability_rle(np.zeros((8, 8), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        decode_probability_rle(data[:-1])
@@ -0,0 +1,252 @@
+"""
+XYZ map tiles for TropoScan detection results
+Renders georeferenced overlay and probability-heatmap tiles (Web Mercator,
+256x256 RGBA) lazily from stored results, with in-memory and on-disk caches
+"""
+
+import io
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from utils.overlay_renderer import COLORMAPS
+
+TILE_SIZE = 256
+MAX_ZOOM = 14
+
+
+def _layer_palettes():
+    # Every renderer colormap is a layer; "overlay" is the binary red detection,
+    # kept translucent so the basemap shows through, and "probability" the heatmap
+    palettes = dict(COLORMAPS)
+    overlay = COLORMAPS["red"].copy()
+    overlay[:, 3] = overlay[:, 3] * 2 // 3
+    palettes["overlay"] = overlay
+    palettes["probability"] = COLORMAPS["heat"]
+    return palettes
+
+
+LAYER_PALETTES = _layer_palettes()
+
+
+def tile_lonlat_grid(z, x, y, size=TILE_SIZE):
+    """Longitude and latitude of every pixel centre of a Web Mercator tile"""
+    n = 2.0 ** z
+    offsets = (np.arange(size) + 0.5) / size
+    lon = (x + offsets) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    return lon, lat
+
+
+def tile_bounds(z, x, y):
+    """(west, south, east, north) of a Web Mercator tile"""
+    n = 2.0 ** z
+    west, east = x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+    north = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n))))
+    south = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def render_tile(probabilities, bounds, layer, z, x, y):
+    """Render one RGBA tile of a quantized probability map, or None if the tile is empty.
+
+    Row 0 of the source raster is the northern edge of bounds, matching the
+    convention used for cluster centroids and GeoJSON outlines.
+    """
+    west, south, east, north = bounds
+    t_west, t_south, t_east, t_north = tile_bounds(z, x, y)
+    if t_east <= west or t_west >= east or t_north <= south or t_south >= north:
+        return None
+
+    height, width = probabilities.shape
+    lon, lat = tile_lonlat_grid(z, x, y)
+    cols = np.floor((lon - west) / (east - west) * width).astype(np.int64)
+    rows = np.floor((north - lat) / (north - south) * height).astype(np.int64)
+    col_ok = (cols >= 0) & (cols < width)
+    row_ok = (rows >= 0) & (rows < height)
+
+    # Nearest-neighbour lookup over the separable grid, then one palette gather
+    levels = probabilities[np.clip(rows, 0, height - 1)[:, None], np.clip(cols, 0, width - 1)[None, :]]
+    rgba = LAYER_PALETTES[layer][levels]
+    rgba[~(row_ok[:, None] & col_ok[None, :])] = 0
+    return rgba
+
+
+def encode_png(rgba):
+    buffer = io.BytesIO()
+    Image.fromarray(rgba, mode="RGBA").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+EMPTY_TILE_PNG = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+
+class TileCache:
+    """Two-level tile cache: an LRU in memory over an LRU directory on disk, both bounded by bytes
+
+    Keys are (result id, result fingerprint, layer, z, x, y). The disk level only
+    outlives a process as leftovers: results are not persisted, so tiles written
+    by an earlier run (possibly with other weights) are deleted at startup.
+    """
+
+    def __init__(self, cache_dir=None, max_memory_bytes=64 * 1024 * 1024, max_disk_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self.disk_evictions = 0
+        self._tiles = OrderedDict()
+        self._disk = OrderedDict()  # key -> size of the file on disk, least recently used first
+        self._lock = threading.Lock()
+        if cache_dir:
+            self._clear_disk()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, *key[:-1], f"{key[-1]}.png")
+
+    def _clear_disk(self):
+        """Delete tiles (and temp files of interrupted writes) left by a previous run"""
+        for root, dirs, files in os.walk(self.cache_dir, topdown=False):
+            for name in files:
+                if name.endswith(".png") or ".png.tmp" in name:
+                    _remove(os.path.join(root, name))
+            if root != self.cache_dir:
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass  # not ours, or not empty
+
+    def get(self, key):
+        with self._lock:
+            data = self._tiles.get(key)
+            if data is not None:
+                self._tiles.move_to_end(key)
+                self.hits["memory"] += 1
+                return data
+            on_disk = key in self._disk
+        if on_disk:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            if data is not None:
+                with self._lock:
+                    self.hits["disk"] += 1
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                self._remember(key, data)
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        self._remember(key, data)
+        if self.cache_dir:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp{threading.get_ident()}"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self.disk_bytes += len(data) - self._disk.pop(key, 0)
+                self._disk[key] = len(data)
+            self._trim_disk()
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._tiles:
+                return
+            self._tiles[key] = data
+            self.memory_bytes += len(data)
+            while self.memory_bytes > self.max_memory_bytes and self._tiles:
+                _, evicted = self._tiles.popitem(last=False)
+                self.memory_bytes -= len(evicted)
+
+    def _trim_disk(self):
+        evicted = []
+        with self._lock:
+            while self.disk_bytes > self.max_disk_bytes and self._disk:
+                key, size = self._disk.popitem(last=False)
+                self.disk_bytes -= size
+                self.disk_evictions += 1
+                evicted.append(key)
+        for key in evicted:
+            _remove(self._path(key))
+
+    def forget(self, result_id):
+        """Drop every cached tile of a result, e.g. once the result itself is evicted"""
+        with self._lock:
+            for key in [key for key in self._tiles if key[0] == result_id]:
+                self.memory_bytes -= len(self._tiles.pop(key))
+            for key in [key for key in self._disk if key[0] == result_id]:
+                self.disk_bytes -= self._disk.pop(key)
+        if self.cache_dir:
+            shutil.rmtree(os.path.join(self.cache_dir, result_id), ignore_errors=True)
+
+    def describe(self):
+        with self._lock:
+            return {
+                "memory_tiles": len(self._tiles),
+                "memory_bytes": self.memory_bytes,
+                "disk_tiles": len(self._disk),
+                "disk_bytes": self.disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "disk_evictions": self.disk_evictions,
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "cache_dir": self.cache_dir,
+            }
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class TileServer:
+    """Serves tiles for results held in a ResultStore"""
+
+    def __init__(self, results, cache):
+        self.results = results
+        self.cache = cache
+
+    def forget_result(self, result_id):
+        self.cache.forget(result_id)
+
+    def get_tile(self, result_id, layer, z, x, y):
+        """PNG bytes for a tile; raises KeyError/ValueError for unknown results or bad coordinates"""
+        if not (result_id.isascii() and result_id.isalnum()):
+            raise ValueError("Invalid result id")
+        if layer not in LAYER_PALETTES:
+            raise ValueError(f"Unknown layer '{layer}', expected one of {sorted(LAYER_PALETTES)}")
+        if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+            raise ValueError(f"Tile {z}/{x}/{y} is outside the pyramid (max zoom {MAX_ZOOM})")
+
+        # The store decides whether the result exists; the fingerprint keeps a result id
+        # whose probabilities were replaced from serving tiles rendered from the old ones
+        stored = self.results.get(result_id)
+        if stored is None or stored.bounds is None:
+            raise KeyError(f"Result {result_id} not found or expired from cache")
+        key = (result_id, stored.fingerprint, layer, str(z), str(x), str(y))
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        rgba = render_tile(stored.probabilities, stored.bounds, layer, z, x, y)
+        if rgba is None:
+            return EMPTY_TILE_PNG  # outside the result's footprint; cheap enough not to cache
+        data = encode_png(rgba)
+        self.cache.put(key, data)
+        return data
@@ -0,0 +1,91 @@
+"""
+Size-bounded, format-checked image uploads for TropoScan
+Multipart file parts are written into an in-memory buffer as the request body
+is read. The buffer stops the upload as soon as it exceeds the size limit or
+its first bytes are not a supported image format, so bad uploads are rejected
+before they are fully read, and nothing is written to disk.
+"""
+
+import io
+
+from flask import Request
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
+
+# Leading bytes of the image formats the decoder accepts
+SIGNATURES = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"II*\x00", "TIFF"),
+    (b"MM\x00*", "TIFF"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"BM", "BMP"),
+)
+SNIFF_BYTES = 16
+
+
+def sniff_format(head):
+    """Image format named by the leading bytes, or None"""
+    for signature, name in SIGNATURES:
+        if head.startswith(signature):
+            return name
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+class UploadRejected(Exception):
+    """An upload refused before decoding; status is the HTTP code to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class BoundedUploadBuffer(io.BytesIO):
+    """In-memory upload target that refuses oversized or non-image data while it is being written"""
+
+    def __init__(self, max_bytes):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.format = None
+
+    def write(self, data):
+        if self.tell() + len(data) > self.max_bytes:
+            raise RequestEntityTooLarge(f"Image exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit")
+        written = super().write(data)
+        if self.format is None and self.tell() >= SNIFF_BYTES:
+            self.format = sniff_format(self.getbuffer()[:SNIFF_BYTES].tobytes())
+            if self.format is None:
+                raise UnsupportedMediaType("Upload is not a JPEG, PNG, TIFF, GIF, BMP or WEBP image")
+        return written
+
+
+class GuardedRequest(Request):
+    """Flask request whose file uploads go to a BoundedUploadBuffer instead of spooled temp files.
+
+    The per-file limit is the app's MAX_CONTENT_LENGTH, which also makes
+    Werkzeug refuse bodies whose declared Content-Length is too large before
+    reading any of them.
+    """
+
+    default_max_upload_bytes = 20 * 1024 * 1024
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return BoundedUploadBuffer(self.max_content_length or self.default_max_upload_bytes)
+
+
+def read_upload(request, field="image"):
+    """(bytes, filename) of an uploaded file, or raise UploadRejected"""
+    try:
+        upload = request.files.get(field)
+    except HTTPException as e:
+        raise UploadRejected(e.description, e.code)
+    if upload is None:
+        raise UploadRejected("No image file provided")
+    if upload.filename == '':
+        raise UploadRejected("No file selected")
+    data = upload.stream.getvalue()
+    if sniff_format(data[:SNIFF_BYTES]) is None:
+        raise UploadRejected("Upload is not a JPEG, PNG, TIFF, GIF, BMP or WEBP image", 415)
+    return data, upload.filename
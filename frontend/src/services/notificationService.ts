@@ -44,6 +44,7 @@ class NotificationService {
   private permission: NotificationPermission = 'default';
   private serviceWorkerRegistration: ServiceWorkerRegistration | null = null;
   private settings: NotificationSettings;
+  private alertStream: EventSource | null = null;
 
   constructor() {
     console.log('🔔 Initializing NotificationService...');
@@ -328,6 +329,38 @@ class NotificationService {
     this.sendRiskAlert(riskLevel, testDetails);
   }
 
+  // Live alerts pushed by the backend (Server-Sent Events). EventSource reconnects
+  // on its own and sends Last-Event-ID, so missed alerts are replayed by the server.
+  subscribeToAlerts(streamUrl: string = 'http://localhost:5000/api/alerts/stream'): void {
+    if (this.alertStream || typeof EventSource === 'undefined') {
+      return;
+    }
+    console.log('📡 Subscribing to live risk alerts:', streamUrl);
+    this.alertStream = new EventSource(streamUrl);
+
+    this.alertStream.addEventListener('alert', (event) => {
+      const alert = JSON.parse((event as MessageEvent).data);
+      const riskLevel = String(alert.risk_level).toLowerCase() as 'low' | 'moderate' | 'high';
+      const location = alert.location
+        ? `📍 ${alert.location.latitude}°N, ${alert.location.longitude}°E`
+        : '';
+      this.sendRiskAlert(riskLevel, `${location} (${alert.coverage_percent}% coverage)`);
+    });
+
+    this.alertStream.addEventListener('dropped', () => {
+      console.log('⚠️ Alert stream fell behind; reconnecting to replay missed alerts');
+    });
+
+    this.alertStream.onerror = () => {
+      console.log('🔄 Alert stream interrupted, browser will reconnect');
+    };
+  }
+
+  unsubscribeFromAlerts(): void {
+    this.alertStream?.close();
+    this.alertStream = null;
+  }
+
   // Send immediate desktop notification (bypasses all settings for testing)
   async sendImmediateTestNotification(): Promise<boolean> {
     console.log('🚀 Sending immediate test notification...');
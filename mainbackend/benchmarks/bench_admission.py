@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Operational latency under a flood of demo requests, with and without admission control.
+
+Inference is simulated by holding one of --slots slots for --service-ms, so
+the numbers isolate the queueing policy from the model. Operational requests
+arrive open-loop at --ops-rate per second. Demo load comes from --demo-clients
+clients (distinct addresses), each sending a new request as soon as the last
+one finished or was refused.
+
+Scenarios:
+  idle       - operational traffic alone, first come first served
+  fifo       - with the demo flood, first come first served (one shared queue)
+  admission  - with the demo flood, through AdmissionController
+
+Usage (from mainbackend/):
+  python benchmarks/bench_admission.py [--seconds 10] [--ops-rate 5] [--demo-clients 40]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+backend_path = os.path.join(os.path.dirname(__file__), '..', '..', 'backend')
+sys.path.append(backend_path)
+
+from admission import AdmissionController, AdmissionRejected
+
+
+class FifoSlots:
+    """First come first served slots: the path every request shared before admission control"""
+
+    def __init__(self, slots):
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._slots = slots
+        self._next_ticket = 0
+        self._serving = 0
+        self._active = 0
+
+    @contextmanager
+    def admit(self, client, priority, deadline=None):
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving or self._active >= self._slots:
+                self._condition.wait()
+            self._serving += 1
+            self._active += 1
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+
+def run(controller, args, demo):
+    stop = time.monotonic() + args.seconds
+    latencies, outcomes, lock = [], {"ok": 0, "429": 0, "503": 0}, threading.Lock()
+
+    def request(client, priority):
+        start = time.monotonic()
+        try:
+            with controller.admit(client, priority):
+                time.sleep(args.service_ms / 1000)
+        except AdmissionRejected as e:
+            return e.status
+        if priority == "operational":
+            with lock:
+                latencies.append(time.monotonic() - start)
+        return 200
+
+    def demo_client(i):
+        while time.monotonic() < stop:
+            status = request(f"10.0.0.{i}", "demo")
+            with lock:
+                outcomes["ok" if status == 200 else str(status)] += 1
+            if status != 200:
+                time.sleep(0.05)
+
+    threads = [threading.Thread(target=demo_client, args=(i,)) for i in range(args.demo_clients if demo else 0)]
+    for thread in threads:
+        thread.start()
+    ops = []
+    while time.monotonic() < stop:
+        ops.append(threading.Thread(target=request, args=("ops-desk", "operational")))
+        ops[-1].start()
+        time.sleep(1 / args.ops_rate)
+    for thread in threads + ops:
+        thread.join()
+    ms = np.array(latencies) * 1000
+    return ms, outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--slots", type=int, default=2)
+    parser.add_argument("--service-ms", type=float, default=100)
+    parser.add_argument("--ops-rate", type=float, default=5)
+    parser.add_argument("--demo-clients", type=int, default=40)
+    args = parser.parse_args()
+
+    scenarios = [
+        ("idle", FifoSlots(args.slots), False),
+        ("fifo", FifoSlots(args.slots), True),
+        # Operational traffic comes from one desk, so its own rate limit is lifted here
+        ("admission", AdmissionController(args.slots, rates={"operational": 0}), True),
+    ]
+    print(f"{args.slots} slots, {args.service_ms:.0f} ms per inference, {args.ops_rate:g} operational req/s, "
+          f"{args.demo_clients} demo clients\n")
+    print(f"{'scenario':>10} {'ops p50 ms':>11} {'ops p99 ms':>11} {'ops max ms':>11} {'demo ok':>8} "
+          f"{'demo 429':>9} {'demo 503':>9}")
+    for name, controller, demo in scenarios:
+        ms, outcomes = run(controller, args, demo)
+        print(f"{name:>10} {np.percentile(ms, 50):>11.1f} {np.percentile(ms, 99):>11.1f} {ms.max():>11.1f} "
+              f"{outcomes['ok']:>8} {outcomes['429']:>9} {outcomes['503']:>9}")
+
+
+if __name__ == "__main__":
+    main()
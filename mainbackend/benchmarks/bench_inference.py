@@ -0,0 +1,67 @@
+"""
+Inference memory benchmark: one unbounded forward pass vs the InferenceEngine
+at several memory budgets. Reports peak RSS above the idle baseline and
+throughput, to help size containers for TROPOSCAN_INFERENCE_MEMORY_MB.
+
+Usage (from mainbackend/):
+    python benchmarks/bench_inference.py [--batch 16] [--budgets 128,256,512]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from model.unet import UNet
+from utils.inference_engine import (InferenceEngine, read_current_rss_bytes, read_peak_rss_bytes,
+                                    reset_peak_rss)
+
+MIB = 1024 * 1024
+
+
+def measure(fn):
+    reset_peak_rss()
+    baseline = read_current_rss_bytes()
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return (read_peak_rss_bytes() - baseline) / MIB, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--budgets", default="128,256,512,1024", help="Memory budgets in MiB")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    model = UNet().eval()
+    grays = np.random.default_rng(0).integers(0, 256, (args.batch, args.size, args.size), dtype=np.uint8)
+
+    def unbounded():
+        # The pre-engine path: fresh float tensor, whole batch in one pass, autograd bookkeeping off
+        with torch.no_grad():
+            model(torch.from_numpy(grays.astype(np.float32) / 255).unsqueeze(1)).squeeze(1).numpy()
+
+    unbounded()
+    print(f"{args.batch} images at {args.size}x{args.size}")
+    print(f"{'mode':>18} {'chunk':>6} {'peak MiB':>9} {'img/s':>7}")
+    peak, seconds = measure(unbounded)
+    print(f"{'unbounded':>18} {args.batch:>6} {peak:9.1f} {args.batch / seconds:7.1f}")
+
+    out = np.empty(grays.shape, dtype=np.float32)
+    for budget in (int(b) for b in args.budgets.split(",")):
+        engine = InferenceEngine(budget * MIB, concurrency=1)  # the whole budget for one pass
+        engine.predict(model, grays, out)  # estimate sample size, allocate the input buffer
+        peak, seconds = measure(lambda: engine.predict(model, grays, out))
+        chunk = engine.chunk_size(model, grays.shape[1:])
+        print(f"{f'budget {budget} MiB':>18} {chunk:>6} {peak:9.1f} {args.batch / seconds:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
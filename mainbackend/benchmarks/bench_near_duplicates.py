@@ -0,0 +1,108 @@
+"""
+Near-duplicate benchmark: perceptual-hash robustness and lookup latency.
+
+Lists the near-duplicate groups in the dataset, then hashes re-encoded,
+cropped, brightened and resized copies of every image and looks them up in
+an index of the originals padded with random hashes to --index-size. Reports
+how many copies find their original (or a duplicate of it), how many find a
+different image, and query latency of the multi-index hash against a plain
+linear scan.
+
+Usage (from mainbackend/):
+    python benchmarks/bench_near_duplicates.py [--index-size 1000000] [--distances 4,6,8]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.image_decode import DecodedImage
+from utils.perceptual_hash import MultiIndexHash, dct_hash, group_near_duplicates, hamming
+from utils.segmentation_dataset import DUPLICATE_DISTANCE
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'images')
+
+
+def variants(gray):
+    """Copies of an image that should still count as the same scene"""
+    image = Image.fromarray(gray)
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=60)
+    yield "jpeg q60", np.asarray(Image.open(buffer).convert("L"))
+    h, w = gray.shape
+    dy, dx = h * 3 // 100, w * 3 // 100
+    yield "3% crop", gray[dy:h - dy, dx:w - dx]
+    yield "brightness +10%", np.clip(gray.astype(np.float32) * 1.1, 0, 255).astype(np.uint8)
+    yield "half size", np.asarray(image.resize((w // 2, h // 2), Image.BILINEAR))
+
+
+def timed_queries(fn, queries):
+    start = time.perf_counter()
+    for value in queries:
+        fn(value)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--index-size", type=int, default=1_000_000)
+    parser.add_argument("--distances", default="4,6,8", help="Hash distances to evaluate")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    distances = [int(d) for d in args.distances.split(",")]
+
+    names = sorted(os.listdir(DATA_DIR))
+    grays = {name: DecodedImage(os.path.join(DATA_DIR, name)).gray_array for name in names}
+    start = time.perf_counter()
+    hashes = {name: dct_hash(gray) for name, gray in grays.items()}
+    print(f"{len(names)} images, {(time.perf_counter() - start) / len(names) * 1000:.2f} ms/hash")
+
+    groups = group_near_duplicates(hashes, DUPLICATE_DISTANCE)
+    same_scene = {name: set(group) for group in groups for name in group}
+    groups = [group for group in groups if len(group) > 1]
+    print(f"\nNear-duplicate groups within {DUPLICATE_DISTANCE} bits:")
+    for group in groups:
+        print("  " + ", ".join(group))
+    values = np.array(list(hashes.values()), dtype=np.uint64)
+    pairwise = hamming(values[:, None], values[None, :])[np.triu_indices(len(values), 1)]
+    print(f"Pairwise distance: min {pairwise.min()}, 1st percentile {np.percentile(pairwise, 1):.0f}, "
+          f"median {np.median(pairwise):.0f}")
+
+    rng = np.random.default_rng(0)
+    index = MultiIndexHash()
+    padding = rng.integers(0, np.iinfo(np.uint64).max, args.index_size - len(names), dtype=np.uint64, endpoint=True)
+    start = time.perf_counter()
+    for name, value in hashes.items():
+        index.add(name, value)
+    for i, value in enumerate(padding.tolist()):
+        index.add(i, value)
+    print(f"\nIndex of {len(index)} hashes built in {time.perf_counter() - start:.1f} s")
+
+    print(f"\n{'variant':>16} " + " ".join(f"{'hit@' + str(d):>8} {'wrong@' + str(d):>8}" for d in distances))
+    for label in [label for label, _ in variants(grays[names[0]])]:
+        hits, wrong = np.zeros(len(distances), int), np.zeros(len(distances), int)
+        for name, gray in grays.items():
+            copy = dict(variants(gray))[label]
+            for i, distance in enumerate(distances):
+                match = index.nearest(dct_hash(copy), distance)
+                hits[i] += match is not None and match[1] in same_scene[name]
+                wrong[i] += match is not None and match[1] not in same_scene[name]
+        print(f"{label:>16} " + " ".join(f"{h:>8} {w:>8}" for h, w in zip(hits, wrong)))
+
+    queries = [int(v) for v in rng.integers(0, np.iinfo(np.uint64).max, args.queries, dtype=np.uint64, endpoint=True)]
+    all_hashes = np.concatenate([values, padding])
+    print(f"\n{'distance':>8} {'index ms':>9} {'linear ms':>10}")
+    for distance in distances:
+        index_ms = timed_queries(lambda v: index.query(v, distance), queries)
+        linear_ms = timed_queries(lambda v: np.flatnonzero(hamming(all_hashes, v) <= distance), queries)
+        print(f"{distance:>8} {index_ms:>9.3f} {linear_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Overlay rendering benchmark: the original np.where overlay vs the LUT renderer.
+
+Usage (from mainbackend/):
+    python benchmarks/bench_overlay.py [--repeats 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.overlay_renderer import COLORMAPS, OverlayRenderer
+
+# 256x256 model input and an INSAT-3D full-disk IR frame
+SIZES = [(256, 256), (2816, 2816)]
+
+
+def baseline_red(image_arr, mask_arr):
+    # The create_overlay implementation this renderer replaced
+    red_overlay = np.zeros_like(image_arr)
+    red_overlay[..., 0] = 255
+    combined = np.where(mask_arr[..., None] > 128, red_overlay, image_arr)
+    return combined.astype(np.uint8)
+
+
+def baseline_heat(image_arr, levels):
+    # Straightforward float alpha blend of the same heat colormap, for comparison
+    lut = COLORMAPS["heat"].astype(np.float32)
+    rgba = lut[levels]
+    alpha = rgba[..., 3:] / 255.0
+    return (image_arr * (1 - alpha) + rgba[..., :3] * alpha).astype(np.uint8)
+
+
+def time_per_pixel(fn, pixels, repeats):
+    fn()  # warm caches and buffers
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats / pixels * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    renderer = OverlayRenderer()
+    print(f"{'size':>11} {'case':>22} {'baseline ns/px':>15} {'LUT ns/px':>10} {'speedup':>8}")
+    for height, width in SIZES:
+        pixels = height * width
+        image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        probabilities = rng.integers(0, 256, (height, width), dtype=np.uint8)
+        mask = np.where(probabilities > 127, 255, 0).astype(np.uint8)
+        out = np.empty_like(image)
+
+        assert np.array_equal(baseline_red(image, mask), renderer.render(image, mask, "red"))
+        cases = [
+            ("red mask", lambda: baseline_red(image, mask), lambda: renderer.render(image, mask, "red", out)),
+            ("heat probabilities", lambda: baseline_heat(image, probabilities),
+             lambda: renderer.render(image, probabilities, "heat", out)),
+        ]
+        for name, baseline, lut in cases:
+            base_ns = time_per_pixel(baseline, pixels, args.repeats)
+            lut_ns = time_per_pixel(lut, pixels, args.repeats)
+            print(f"{f'{height}x{width}':>11} {name:>22} {base_ns:>15.2f} {lut_ns:>10.2f} {base_ns / lut_ns:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Test-time augmentation benchmark: latency overhead and prediction stability.
+
+Latency compares the single pass with TTA run as one batch and as sequential
+calls. Stability perturbs each image slightly (sensor noise, a 2% brightness
+change, a one-pixel shift) and measures how much the mask and the risk level
+move, with and without TTA.
+
+Usage (from mainbackend/):
+    python benchmarks/bench_tta.py [--model model/unet_insat.pt] [--images 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.image_decode import DecodedImage
+from utils.inference_engine import InferenceEngine
+from utils.predict_mask import load_model
+from utils.risk_score import calculate_risk_from_array
+from utils.tta import align, augment, predict_probabilities_tta
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'images')
+
+
+def perturbations(gray, rng):
+    """Small input changes a robust prediction should not react to"""
+    as_float = gray.astype(np.float32)
+    yield np.clip(as_float + rng.normal(0, 3, gray.shape), 0, 255).astype(np.uint8)
+    yield np.clip(as_float * 1.02, 0, 255).astype(np.uint8)
+    yield np.roll(gray, 1, axis=1)
+
+
+def mask_iou(a, b):
+    union = (a | b).sum()
+    return (a & b).sum() / union if union else 1.0
+
+
+def timed(fn, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=os.path.join(os.path.dirname(__file__), '..', 'model', 'unet_insat.pt'))
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    engine = InferenceEngine(4 * 1024 ** 3)  # large enough that TTA batches are never split
+    names = sorted(os.listdir(DATA_DIR))[:args.images]
+    grays = [DecodedImage(os.path.join(DATA_DIR, name)).gray_array for name in names]
+
+    def single(gray):
+        return engine.predict(model, gray)[0][0]
+
+    def tta(count):
+        return lambda gray: predict_probabilities_tta(model, gray, engine, count)[0]
+
+    def sequential(count):
+        def run(gray):
+            outputs = np.stack([engine.predict(model, variant)[0][0] for variant in augment(gray, count)])
+            return align(outputs).mean(axis=0)
+        return run
+
+    modes = [("single pass", single), ("TTA x4 batched", tta(4)), ("TTA x4 sequential", sequential(4)),
+             ("TTA x8 batched", tta(8)), ("TTA x8 sequential", sequential(8))]
+    print(f"{len(grays)} images, {torch.get_num_threads()} CPU threads\n")
+    print(f"{'mode':>18} {'ms/image':>9} {'overhead':>9} {'mask IoU':>9} {'risk flips':>11}")
+    base_ms = None
+    rng = np.random.default_rng(0)
+    for name, predict in modes:
+        ms = timed(lambda: predict(grays[0]), args.repeats)
+        base_ms = base_ms or ms
+        if "sequential" in name:
+            print(f"{name:>18} {ms:>9.1f} {ms / base_ms:>8.2f}x")
+            continue
+        ious, flips, trials = [], 0, 0
+        for gray in grays:
+            reference = predict(gray) > 0.5
+            reference_risk = calculate_risk_from_array(reference.astype(np.uint8) * 255)[0]
+            for perturbed in perturbations(gray, rng):
+                mask = predict(perturbed) > 0.5
+                ious.append(mask_iou(reference, mask))
+                flips += calculate_risk_from_array(mask.astype(np.uint8) * 255)[0] != reference_risk
+                trials += 1
+        print(f"{name:>18} {ms:>9.1f} {ms / base_ms:>8.2f}x {np.mean(ious):>9.4f} {flips:>5}/{trials:<5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Measure per-worker memory and cold-start time for the model weight loading modes.
+
+Forks N workers the way a pre-forking server (e.g. gunicorn) would and reports,
+once every worker has loaded the model and served one inference:
+  - RSS: resident pages, shared ones counted in full for every worker
+  - PSS: shared pages split between the processes mapping them
+  - USS: pages private to the worker (what each extra worker really costs)
+
+Modes:
+  eager   - each worker torch.load()s its own copy of unet_insat.pt
+  mmap    - each worker maps the flat .safetensors file copy-on-write
+  preload - the parent loads the model before forking (gunicorn --preload)
+
+Usage (from mainbackend/):
+  python benchmarks/bench_worker_memory.py --workers 4 --mode eager
+  python benchmarks/bench_worker_memory.py --workers 4 --mode mmap
+  python benchmarks/bench_worker_memory.py --workers 4 --mode preload
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+
+mainbackend_path = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(mainbackend_path)
+
+import torch
+from utils.predict_mask import load_model
+from utils.weight_store import convert_checkpoint
+
+DEFAULT_MODEL_PATH = os.path.join(mainbackend_path, "model", "unet_insat.pt")
+
+
+def read_memory_kb():
+    """Return (rss, pss, uss) of the current process in KiB"""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return fields.get("Rss", 0), fields.get("Pss", 0), uss
+
+
+def worker(weights_path, preloaded, barrier, results):
+    start = time.perf_counter()
+    model = preloaded if preloaded is not None else load_model(weights_path)
+    with torch.no_grad():
+        model(torch.rand(1, 1, 256, 256))
+    cold_start = time.perf_counter() - start
+
+    # Measure only once every worker is alive, so shared pages are really shared
+    barrier.wait()
+    rss, pss, uss = read_memory_kb()
+    results.put((os.getpid(), cold_start, rss, pss, uss))
+    barrier.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mode", choices=["eager", "mmap", "preload"], default="eager")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Path to the .pt checkpoint")
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    weights_path = args.model
+    if args.mode == "mmap":
+        weights_path = os.path.splitext(args.model)[0] + ".safetensors"
+        if not os.path.exists(weights_path):
+            convert_checkpoint(args.model, weights_path)
+    preloaded = load_model(weights_path) if args.mode == "preload" else None
+
+    ctx = mp.get_context("fork")
+    barrier = ctx.Barrier(args.workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(weights_path, preloaded, barrier, results))
+             for _ in range(args.workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    print(f"🧪 Mode: {args.mode} | Workers: {args.workers} | Weights: {weights_path}")
+    print(f"{'pid':>8} {'cold start (ms)':>16} {'RSS (MiB)':>10} {'PSS (MiB)':>10} {'USS (MiB)':>10}")
+    for pid, cold_start, rss, pss, uss in sorted(rows):
+        print(f"{pid:>8} {cold_start * 1000:>16.1f} {rss / 1024:>10.1f} {pss / 1024:>10.1f} {uss / 1024:>10.1f}")
+    n = len(rows)
+    print("-" * 58)
+    print(f"{'mean':>8} {sum(r[1] for r in rows) / n * 1000:>16.1f} "
+          f"{sum(r[2] for r in rows) / n / 1024:>10.1f} "
+          f"{sum(r[3] for r in rows) / n / 1024:>10.1f} "
+          f"{sum(r[4] for r in rows) / n / 1024:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Latency / accuracy Pareto report for U-Net variants.
+
+Trains (or fine-tunes) each variant on data/images + data/masks.bin, scores IoU on
+a held-out split (near-duplicate frames never straddle it) and times CPU inference at batch 1 and batch 32. Prints a
+table sorted by cost, marking the variants no other variant beats on both
+latency and IoU.
+
+Usage (from mainbackend/):
+    python benchmarks/pareto_unet.py [--epochs 10] [--save-dir model/variants]
+    python benchmarks/pareto_unet.py --variants "|width=0.5;block=separable" --init model/unet_insat.pt
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from model.unet import UNet, count_macs
+from utils.predict_mask import load_model, save_checkpoint
+from utils.segmentation_dataset import DUPLICATE_DISTANCE, SatelliteDataset, near_duplicate_split
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+# width / depth / block combinations tried by default; the first is the current model
+DEFAULT_VARIANTS = [
+    "",
+    "width=0.5",
+    "width=0.25",
+    "block=separable",
+    "block=bottleneck",
+    "width=0.5;block=separable",
+    "width=0.5;block=bottleneck",
+    "width=0.25;depth=3",
+]
+
+
+def parse_variant(spec):
+    """'width=0.5;block=separable' -> UNet keyword arguments"""
+    config = {}
+    for item in filter(None, spec.split(";")):
+        key, value = item.split("=")
+        config[key] = {"width": float, "depth": int, "block": str}[key](value)
+    return config
+
+
+def variant_name(config):
+    return ",".join(f"{k}={v}" for k, v in config.items()) or "baseline"
+
+
+def load_dataset(size, holdout, max_distance, seed):
+    """Images and masks as tensors, split into train / validation by near-duplicate group"""
+    img_dir, mask_path = os.path.join(DATA_DIR, "images"), os.path.join(DATA_DIR, "masks.bin")
+    names = SatelliteDataset(img_dir, mask_path).filenames
+    # Same split as train_unet.py / evaluate_model.py --holdout with the same --seed
+    train_names, val_names = near_duplicate_split(img_dir, names, holdout, max_distance, seed=seed)
+
+    def load(filenames):
+        dataset = SatelliteDataset(img_dir, mask_path, (size, size), filenames)
+        images, masks = zip(*dataset)
+        return torch.stack(images), torch.stack(masks)
+
+    return load(train_names) + load(val_names)
+
+
+def train(model, images, masks, epochs, batch_size, lr):
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    loss_fn = nn.BCELoss()
+    generator = torch.Generator().manual_seed(0)
+    model.train()
+    for epoch in range(epochs):
+        total_loss = 0.0
+        for batch in torch.randperm(len(images), generator=generator).split(batch_size):
+            loss = loss_fn(model(images[batch]), masks[batch])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(batch)
+        print(f"   epoch {epoch + 1}/{epochs} loss {total_loss / len(images):.4f}")
+    model.eval()
+
+
+def iou(model, images, masks, threshold=0.5):
+    """Pooled intersection-over-union of the detected class on the validation split"""
+    intersection = union = 0
+    with torch.inference_mode():
+        for batch in range(0, len(images), 8):
+            pred = model(images[batch:batch + 8]) > threshold
+            truth = masks[batch:batch + 8] > 0.5
+            intersection += (pred & truth).sum().item()
+            union += (pred | truth).sum().item()
+    return intersection / union if union else 1.0
+
+
+def latency_ms(model, batch, size, repeats):
+    """Median wall time of a forward pass on CPU"""
+    inputs = torch.rand(batch, 1, size, size)
+    times = []
+    with torch.inference_mode():
+        model(inputs)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(inputs)
+            times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def pareto_front(rows):
+    # A row is on the front if no other row is at least as fast and at least as accurate (and better at one)
+    for row in rows:
+        row["pareto"] = not any(
+            other is not row
+            and other["latency_b1_ms"] <= row["latency_b1_ms"] and other["iou"] >= row["iou"]
+            and (other["latency_b1_ms"] < row["latency_b1_ms"] or other["iou"] > row["iou"])
+            for other in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency / IoU report for U-Net variants")
+    parser.add_argument("--variants", help="'|'-separated variants, each a ';'-separated key=value list, e.g. 'width=0.5;block=separable|width=0.25'")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--size", type=int, default=256, help="Training and timing resolution")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of images held out for IoU")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the train / validation split")
+    parser.add_argument("--duplicate-distance", type=int, default=DUPLICATE_DISTANCE,
+                        help="Perceptual-hash distance under which images count as near-duplicates")
+    parser.add_argument("--init", help="Checkpoint to fine-tune from; used for variants with the same architecture")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed forward passes per latency figure")
+    parser.add_argument("--save-dir", help="Save each trained variant's checkpoint here")
+    parser.add_argument("--json", help="Also write the table to this JSON file")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    specs = args.variants.split("|") if args.variants else DEFAULT_VARIANTS
+    train_x, train_y, val_x, val_y = load_dataset(args.size, args.holdout, args.duplicate_distance, args.seed)
+    print(f"📁 {len(train_x)} training / {len(val_x)} validation images at {args.size}x{args.size}")
+    initial = load_model(args.init) if args.init else None
+
+    rows = []
+    for spec in specs:
+        config = parse_variant(spec)
+        model = UNet(**config)
+        name = variant_name(config)
+        if initial is not None and initial.config == model.config:
+            model.load_state_dict(initial.state_dict())
+            name += " (fine-tuned)"
+        print(f"🧠 {name}")
+        if args.epochs:
+            train(model, train_x, train_y, args.epochs, args.batch_size, args.lr)
+        rows.append({
+            "variant": name,
+            "config": model.config,
+            "params": sum(p.numel() for p in model.parameters()),
+            "gmacs": count_macs(model, (args.size, args.size)) / 1e9,
+            "latency_b1_ms": latency_ms(model, 1, args.size, args.repeats),
+            "latency_b32_ms": latency_ms(model, 32, args.size, max(1, args.repeats // 2)),
+            "iou": iou(model, val_x, val_y),
+        })
+        if args.save_dir:
+            os.makedirs(args.save_dir, exist_ok=True)
+            save_checkpoint(model, os.path.join(args.save_dir, f"unet_{name.split(' ')[0].replace(',', '_').replace('=', '')}.pt"))
+
+    pareto_front(rows)
+    baseline = rows[0]
+    rows.sort(key=lambda r: r["gmacs"])
+    print(f"\n{'variant':<34} {'params':>9} {'GMACs':>7} {'b1 ms':>8} {'b32 ms':>9} {'speedup':>8} {'IoU':>6}  pareto")
+    for row in rows:
+        speedup = baseline["latency_b1_ms"] / row["latency_b1_ms"]
+        print(f"{row['variant']:<34} {row['params']:>9,} {row['gmacs']:>7.2f} {row['latency_b1_ms']:>8.1f} "
+              f"{row['latency_b32_ms']:>9.1f} {speedup:>7.1f}x {row['iou']:>6.3f}  {'*' if row['pareto'] else ''}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Evaluate a TropoScan checkpoint on a labeled image set
+
+Streams data/images + data/masks.bin through the model in batches and reports
+IoU, Dice, precision, recall and risk-level accuracy for a sweep of
+probability thresholds, plus the risk confusion matrix. All thresholds come
+out of a single pass (see utils/threshold_metrics.py).
+
+Usage (from mainbackend/):
+    python evaluate_model.py --model model/unet_insat.pt
+    python evaluate_model.py --model model/variants/unet_width0.5.pt --thresholds 0.3,0.5,0.7 --json eval.json
+    python evaluate_model.py --holdout 0.2      # only images held out by train_unet.py --holdout 0.2
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from utils.predict_mask import load_model
+from utils.probability_map import quantize_probabilities
+from utils.segmentation_dataset import DUPLICATE_DISTANCE, SatelliteDataset, near_duplicate_split
+from utils.threshold_metrics import ThresholdMetrics
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_thresholds(spec):
+    if spec:
+        return [float(t) for t in spec.split(",")]
+    return list(np.round(np.arange(0.05, 1.0, 0.05), 2))
+
+
+def evaluate(model, loader, metrics):
+    """Run the model over the loader, feeding every batch into metrics"""
+    start = time.perf_counter()
+    with torch.inference_mode():
+        for images, masks in loader:
+            probabilities = model(images)[:, 0].numpy()
+            metrics.update(quantize_probabilities(probabilities), masks[:, 0].numpy() > 0.5)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a TropoScan checkpoint over many thresholds")
+    parser.add_argument("--model", default=os.path.join(BASE_DIR, "model", "unet_insat.pt"))
+    parser.add_argument("--images", default=os.path.join(BASE_DIR, "data", "images"))
+    parser.add_argument("--masks", default=os.path.join(BASE_DIR, "data", "masks.bin"),
+                        help="Mask archive (utils/mask_archive.py) or a directory of mask images")
+    parser.add_argument("--thresholds", help="Comma-separated list (default 0.05 to 0.95 in steps of 0.05)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--confusion-at", type=float, default=0.5,
+                        help="Threshold whose risk confusion matrix is printed")
+    parser.add_argument("--json", help="Also write the full report to this JSON file")
+    parser.add_argument("--holdout", type=float, default=0.0,
+                        help="Evaluate only the held-out split of train_unet.py --holdout (default: all images)")
+    parser.add_argument("--seed", type=int, default=0, help="Split seed, as passed to train_unet.py")
+    parser.add_argument("--duplicate-distance", type=int, default=DUPLICATE_DISTANCE)
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="Score every near-duplicate instead of one image per group")
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    dataset = SatelliteDataset(args.images, args.masks)
+    train_names, held_out = near_duplicate_split(args.images, dataset.filenames, args.holdout,
+                                                 args.duplicate_distance, not args.keep_duplicates, args.seed)
+    dataset = SatelliteDataset(args.images, args.masks, filenames=held_out if args.holdout else train_names)
+    loader = DataLoader(dataset, batch_size=args.batch_size, num_workers=args.workers)
+    metrics = ThresholdMetrics(parse_thresholds(args.thresholds))
+
+    print(f"🔍 Evaluating {args.model} on {len(dataset)} labeled images")
+    seconds = evaluate(model, loader, metrics)
+    print(f"⚡ {metrics.images} images in {seconds:.1f}s ({metrics.images / seconds:.1f} images/s)\n")
+
+    rows = metrics.summary()
+    print(f"{'threshold':>9} {'IoU':>7} {'Dice':>7} {'prec':>7} {'recall':>7} {'risk acc':>9}")
+    for row in rows:
+        print(f"{row['threshold']:>9.2f} {row['iou']:>7.4f} {row['dice']:>7.4f} {row['precision']:>7.4f} "
+              f"{row['recall']:>7.4f} {row['risk_accuracy']:>9.4f}")
+    best = metrics.best("iou")
+    print(f"\n✅ Best IoU {best['iou']:.4f} at threshold {best['threshold']}")
+
+    confusion = metrics.confusion_matrix(args.confusion_at)
+    print(f"\n📊 Risk confusion at threshold {confusion['threshold']:.2f} (rows true, columns predicted)")
+    print(" " * 10 + "".join(f"{level:>10}" for level in confusion["levels"]))
+    for level, counts in zip(confusion["levels"], confusion["matrix"]):
+        print(f"{level:>10}" + "".join(f"{count:>10}" for count in counts))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "model": args.model,
+                "images": metrics.images,
+                "seconds": round(seconds, 3),
+                "thresholds": rows,
+                "best_iou": best,
+                "confusion": [metrics.confusion_matrix(t) for t in metrics.thresholds],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
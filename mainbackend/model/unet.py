@@ -1,30 +1,114 @@
 import torch
 import torch.nn as nn
 
+# Channels of the first encoder level at width 1.0; each level below doubles it
+BASE_CHANNELS = 64
+
+
+def CBR(in_c, out_c):
+    """Two full 3x3 convolutions (the original TropoScan block)"""
+    return nn.Sequential(
+        nn.Conv2d(in_c, out_c, 3, padding=1),
+        nn.ReLU(inplace=True),
+        nn.Conv2d(out_c, out_c, 3, padding=1),
+        nn.ReLU(inplace=True),
+    )
+
+
+def separable_block(in_c, out_c):
+    """Two depthwise 3x3 + pointwise 1x1 convolutions, ~8-9x fewer MACs than CBR"""
+    return nn.Sequential(
+        nn.Conv2d(in_c, in_c, 3, padding=1, groups=in_c),
+        nn.Conv2d(in_c, out_c, 1),
+        nn.ReLU(inplace=True),
+        nn.Conv2d(out_c, out_c, 3, padding=1, groups=out_c),
+        nn.Conv2d(out_c, out_c, 1),
+        nn.ReLU(inplace=True),
+    )
+
+
+def bottleneck_block(in_c, out_c, reduction=4):
+    """1x1 reduce, 3x3 at a quarter of the channels, 1x1 expand"""
+    mid_c = max(4, out_c // reduction)
+    return nn.Sequential(
+        nn.Conv2d(in_c, mid_c, 1),
+        nn.ReLU(inplace=True),
+        nn.Conv2d(mid_c, mid_c, 3, padding=1),
+        nn.ReLU(inplace=True),
+        nn.Conv2d(mid_c, out_c, 1),
+        nn.ReLU(inplace=True),
+    )
+
+
+BLOCKS = {
+    "standard": CBR,
+    "separable": separable_block,
+    "bottleneck": bottleneck_block,
+}
+
+
 class UNet(nn.Module):
-    def __init__(self):
+    """U-Net for cloud-cluster segmentation.
+
+    width scales every level's channels, depth is the number of pooling levels
+    and block picks the convolution block. The defaults are the original
+    model, with the same state-dict keys (enc1, pool1, ..., dec1, final).
+    Input height and width must be divisible by 2 ** depth.
+    """
+
+    def __init__(self, width=1.0, depth=2, block="standard", in_channels=1):
         super().__init__()
-        def CBR(in_c, out_c): return nn.Sequential(
-            nn.Conv2d(in_c, out_c, 3, padding=1),
-            nn.ReLU(inplace=True),
-            nn.Conv2d(out_c, out_c, 3, padding=1),
-            nn.ReLU(inplace=True),
-        )
-        self.enc1 = CBR(1, 64)
-        self.pool1 = nn.MaxPool2d(2)
-        self.enc2 = CBR(64, 128)
-        self.pool2 = nn.MaxPool2d(2)
-        self.bottleneck = CBR(128, 256)
-        self.up2 = nn.ConvTranspose2d(256, 128, 2, stride=2)
-        self.dec2 = CBR(256, 128)
-        self.up1 = nn.ConvTranspose2d(128, 64, 2, stride=2)
-        self.dec1 = CBR(128, 64)
-        self.final = nn.Conv2d(64, 1, kernel_size=1)
+        if block not in BLOCKS:
+            raise ValueError(f"Unknown block '{block}', expected one of {sorted(BLOCKS)}")
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.config = {"width": width, "depth": depth, "block": block, "in_channels": in_channels}
+        self.depth = depth
+        make = BLOCKS[block]
+        channels = [max(4, int(round(BASE_CHANNELS * width))) * 2 ** level for level in range(depth + 1)]
+
+        previous = in_channels
+        for level in range(1, depth + 1):
+            setattr(self, f"enc{level}", make(previous, channels[level - 1]))
+            setattr(self, f"pool{level}", nn.MaxPool2d(2))
+            previous = channels[level - 1]
+        self.bottleneck = make(previous, channels[depth])
+        for level in range(depth, 0, -1):
+            setattr(self, f"up{level}", nn.ConvTranspose2d(channels[level], channels[level - 1], 2, stride=2))
+            setattr(self, f"dec{level}", make(2 * channels[level - 1], channels[level - 1]))
+        self.final = nn.Conv2d(channels[0], 1, kernel_size=1)
 
     def forward(self, x):
-        e1 = self.enc1(x)
-        e2 = self.enc2(self.pool1(e1))
-        b = self.bottleneck(self.pool2(e2))
-        d2 = self.dec2(torch.cat([self.up2(b), e2], dim=1))
-        d1 = self.dec1(torch.cat([self.up1(d2), e1], dim=1))
-        return torch.sigmoid(self.final(d1))
+        skips = []
+        for level in range(1, self.depth + 1):
+            x = getattr(self, f"enc{level}")(x)
+            skips.append(x)
+            x = getattr(self, f"pool{level}")(x)
+        x = self.bottleneck(x)
+        for level in range(self.depth, 0, -1):
+            x = getattr(self, f"dec{level}")(torch.cat([getattr(self, f"up{level}")(x), skips.pop()], dim=1))
+        return torch.sigmoid(self.final(x))
+
+
+def count_macs(model, shape=(256, 256)):
+    """Multiply-accumulates of one forward pass on a single image of shape (H, W)"""
+    total = 0
+
+    def count(module, inputs, output):
+        nonlocal total
+        weight = module.weight
+        if isinstance(module, nn.ConvTranspose2d):
+            # Every input pixel is scattered through the whole kernel
+            total += inputs[0].numel() * weight.shape[1] * weight.shape[2] * weight.shape[3]
+        else:
+            total += output.numel() * weight[0].numel()
+
+    hooks = [m.register_forward_hook(count) for m in model.modules()
+             if isinstance(m, (nn.Conv2d, nn.ConvTranspose2d))]
+    try:
+        with torch.inference_mode():
+            model(torch.zeros((1, model.config["in_channels"]) + tuple(shape)))
+    finally:
+        for hook in hooks:
+            hook.remove()
+    return total
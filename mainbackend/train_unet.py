@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Train the TropoScan U-Net from the command line
+
+Replaces the training loop of notebooks/train_unet.ipynb for unattended runs:
+parallel data loading, optional bf16 autocast on CPU, a checkpoint every
+epoch that --resume picks up, and data parallelism across CPU processes
+(torch.distributed with the gloo backend).
+
+Usage (from mainbackend/):
+    python train_unet.py --epochs 30 --workers 4 --bf16
+    python train_unet.py --epochs 30 --resume                  # continue an interrupted run
+    python train_unet.py --epochs 30 --nprocs 4                # 4 local gloo processes
+    torchrun --nnodes 2 --nproc-per-node 4 ... train_unet.py   # several CPU nodes
+"""
+
+import argparse
+import os
+import time
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader
+from torch.utils.data.distributed import DistributedSampler
+
+from model.unet import BLOCKS, UNet
+from utils.predict_mask import save_checkpoint
+from utils.segmentation_dataset import DUPLICATE_DISTANCE, SatelliteDataset, near_duplicate_split
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the TropoScan U-Net")
+    parser.add_argument("--images", default=os.path.join(BASE_DIR, "data", "images"))
+    parser.add_argument("--masks", default=os.path.join(BASE_DIR, "data", "masks.bin"),
+                        help="Mask archive (utils/mask_archive.py) or a directory of mask images")
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, "model", "unet_insat.pt"),
+                        help="Where the final weights are saved")
+    parser.add_argument("--checkpoint", default=os.path.join(BASE_DIR, "model", "train_checkpoint.pt"),
+                        help="Training state (weights, optimizer, epoch) saved after every epoch")
+    parser.add_argument("--resume", action="store_true", help="Continue from --checkpoint if it exists")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=8, help="Per process")
+    parser.add_argument("--lr", type=float, default=1e-4)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Data-loading worker processes per training process")
+    parser.add_argument("--bf16", action="store_true", help="bfloat16 autocast for the forward pass")
+    parser.add_argument("--nprocs", type=int, default=1,
+                        help="Data-parallel processes to start on this machine (ignored under torchrun)")
+    parser.add_argument("--log-every", type=int, default=10, help="Log throughput every n steps")
+    parser.add_argument("--width", type=float, default=1.0)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--block", default="standard", choices=sorted(BLOCKS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--holdout", type=float, default=0.0,
+                        help="Fraction of images kept out for evaluate_model.py --holdout (same --seed)")
+    parser.add_argument("--duplicate-distance", type=int, default=DUPLICATE_DISTANCE,
+                        help="Perceptual-hash distance under which images count as near-duplicates")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="Train on every near-duplicate instead of one image per group")
+    return parser.parse_args()
+
+
+def setup_process(rank, world_size):
+    """Join the gloo process group (if any) and split the CPU cores between processes"""
+    if world_size > 1 and not dist.is_initialized():
+        os.environ.setdefault("MASTER_ADDR", "127.0.0.1")
+        os.environ.setdefault("MASTER_PORT", "29500")
+        dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    local_processes = int(os.environ.get("LOCAL_WORLD_SIZE", world_size))
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // local_processes))
+
+
+def save_training_state(path, model, optimizer, epoch, config):
+    # Write-then-rename so an interrupted save never corrupts the last good checkpoint
+    tmp_path = f"{path}.tmp"
+    torch.save({"epoch": epoch, "config": config, "model": model.state_dict(),
+                "optimizer": optimizer.state_dict()}, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def train(rank, world_size, args):
+    setup_process(rank, world_size)
+    is_main = rank == 0
+    torch.manual_seed(args.seed)
+
+    dataset = SatelliteDataset(args.images, args.masks)
+    # Same split on every rank: near-duplicates collapsed and never shared with the held-out set
+    train_names, _ = near_duplicate_split(args.images, dataset.filenames, args.holdout, args.duplicate_distance,
+                                          not args.keep_duplicates, args.seed)
+    dataset = SatelliteDataset(args.images, args.masks, filenames=train_names)
+    sampler = DistributedSampler(dataset, world_size, rank, shuffle=True, seed=args.seed) if world_size > 1 else None
+    loader = DataLoader(dataset, batch_size=args.batch_size, shuffle=sampler is None, sampler=sampler,
+                        num_workers=args.workers, persistent_workers=args.workers > 0,
+                        prefetch_factor=4 if args.workers > 0 else None)
+
+    model = UNet(width=args.width, depth=args.depth, block=args.block)
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+    start_epoch = 0
+    if args.resume and os.path.exists(args.checkpoint):
+        state = torch.load(args.checkpoint, map_location="cpu")
+        if state["config"] != model.config:
+            raise ValueError(f"Checkpoint was trained with {state['config']}, not {model.config}")
+        model.load_state_dict(state["model"])
+        optimizer.load_state_dict(state["optimizer"])
+        start_epoch = state["epoch"]
+        if is_main:
+            print(f"🔄 Resuming from {args.checkpoint} after epoch {start_epoch}")
+    network = DistributedDataParallel(model) if world_size > 1 else model
+    loss_fn = nn.BCELoss()
+
+    if is_main:
+        print(f"📁 {len(dataset)} samples, {world_size} process(es) x batch {args.batch_size}, "
+              f"{args.workers} loader worker(s) each, bf16={args.bf16}")
+
+    for epoch in range(start_epoch, args.epochs):
+        if sampler is not None:
+            sampler.set_epoch(epoch)
+        network.train()
+        total_loss, seen = 0.0, 0
+        epoch_start = window_start = time.perf_counter()
+        window_samples = 0
+        for step, (images, masks) in enumerate(loader, 1):
+            with torch.autocast("cpu", dtype=torch.bfloat16, enabled=args.bf16):
+                pred = network(images)
+            # BCE in fp32: the sigmoid output is bf16 under autocast
+            loss = loss_fn(pred.float(), masks)
+            optimizer.zero_grad(set_to_none=True)
+            loss.backward()
+            optimizer.step()
+
+            total_loss += loss.item() * len(images)
+            seen += len(images)
+            window_samples += len(images)
+            if is_main and step % args.log_every == 0:
+                rate = window_samples * world_size / (time.perf_counter() - window_start)
+                print(f"   step {step}/{len(loader)} loss {loss.item():.4f} {rate:.1f} samples/s")
+                window_start, window_samples = time.perf_counter(), 0
+
+        totals = torch.tensor([total_loss, seen], dtype=torch.float64)
+        if world_size > 1:
+            dist.all_reduce(totals)
+        seconds = time.perf_counter() - epoch_start
+        if is_main:
+            print(f"Epoch {epoch + 1}/{args.epochs}, Loss: {totals[0] / totals[1]:.4f}, "
+                  f"{totals[1] / seconds:.1f} samples/s ({seconds:.1f}s)")
+            save_training_state(args.checkpoint, model, optimizer, epoch + 1, model.config)
+
+    if is_main:
+        save_checkpoint(model, args.output)
+        print(f"✅ Model saved to {args.output}")
+    if world_size > 1:
+        dist.destroy_process_group()
+
+
+def main():
+    args = parse_args()
+    if "WORLD_SIZE" in os.environ:
+        # Launched by torchrun, which also sets MASTER_ADDR/MASTER_PORT
+        train(int(os.environ["RANK"]), int(os.environ["WORLD_SIZE"]), args)
+    elif args.nprocs > 1:
+        mp.spawn(train, args=(args.nprocs, args), nprocs=args.nprocs)
+    else:
+        train(0, 1, args)
+
+
+if __name__ == "__main__":
+    main()
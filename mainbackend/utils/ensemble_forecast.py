@@ -0,0 +1,114 @@
+import numpy as np
+
+KM_PER_DEGREE = 111.0
+
+DEFAULT_LEAD_HOURS = (6, 12, 18, 24, 36, 48)
+
+
+def local_distance_km(lat, lon, ref_lat, ref_lon):
+    """Equirectangular distance around a reference point: no trig per element, and
+    well within 1% of haversine over the few hundred km a forecast cone spans"""
+    scale = np.cos(np.radians(ref_lat)) * KM_PER_DEGREE
+    return np.hypot((lon - ref_lon) * scale, (lat - ref_lat) * KM_PER_DEGREE)
+
+
+def propagate_members(latitudes, longitudes, speeds_kmh, headings_deg, members=500, hours=48, step_hours=3,
+                      speed_spread=0.2, heading_spread_deg=15.0, recurvature_deg_per_day=10.0,
+                      heading_noise_deg=4.0, rng=None):
+    """Perturbed tracks for every cluster and member at once.
+
+    Each member gets a lognormal speed factor, a heading offset and a steady
+    turn rate (recurvature, biased towards the right as storms recurve
+    poleward in the northern hemisphere), plus a small random walk in
+    heading per step. Returns (times, lat, lon) with lat/lon shaped
+    (clusters, members, steps + 1) and times in hours.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    latitudes = np.asarray(latitudes, dtype=np.float64)[:, None, None]
+    longitudes = np.asarray(longitudes, dtype=np.float64)[:, None, None]
+    speeds = np.asarray(speeds_kmh, dtype=np.float64)[:, None, None]
+    headings = np.asarray(headings_deg, dtype=np.float64)[:, None, None]
+    clusters, steps = latitudes.shape[0], int(np.ceil(hours / step_hours))
+    times = np.arange(1, steps + 1) * step_hours
+
+    def normal(shape):
+        return rng.standard_normal(shape, dtype=np.float32)
+
+    per_member = (clusters, members, 1)
+    step_km = (speeds * step_hours).astype(np.float32) * np.exp(speed_spread * normal(per_member))
+    turn_rate = (recurvature_deg_per_day + recurvature_deg_per_day * normal(per_member)) / 24.0
+    heading = np.cumsum(normal((clusters, members, steps)), axis=2)
+    heading *= heading_noise_deg
+    heading += turn_rate * times.astype(np.float32)
+    heading += headings.astype(np.float32) + heading_spread_deg * normal(per_member)
+    heading = np.radians(heading)
+
+    lat = np.cumsum(step_km * np.cos(heading), axis=2)
+    lat /= KM_PER_DEGREE
+    lat += latitudes.astype(np.float32)
+    # East-west degrees shrink with latitude; use the latitude at the start of each step
+    lat_before = np.concatenate([np.broadcast_to(latitudes.astype(np.float32), per_member), lat[..., :-1]], axis=2)
+    east_km = step_km * np.sin(heading)
+    east_km /= np.cos(np.radians(lat_before)) * np.float32(KM_PER_DEGREE)
+    lon = np.cumsum(east_km, axis=2)
+    lon += longitudes.astype(np.float32)
+
+    start_lat = np.broadcast_to(latitudes.astype(np.float32), per_member)
+    start_lon = np.broadcast_to(longitudes.astype(np.float32), per_member)
+    return (np.concatenate([[0], times]), np.concatenate([start_lat, lat], axis=2),
+            np.concatenate([start_lon, lon], axis=2))
+
+
+def ensemble_forecast(latitudes, longitudes, speeds_kmh, headings_deg, coast=None, lead_hours=DEFAULT_LEAD_HOURS,
+                      members=500, landfall_radius_km=150.0, percentiles=(50, 90), rng=None, **spread):
+    """Ensemble mean track, uncertainty cone and landfall odds for each cluster.
+
+    coast is (lat, lon) of the threatened coastline; a member makes landfall
+    once its track comes within landfall_radius_km of it. Cone radii are
+    percentiles of the members' distance from the mean position.
+    """
+    lead_hours = np.asarray(lead_hours)
+    times, lat, lon = propagate_members(latitudes, longitudes, speeds_kmh, headings_deg, members,
+                                        hours=int(lead_hours.max()), rng=rng, **spread)
+    leads = np.searchsorted(times, lead_hours)
+    lat_at, lon_at = lat[..., leads], lon[..., leads]  # clusters x members x leads
+
+    mean_lat, mean_lon = lat_at.mean(axis=1), lon_at.mean(axis=1)
+    spread_km = local_distance_km(lat_at, lon_at, mean_lat[:, None], mean_lon[:, None])
+    cone = np.percentile(spread_km, percentiles, axis=1)  # percentiles x clusters x leads
+    lat_band = np.percentile(lat_at, (10, 90), axis=1)
+    lon_band = np.percentile(lon_at, (10, 90), axis=1)
+
+    landfall = None
+    if coast is not None:
+        near = local_distance_km(lat, lon, coast[0], coast[1]) <= landfall_radius_km
+        reached = np.maximum.accumulate(near, axis=2)
+        probability = reached[..., leads].mean(axis=1)  # clusters x leads
+        first = np.where(near.any(axis=2), near.argmax(axis=2), -1)
+        landfall = {"probability": probability, "first_step": first, "times": times}
+
+    forecasts = []
+    for c in range(lat.shape[0]):
+        track = []
+        for k, hours in enumerate(lead_hours):
+            point = {
+                "hours_from_now": int(hours),
+                "latitude": round(float(mean_lat[c, k]), 2),
+                "longitude": round(float(mean_lon[c, k]), 2),
+                "latitude_p10_p90": [round(float(lat_band[0, c, k]), 2), round(float(lat_band[1, c, k]), 2)],
+                "longitude_p10_p90": [round(float(lon_band[0, c, k]), 2), round(float(lon_band[1, c, k]), 2)],
+            }
+            for p, radii in zip(percentiles, cone):
+                point[f"cone_radius_km_p{p}"] = round(float(radii[c, k]), 1)
+            if landfall is not None:
+                point["landfall_probability"] = round(float(landfall["probability"][c, k]), 3)
+            track.append(point)
+        forecast = {"members": members, "track": track}
+        if landfall is not None:
+            hits = landfall["first_step"][c]
+            hits = hits[hits >= 0]
+            forecast["landfall_probability"] = round(float(len(hits) / members), 3)
+            forecast["median_hours_to_landfall"] = (
+                float(np.median(landfall["times"][hits])) if len(hits) else None)
+        forecasts.append(forecast)
+    return forecasts
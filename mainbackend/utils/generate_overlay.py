@@ -1,19 +1,17 @@
-import numpy as np
 from PIL import Image
+from utils.image_decode import as_decoded, as_mask_array
+from utils.overlay_renderer import render_probability_overlay
 
-def create_overlay(image_path, mask_path, output_path):
-    image = Image.open(image_path).convert("RGB").resize((256, 256))
-    mask = Image.open(mask_path).convert("L").resize((256, 256))
-    
-    image_arr = np.array(image)
-    mask_arr = np.array(mask)
+def render_overlay(image, mask, colormap="red"):
+    # image: path or DecodedImage; mask: path, PIL image or uint8 mask/probability levels
+    image_arr = as_decoded(image).rgb_array
+    mask_arr = as_mask_array(mask)
 
-    # Make a red overlay where mask is white (255)
-    red_overlay = np.zeros_like(image_arr)
-    red_overlay[..., 0] = 255  # Red channel
+    # "red" paints the mask solid red; other colormaps blend probability levels
+    return render_probability_overlay(image_arr, mask_arr, colormap)
 
-    combined = np.where(mask_arr[..., None] > 128, red_overlay, image_arr)
-    result = Image.fromarray(combined.astype(np.uint8))
+def create_overlay(image_path, mask_path, output_path):
+    result = Image.fromarray(render_overlay(image_path, mask_path))
     result.save(output_path)
 
     return output_path
\ No newline at end of file
@@ -0,0 +1,90 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+MODEL_INPUT_SIZE = (256, 256)
+
+# Bilinear matches the T.Resize used for model input before this module existed
+RESAMPLE = Image.BILINEAR
+
+
+class DecodedImage:
+    """One decode of an input image, shared by prediction, overlay and risk code.
+
+    The file is read once (``data`` keeps the raw bytes for echoing back to
+    clients) and decoded once. For JPEGs much larger than the target size the
+    decoder is asked for a reduced-size DCT decode (``Image.draft``), which
+    skips most of the full-resolution work before the final resize. Grayscale
+    and RGB views at ``size`` are derived from that single decode on demand.
+    ``max_pixels`` refuses oversized images after reading only the header.
+    """
+
+    def __init__(self, source, size=MODEL_INPUT_SIZE, max_pixels=None):
+        if isinstance(source, (bytes, bytearray)):
+            self.data = bytes(source)
+        elif hasattr(source, "read"):
+            self.data = source.read()
+        else:
+            with open(source, "rb") as f:
+                self.data = f.read()
+        self.size = tuple(size)
+
+        image = Image.open(io.BytesIO(self.data))
+        self.format = image.format
+        self.source_size = image.size
+        if max_pixels and image.size[0] * image.size[1] > max_pixels:
+            raise ValueError(f"Image is {image.size[0]}x{image.size[1]}, more than {max_pixels} pixels")
+        # Only shrinks JPEG decoding, and never below the requested size
+        image.draft(None, self.size)
+        image.load()
+        self._base = image
+        self._gray = None
+        self._rgb = None
+
+    @property
+    def gray(self):
+        """Grayscale PIL image at the target size"""
+        if self._gray is None:
+            if self._base.mode == "L":
+                self._gray = self._base.resize(self.size, RESAMPLE)
+            else:
+                self._gray = self.rgb.convert("L")
+        return self._gray
+
+    @property
+    def rgb(self):
+        """RGB PIL image at the target size"""
+        if self._rgb is None:
+            if self._base.mode == "L":
+                self._rgb = self.gray.convert("RGB")
+            else:
+                self._rgb = self._base.convert("RGB").resize(self.size, RESAMPLE)
+        return self._rgb
+
+    @property
+    def gray_array(self):
+        return np.asarray(self.gray)
+
+    @property
+    def rgb_array(self):
+        return np.asarray(self.rgb)
+
+
+def as_decoded(source, size=MODEL_INPUT_SIZE):
+    """Accept a path, bytes, file object or an existing DecodedImage"""
+    if isinstance(source, DecodedImage):
+        return source
+    return DecodedImage(source, size)
+
+
+def as_mask_array(mask, size=MODEL_INPUT_SIZE):
+    """Accept a mask path, PIL image or array and return a uint8 array at size"""
+    if isinstance(mask, np.ndarray):
+        return mask
+    if not isinstance(mask, Image.Image):
+        mask = Image.open(mask)
+    mask = mask.convert("L")
+    if mask.size != tuple(size):
+        mask = mask.resize(size)
+    return np.asarray(mask)
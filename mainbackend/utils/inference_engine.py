@@ -0,0 +1,210 @@
+import queue
+import threading
+import time
+import weakref
+
+import numpy as np
+import torch
+
+# Default cap on the activation working set of one forward pass
+DEFAULT_MEMORY_BUDGET_BYTES = 512 * 1024 * 1024
+
+
+def _read_status_kb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def reset_peak_rss():
+    """Reset the kernel's RSS high-water mark (VmHWM); False where unsupported"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def read_peak_rss_bytes():
+    """Process RSS high-water mark since start or the last reset_peak_rss()"""
+    return _read_status_kb("VmHWM")
+
+
+def read_current_rss_bytes():
+    return _read_status_kb("VmRSS")
+
+
+def estimate_sample_bytes(model, shape):
+    """Upper bound on activation bytes one sample needs in a forward pass.
+
+    Sums the outputs of every leaf module on a single probe sample. In-place
+    modules are skipped since they reuse their input. Ops outside modules
+    (torch.cat) are not counted, but most summed activations are freed before
+    the end of the pass, so the total stays a conservative estimate.
+    """
+    total = 0
+
+    def count(module, inputs, output):
+        nonlocal total
+        if not getattr(module, "inplace", False) and isinstance(output, torch.Tensor):
+            total += output.numel() * output.element_size()
+
+    hooks = [m.register_forward_hook(count) for m in model.modules() if not list(m.children())]
+    try:
+        with torch.inference_mode():
+            model(torch.zeros((1, 1) + tuple(shape)))
+    finally:
+        for hook in hooks:
+            hook.remove()
+    return total
+
+
+class InferenceEngine:
+    """Runs grayscale batches through a model inside a fixed memory budget.
+
+    Up to ``concurrency`` forward passes run at once, each with its own
+    preallocated float32 input and output buffers and an equal share of
+    ``memory_budget_bytes``, so the budget holds for the process as a whole.
+    Batches are split into chunks that fit that share (from a per-sample
+    activation estimate, cached per model and resolution), and outputs are
+    copied straight into the caller's ``out``, the pass's reused output
+    buffer (when a ``consume`` callback reads it) or a new array.
+    Everything runs under ``torch.inference_mode``.
+
+    Peak memory in the reports is the process-wide RSS high-water mark while
+    the call ran. It includes concurrent passes and everything else the
+    process holds, so it bounds the call's usage rather than measuring it.
+    """
+
+    def __init__(self, memory_budget_bytes=DEFAULT_MEMORY_BUDGET_BYTES, concurrency=2):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.concurrency = max(1, concurrency)
+        self._sample_bytes = weakref.WeakKeyDictionary()  # model -> {shape: bytes}
+        self._estimate_lock = threading.Lock()
+        # One [input, output] buffer pair per concurrent pass; taking one is what admits a pass
+        self._buffers = queue.LifoQueue()
+        for _ in range(self.concurrency):
+            self._buffers.put([None, None])
+        self._stats_lock = threading.Lock()
+        self._active = 0
+        self._peak_tracked = False
+        self.requests = 0
+        self.max_process_peak_rss_bytes = 0
+
+    @property
+    def pass_budget_bytes(self):
+        return self.memory_budget_bytes // self.concurrency
+
+    def sample_bytes(self, model, shape):
+        with self._estimate_lock:
+            per_shape = self._sample_bytes.setdefault(model, {})
+            if tuple(shape) not in per_shape:
+                per_shape[tuple(shape)] = estimate_sample_bytes(model, shape)
+            return per_shape[tuple(shape)]
+
+    def chunk_size(self, model, shape):
+        """Largest batch whose activations fit one pass's share of the budget (at least 1)"""
+        return max(1, self.pass_budget_bytes // max(1, self.sample_bytes(model, shape)))
+
+    @staticmethod
+    def _input_buffer(slot, batch, shape):
+        # Grows to the largest chunk seen at this resolution, then is reused
+        buffer = slot[0]
+        if buffer is None or buffer.shape[2:] != tuple(shape) or buffer.shape[0] < batch:
+            buffer = torch.empty((batch, 1) + tuple(shape), dtype=torch.float32)
+            slot[0] = buffer
+        return buffer[:batch]
+
+    @staticmethod
+    def _output_buffer(slot, count, shape):
+        # Same growth rule as the input buffer, over the whole batch
+        buffer = slot[1]
+        if buffer is None or buffer.shape[1:] != tuple(shape) or buffer.shape[0] < count:
+            buffer = np.empty((count,) + tuple(shape), dtype=np.float32)
+            slot[1] = buffer
+        return buffer[:count]
+
+    def _report(self, count, chunk, sample_bytes, peak=0, rss_before=0, seconds=0.0):
+        return {
+            "images": count,
+            "chunk_size": chunk,
+            "chunks": -(-count // chunk) if chunk else 0,
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "pass_budget_bytes": self.pass_budget_bytes,
+            "estimated_sample_bytes": sample_bytes,
+            "process_peak_rss_bytes": peak,
+            "process_peak_rss_delta_bytes": max(0, peak - rss_before),
+            "seconds": round(seconds, 4),
+        }
+
+    def predict(self, model, grays, out=None, consume=None):
+        """Probabilities for a stack of uint8 grayscale images (N x H x W).
+
+        Returns ``(probabilities, report)``; probabilities is ``out`` when given
+        (float32, N x H x W). With ``consume`` and no ``out`` the pass writes into
+        its reused output buffer, valid only during the call, and returns
+        ``(consume(probabilities), report)`` instead. The report has the chunking
+        and the process peak RSS. An empty batch never reaches the model.
+        """
+        grays = np.asarray(grays, dtype=np.uint8)
+        if grays.ndim == 2:
+            grays = grays[None]
+        count, shape = len(grays), grays.shape[1:]
+        if count == 0:
+            empty = np.empty((0,) + shape, dtype=np.float32) if out is None else out
+            return (consume(empty) if consume is not None else empty), self._report(0, 0, None)
+        chunk = min(count, self.chunk_size(model, shape))
+
+        slot = self._buffers.get()
+        try:
+            if out is None:
+                out = self._output_buffer(slot, count, shape) if consume is not None else \
+                    np.empty((count,) + shape, dtype=np.float32)
+            result = torch.from_numpy(out)
+            with self._stats_lock:
+                self._active += 1
+                # Resetting the high-water mark while another pass runs would hide that pass's peak
+                if self._active == 1:
+                    self._peak_tracked = reset_peak_rss()
+            try:
+                rss_before = read_current_rss_bytes()
+                start = time.perf_counter()
+                with torch.inference_mode():
+                    for first in range(0, count, chunk):
+                        batch = grays[first:first + chunk]
+                        inputs = self._input_buffer(slot, len(batch), shape)
+                        np.copyto(inputs.numpy()[:, 0], batch)  # uint8 -> float32 in place
+                        inputs.div_(255)
+                        result[first:first + len(batch)].copy_(model(inputs).squeeze(1))
+                seconds = time.perf_counter() - start
+                peak = read_peak_rss_bytes() if self._peak_tracked else max(rss_before, read_current_rss_bytes())
+                with self._stats_lock:
+                    self.requests += 1
+                    self.max_process_peak_rss_bytes = max(self.max_process_peak_rss_bytes, peak)
+            finally:
+                with self._stats_lock:
+                    self._active -= 1
+            # Still holding the slot, so no other pass can overwrite its output buffer yet
+            if consume is not None:
+                out = consume(out)
+        finally:
+            self._buffers.put(slot)
+
+        return out, self._report(count, chunk, self.sample_bytes(model, shape), peak, rss_before, seconds)
+
+    def describe(self):
+        with self._stats_lock:
+            return {
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "concurrency": self.concurrency,
+                "pass_budget_bytes": self.pass_budget_bytes,
+                "active_passes": self._active,
+                "requests": self.requests,
+                "max_process_peak_rss_bytes": self.max_process_peak_rss_bytes,
+            }
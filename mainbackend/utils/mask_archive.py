@@ -0,0 +1,201 @@
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+from PIL import Image
+
+# Single-file archive of binary masks, laid out like the flat weight files:
+#   [8-byte little-endian header length][JSON header][mask payloads]
+# The header maps each mask name to its shape, encoding, byte range and
+# cloudy pixel count. Payloads are 1 bit per pixel (np.packbits, row-major)
+# or, when that is smaller, run lengths of alternating background and cloud
+# pixels. Either way reading a mask is a view of the mapped file plus an
+# unpack, with no image decode.
+HEADER_LENGTH_BYTES = 8
+ALIGNMENT = 8
+ENCODINGS = ("bits", "rle")
+
+# Pixels above this value are cloud, as in the 0/255 masks the dataset writes
+MASK_THRESHOLD = 127
+MAX_RUN = np.iinfo(np.uint16).max
+
+
+def encode_mask_bits(bits):
+    return np.packbits(bits, axis=None).tobytes()
+
+
+def decode_mask_bits(buffer, shape, offset=0):
+    count = shape[0] * shape[1]
+    packed = np.frombuffer(buffer, dtype=np.uint8, count=(count + 7) // 8, offset=offset)
+    return np.unpackbits(packed, count=count).reshape(shape).view(bool)
+
+
+def encode_mask_rle(bits):
+    """Run lengths (uint16) alternating background / cloud, starting with background.
+
+    Runs longer than MAX_RUN are split by a zero-length run of the other value.
+    """
+    flat = bits.ravel()
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    lengths = np.diff(np.concatenate(([0], change, [flat.size])))
+    if flat.size and flat[0]:
+        lengths = np.concatenate(([0], lengths))
+    if lengths.size and lengths.max() > MAX_RUN:
+        split = []
+        for length in lengths.tolist():
+            while length > MAX_RUN:
+                split += [MAX_RUN, 0]
+                length -= MAX_RUN
+            split.append(length)
+        lengths = np.array(split)
+    return lengths.astype("<u2").tobytes()
+
+
+def decode_mask_rle(buffer, shape, offset=0, nbytes=None):
+    count = (len(buffer) - offset if nbytes is None else nbytes) // 2
+    lengths = np.frombuffer(buffer, dtype="<u2", count=count, offset=offset)
+    values = np.arange(count) % 2 == 1
+    return np.repeat(values, lengths).reshape(shape)
+
+
+ENCODERS = {"bits": encode_mask_bits, "rle": encode_mask_rle}
+
+
+def as_mask_bits(mask):
+    """Boolean cloud array from a 0/255 (or 0/1, or bool) mask array"""
+    mask = np.asarray(mask)
+    return mask if mask.dtype == bool else mask > (MASK_THRESHOLD if mask.max(initial=0) > 1 else 0)
+
+
+def save_mask_archive(masks, path, encoding="auto", metadata=None):
+    """Write (name, mask array) pairs, or a dict of them, as one mask archive.
+
+    encoding is "bits", "rle" or "auto" (whichever is smaller for each mask).
+    """
+    if encoding not in ENCODINGS + ("auto",):
+        raise ValueError(f"Unknown mask encoding '{encoding}'")
+    header = {}
+    payloads = []
+    offset = 0
+    for name, mask in (masks.items() if isinstance(masks, dict) else masks):
+        bits = as_mask_bits(mask)
+        if bits.ndim != 2:
+            raise ValueError(f"Mask '{name}' must be 2-D, got shape {bits.shape}")
+        if encoding == "auto":
+            chosen, payload = min(((e, ENCODERS[e](bits)) for e in ENCODINGS), key=lambda item: len(item[1]))
+        else:
+            chosen, payload = encoding, ENCODERS[encoding](bits)
+        header[name] = {
+            "shape": list(bits.shape),
+            "encoding": chosen,
+            "data_offsets": [offset, offset + len(payload)],
+            "cloudy": int(bits.sum()),
+        }
+        payloads.append(payload)
+        offset += len(payload) + (-len(payload) % ALIGNMENT)
+    if metadata:
+        header["__metadata__"] = {k: str(v) for k, v in metadata.items()}
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-(len(header_bytes) + HEADER_LENGTH_BYTES) % ALIGNMENT)
+
+    # Write to a temp file and rename so readers never map a partial archive
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for payload in payloads:
+            f.write(payload)
+            f.write(b"\0" * (-len(payload) % ALIGNMENT))
+    os.replace(tmp_path, path)
+    return path
+
+
+class MaskArchive:
+    """Read-only, memory-mapped view of a mask archive.
+
+    ``archive[name]`` is a 0/255 uint8 mask like the ones loaded from image
+    files, ``bits(name)`` the boolean mask, and ``coverage(name)`` the cloud
+    percentage straight from the header. The file is mapped lazily, so the
+    archive can be handed to DataLoader worker processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            (header_length,) = struct.unpack("<Q", f.read(HEADER_LENGTH_BYTES))
+            self.index = json.loads(f.read(header_length))
+        self.metadata = self.index.pop("__metadata__", {})
+        self.data_start = HEADER_LENGTH_BYTES + header_length
+        self._buffer = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_buffer"] = None
+        return state
+
+    @property
+    def buffer(self):
+        if self._buffer is None:
+            with open(self.path, "rb") as f:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._buffer
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def shape(self, name):
+        return tuple(self.index[name]["shape"])
+
+    def bits(self, name):
+        info = self.index[name]
+        begin, end = info["data_offsets"]
+        if info["encoding"] == "rle":
+            return decode_mask_rle(self.buffer, tuple(info["shape"]), self.data_start + begin, end - begin)
+        return decode_mask_bits(self.buffer, tuple(info["shape"]), self.data_start + begin)
+
+    def __getitem__(self, name):
+        return self.bits(name).view(np.uint8) * np.uint8(255)
+
+    def coverage(self, name):
+        """Cloud coverage of a mask in percent, without reading its pixels"""
+        info = self.index[name]
+        return info["cloudy"] / (info["shape"][0] * info["shape"][1]) * 100
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+
+def convert_mask_directory(mask_dir, archive_path, encoding="auto"):
+    """Pack every mask image in a directory (e.g. the old data/masks JPEGs) into one archive"""
+    def masks():
+        for name in sorted(os.listdir(mask_dir)):
+            with Image.open(os.path.join(mask_dir, name)) as image:
+                yield name, np.asarray(image.convert("L"))
+    return save_mask_archive(masks(), archive_path, encoding, metadata={"source": os.path.basename(mask_dir)})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pack a directory of mask images into a bit-packed mask archive")
+    parser.add_argument("masks", help="Directory of mask images (e.g. data/masks)")
+    parser.add_argument("--output", help="Archive path (defaults to <masks>.bin)")
+    parser.add_argument("--encoding", choices=ENCODINGS + ("auto",), default="auto")
+    args = parser.parse_args()
+
+    output = convert_mask_directory(args.masks, args.output or args.masks.rstrip("/\\") + ".bin", args.encoding)
+    archive = MaskArchive(output)
+    raw_bytes = sum(np.prod(archive.shape(name)) for name in archive)
+    print(f"✅ {len(archive)} masks written to {output}: {os.path.getsize(output)} bytes, "
+          f"{raw_bytes / os.path.getsize(output):.1f}x smaller than uint8")
@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+
+# Decimal places kept for coordinates (~11 m at the equator)
+COORDINATE_DECIMALS = 4
+
+
+def pixel_to_lonlat(points, shape, bounds):
+    """Map (x, y) pixel coordinates to (lon, lat) inside bounds = (west, south, east, north).
+
+    Row 0 is the northern edge, as in the satellite image; the cyclone centre,
+    forecast origins and map tiles use the same convention.
+    """
+    west, south, east, north = bounds
+    height, width = shape
+    points = np.asarray(points, dtype=np.float64)
+    lon = west + points[:, 0] / width * (east - west)
+    lat = north - points[:, 1] / height * (north - south)
+    return np.round(np.stack([lon, lat], axis=1), COORDINATE_DECIMALS)
+
+
+def _ring(contour, shape, bounds, tolerance):
+    simplified = cv2.approxPolyDP(contour, tolerance, True) if tolerance > 0 else contour
+    points = simplified.reshape(-1, 2)
+    if len(points) < 3:
+        return None
+    coords = pixel_to_lonlat(points + 0.5, shape, bounds).tolist()
+    coords.append(coords[0])
+    return coords
+
+
+def _signed_area(ring):
+    ring = np.asarray(ring)
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+
+
+def _oriented(ring, counter_clockwise):
+    # RFC 7946: exterior rings counter-clockwise, holes clockwise
+    if ring is not None and (_signed_area(ring) > 0) != counter_clockwise:
+        ring.reverse()
+    return ring
+
+
+def mask_to_geojson(mask_array, bounds, tolerance=1.0, min_area=4, probabilities=None):
+    """Trace a binary mask into simplified GeoJSON polygons, one feature per cluster.
+
+    tolerance is the Douglas-Peucker distance in pixels; clusters smaller than
+    min_area pixels are dropped. probabilities (uint8 0-255, optional) adds
+    mean/max cluster probability to each feature.
+    """
+    binary = (np.asarray(mask_array) > 128).astype(np.uint8)
+    shape = binary.shape
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    contours, hierarchy = cv2.findContours(binary, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+
+    # Per-cluster probability statistics in one pass over the labels
+    if probabilities is not None:
+        flat_labels = labels.ravel()
+        flat_probs = np.asarray(probabilities, dtype=np.float64).ravel()
+        prob_sums = np.bincount(flat_labels, weights=flat_probs, minlength=count)
+        prob_max = np.zeros(count)
+        np.maximum.at(prob_max, flat_labels, flat_probs)
+
+    total_pixels = binary.size
+    features = []
+    for index, contour in enumerate(contours):
+        if hierarchy[0][index][3] != -1:
+            continue  # holes are attached to their outer contour below
+        x, y = contour[0][0]
+        label = labels[y, x]
+        area = int(stats[label, cv2.CC_STAT_AREA])
+        if area < min_area:
+            continue
+
+        exterior = _oriented(_ring(contour, shape, bounds, tolerance), counter_clockwise=True)
+        if exterior is None:
+            continue
+        rings = [exterior]
+        child = hierarchy[0][index][2]
+        while child != -1:
+            hole = _oriented(_ring(contours[child], shape, bounds, tolerance), counter_clockwise=False)
+            if hole is not None:
+                rings.append(hole)
+            child = hierarchy[0][child][0]
+
+        centroid = pixel_to_lonlat([centroids[label] + 0.5], shape, bounds)[0]
+        left, top = stats[label, cv2.CC_STAT_LEFT], stats[label, cv2.CC_STAT_TOP]
+        width, height = stats[label, cv2.CC_STAT_WIDTH], stats[label, cv2.CC_STAT_HEIGHT]
+        corners = pixel_to_lonlat([[left, top], [left + width, top + height]], shape, bounds)
+        properties = {
+            "cluster_id": int(label),
+            "area_pixels": area,
+            "coverage_percent": round(area / total_pixels * 100, 2),
+            "centroid": {"longitude": float(centroid[0]), "latitude": float(centroid[1])},
+            "bbox": [float(corners[:, 0].min()), float(corners[:, 1].min()),
+                     float(corners[:, 0].max()), float(corners[:, 1].max())],
+        }
+        if probabilities is not None:
+            properties["mean_probability"] = round(float(prob_sums[label]) / area / 255, 3)
+            properties["max_probability"] = round(float(prob_max[label]) / 255, 3)
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": rings},
+            "properties": properties,
+        })
+
+    features.sort(key=lambda f: f["properties"]["area_pixels"], reverse=True)
+    return {
+        "type": "FeatureCollection",
+        "bbox": list(bounds),
+        "features": features,
+        "properties": {"tolerance_pixels": tolerance, "clusters": len(features)},
+    }
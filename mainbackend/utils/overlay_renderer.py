@@ -0,0 +1,113 @@
+import threading
+
+import numpy as np
+from PIL import Image
+
+# Control points (level 0-255, (R, G, B, A)) linearly interpolated into 256-entry tables
+COLORMAP_STOPS = {
+    # Detected pixels in solid red, the rest untouched (same look as create_overlay)
+    "red": [(0, (255, 0, 0, 0)), (127, (255, 0, 0, 0)), (128, (255, 0, 0, 255)), (255, (255, 0, 0, 255))],
+    # Yellow -> red heatmap fading in with probability
+    "heat": [(0, (255, 220, 0, 0)), (25, (255, 220, 0, 0)), (128, (255, 140, 0, 140)), (255, (255, 0, 0, 210))],
+    # Perceptually ordered blue -> green -> yellow
+    "viridis": [(0, (68, 1, 84, 0)), (25, (68, 1, 84, 0)), (64, (59, 82, 139, 120)), (128, (33, 145, 140, 160)),
+                (192, (94, 201, 98, 190)), (255, (253, 231, 37, 220))],
+    # Hard bands following the risk levels: watch / moderate / high
+    "risk": [(0, (0, 0, 0, 0)), (76, (0, 0, 0, 0)), (77, (250, 204, 21, 110)), (127, (250, 204, 21, 110)),
+             (128, (249, 115, 22, 170)), (191, (249, 115, 22, 170)), (192, (220, 38, 38, 220)), (255, (220, 38, 38, 220))],
+}
+
+
+def colormap_lut(name):
+    """256x4 uint8 RGBA lookup table for a named colormap"""
+    if name not in COLORMAP_STOPS:
+        raise ValueError(f"Unknown colormap '{name}', expected one of {sorted(COLORMAP_STOPS)}")
+    levels, colors = zip(*COLORMAP_STOPS[name])
+    colors = np.array(colors, dtype=np.float64)
+    lut = np.stack([np.interp(np.arange(256), levels, colors[:, c]) for c in range(4)], axis=1)
+    return np.round(lut).astype(np.uint8)
+
+
+COLORMAPS = {name: colormap_lut(name) for name in COLORMAP_STOPS}
+
+
+def _lookup(colormap):
+    if colormap not in COLORMAPS:
+        raise ValueError(f"Unknown colormap '{colormap}', expected one of {sorted(COLORMAPS)}")
+    return COLORMAPS[colormap]
+
+
+def resize_levels(levels, shape):
+    """Bilinearly resample a uint8 level map (e.g. a 256x256 probability map) to (height, width)"""
+    if levels.shape == tuple(shape):
+        return levels
+    return np.asarray(Image.fromarray(levels).resize((shape[1], shape[0]), Image.BILINEAR))
+
+
+class OverlayRenderer:
+    """Alpha-blends colormapped probability levels onto RGB images.
+
+    Each colormap is precomputed into per-level tables of premultiplied colour
+    and inverse alpha (alpha scaled to 0-256 so the divide is a shift), so a
+    render is two table gathers, one multiply-add and a shift over reusable
+    buffers - no per-call mask, overlay or np.where copies.
+    """
+
+    def __init__(self):
+        self._tables = {}
+        self._local = threading.local()  # working buffers are per thread
+
+    def _table(self, colormap):
+        if colormap not in self._tables:
+            lut = _lookup(colormap)
+            alpha = lut[:, 3].astype(np.uint16)
+            alpha = alpha + (alpha >> 7)  # 0-255 -> 0-256
+            premultiplied = lut[:, :3].astype(np.uint16) * alpha[:, None]
+            self._tables[colormap] = (premultiplied, (256 - alpha).astype(np.uint16))
+        return self._tables[colormap]
+
+    def _working_buffers(self, shape):
+        # Only the most recent resolution is kept, so odd sizes can't pile up buffers
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None or buffers[0].shape != shape:
+            height, width = shape
+            buffers = (np.empty((height, width), dtype=np.uint16),
+                       np.empty((height, width, 3), dtype=np.uint16),
+                       np.empty((height, width, 3), dtype=np.uint16))
+            self._local.buffers = buffers
+        return buffers
+
+    def render(self, rgb, levels, colormap="red", out=None):
+        """Blend ``levels`` (uint8, 0-255) coloured by ``colormap`` over ``rgb`` (HxWx3 uint8).
+
+        Writes into ``out`` (may be ``rgb`` itself for a fully in-place render)
+        or a new uint8 array, and returns it. Levels are resampled if their
+        resolution differs from the image.
+        """
+        height, width = rgb.shape[:2]
+        levels = resize_levels(np.asarray(levels, dtype=np.uint8), (height, width))
+        premultiplied, inverse_alpha = self._table(colormap)
+        keep, color, work = self._working_buffers((height, width))
+
+        np.take(inverse_alpha, levels, out=keep)
+        np.take(premultiplied, levels, axis=0, out=color)
+        np.multiply(rgb, keep[..., None], out=work)
+        work += color
+        work >>= 8
+
+        if out is None:
+            out = np.empty((height, width, 3), dtype=np.uint8)
+        np.copyto(out, work, casting="unsafe")
+        return out
+
+    def render_rgba(self, levels, colormap="heat"):
+        """Transparent RGBA layer (e.g. a map tile) straight from the colormap table"""
+        return _lookup(colormap)[np.asarray(levels, dtype=np.uint8)]
+
+
+_default_renderer = OverlayRenderer()
+
+
+def render_probability_overlay(rgb, levels, colormap="red", out=None):
+    """Module-level convenience wrapper around a shared OverlayRenderer"""
+    return _default_renderer.render(rgb, levels, colormap, out)
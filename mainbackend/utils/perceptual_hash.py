@@ -0,0 +1,166 @@
+from itertools import combinations
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+DCT_SIZE = 32
+LOW_FREQUENCIES = 8
+
+# Above this many bit flips per 16-bit chunk, probing neighbours costs more than a linear scan
+MAX_PROBE_RADIUS = 1
+
+# Orthonormal DCT-II basis; the 2-D transform is basis @ image @ basis.T
+_k = np.arange(DCT_SIZE)
+DCT_BASIS = np.cos(np.pi * (2 * _k[None, :] + 1) * _k[:, None] / (2 * DCT_SIZE)) * np.sqrt(2.0 / DCT_SIZE)
+DCT_BASIS[0] /= np.sqrt(2.0)
+
+
+def dct_hash(gray):
+    """64-bit perceptual hash (pHash) of a grayscale image as a Python int.
+
+    The image is shrunk to 32x32, transformed with a 2-D DCT, and each of the
+    8x8 lowest frequencies becomes one bit: set if above their median. It
+    survives re-encoding, resizing, small crops and brightness changes, which
+    an exact byte hash does not.
+    """
+    small = Image.fromarray(np.asarray(gray, dtype=np.uint8)).resize((DCT_SIZE, DCT_SIZE), Image.BOX)
+    coefficients = DCT_BASIS @ np.asarray(small, dtype=np.float64) @ DCT_BASIS.T
+    low = coefficients[:LOW_FREQUENCIES, :LOW_FREQUENCIES].ravel()
+    bits = low > np.median(low[1:])  # the DC term only says how bright the image is
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount(values):
+        return np.bitwise_count(values)
+else:
+    _BYTE_BITS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(values):
+        values = np.ascontiguousarray(values, dtype=np.uint64)
+        return _BYTE_BITS[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+def hamming(a, b):
+    """Bit differences between 64-bit hashes (ints or uint64 arrays, broadcast)"""
+    return popcount(np.bitwise_xor(np.asarray(a, dtype=np.uint64), np.asarray(b, dtype=np.uint64)))
+
+
+class MultiIndexHash:
+    """Near-duplicate lookup over 64-bit hashes by multi-index hashing.
+
+    Each hash is split into ``bands`` chunks and each chunk indexes its own
+    table. Two hashes within distance r must differ by at most r // bands
+    bits in at least one chunk, so a query probes each table with its chunk
+    and that chunk's near neighbours, and only verifies those candidates
+    instead of scanning everything. With 4 bands this covers r <= 7; wider
+    queries fall back to a vectorised linear scan. Both are exact.
+    """
+
+    def __init__(self, bands=4):
+        if HASH_BITS % bands:
+            raise ValueError(f"bands must divide {HASH_BITS}")
+        self.bands = bands
+        self.band_bits = HASH_BITS // bands
+        self._tables = [{} for _ in range(bands)]  # chunk value -> set of slots
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._live = np.zeros(1024, dtype=bool)
+        self._keys = []  # slot -> key, None once removed
+        self._slots = {}  # key -> slot
+        self._free = []
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def _chunks(self, value):
+        mask = (1 << self.band_bits) - 1
+        return [(value >> (i * self.band_bits)) & mask for i in range(self.bands)]
+
+    def add(self, key, value):
+        """Index hash value under key, replacing any previous hash for that key"""
+        if key in self._slots:
+            self.remove(key)
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+        else:
+            slot = len(self._keys)
+            self._keys.append(key)
+            if slot >= len(self._hashes):
+                self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+                self._live = np.concatenate([self._live, np.zeros_like(self._live)])
+        self._hashes[slot] = value
+        self._live[slot] = True
+        self._slots[key] = slot
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            table.setdefault(chunk, set()).add(slot)
+
+    def remove(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        for table, chunk in zip(self._tables, self._chunks(int(self._hashes[slot]))):
+            slots = table[chunk]
+            slots.discard(slot)
+            if not slots:
+                del table[chunk]
+        self._keys[slot] = None
+        self._live[slot] = False
+        self._free.append(slot)
+
+    def query(self, value, max_distance):
+        """[(distance, key)] of indexed hashes within max_distance bits, nearest first"""
+        radius = max_distance // self.bands
+        if radius <= MAX_PROBE_RADIUS:
+            flips = [sum(1 << b for b in bits) for r in range(radius + 1)
+                     for bits in combinations(range(self.band_bits), r)]
+            candidates = set()
+            for table, chunk in zip(self._tables, self._chunks(value)):
+                for flip in flips:
+                    slots = table.get(chunk ^ flip)
+                    if slots:
+                        candidates.update(slots)
+            slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            distances = hamming(self._hashes[slots], value)
+            close = distances <= max_distance
+            distances, slots = distances[close], slots[close]
+        else:
+            distances = hamming(self._hashes, value)
+            slots = np.flatnonzero((distances <= max_distance) & self._live)
+            distances = distances[slots]
+        order = np.argsort(distances, kind="stable")
+        return [(int(distances[i]), self._keys[slots[i]]) for i in order]
+
+    def nearest(self, value, max_distance):
+        """(distance, key) of the closest indexed hash within max_distance, or None"""
+        matches = self.query(value, max_distance)
+        return matches[0] if matches else None
+
+
+def group_near_duplicates(hashes, max_distance):
+    """Group keys whose hashes chain together within max_distance; hashes maps key -> hash.
+
+    Returns a list of groups (lists of keys, in input order), singletons included.
+    """
+    keys = list(hashes)
+    parent = {key: key for key in keys}
+
+    def root(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    index = MultiIndexHash()
+    for key in keys:
+        for _, other in index.query(hashes[key], max_distance):
+            parent[root(other)] = root(key)
+        index.add(key, hashes[key])
+    groups = {}
+    for key in keys:
+        groups.setdefault(root(key), []).append(key)
+    return list(groups.values())
@@ -1,26 +1,51 @@
+import json
 import torch
 from PIL import Image
 import numpy as np
-import torchvision.transforms as T
 from model.unet import UNet
+from utils.image_decode import as_decoded
+from utils.weight_store import load_flat_weights, read_flat_metadata
+
+def save_checkpoint(model, path):
+    # Plain state dict for the default architecture (what older loaders expect),
+    # otherwise the UNet config is stored alongside so load_model can rebuild it
+    if model.config == UNet().config:
+        torch.save(model.state_dict(), path)
+    else:
+        torch.save({"config": model.config, "state_dict": model.state_dict()}, path)
 
 def load_model(model_path):
-    model = UNet()
-    model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
+    if model_path.endswith(".safetensors"):
+        config = json.loads(read_flat_metadata(model_path).get("unet_config", "{}"))
+        model = UNet(**config)
+        # Point parameters straight at the shared, copy-on-write mapping
+        model.load_state_dict(load_flat_weights(model_path), assign=True)
+    else:
+        checkpoint = torch.load(model_path, map_location=torch.device('cpu'))
+        if "state_dict" in checkpoint:
+            model = UNet(**checkpoint.get("config", {}))
+            checkpoint = checkpoint["state_dict"]
+        else:
+            model = UNet()
+        model.load_state_dict(checkpoint)
     model.eval()
     return model
 
-def predict_mask(model, image_path):
-    transform = T.Compose([
-        T.Grayscale(),
-        T.Resize((256, 256)),
-        T.ToTensor()
-    ])
-    img = Image.open(image_path)
-    img_tensor = transform(img).unsqueeze(0)  # shape: [1, 1, 256, 256]
+def predict_probabilities(model, image, engine=None):
+    # image: path, bytes, file object or an already decoded DecodedImage
+    gray = as_decoded(image).gray_array
+    if engine is not None:
+        # Memory-bounded path with reused input buffers (see inference_engine)
+        probabilities, _ = engine.predict(model, gray)
+        return probabilities[0]
+    img_tensor = torch.from_numpy(gray.astype(np.float32)).div_(255).unsqueeze(0).unsqueeze(0)  # shape: [1, 1, 256, 256]
 
     with torch.no_grad():
         pred = model(img_tensor)
 
-    pred_mask = (pred.squeeze().numpy() > 0.5).astype(np.uint8) * 255
+    return pred.squeeze().numpy()
+
+def predict_mask(model, image, threshold=0.5, engine=None):
+    probabilities = predict_probabilities(model, image, engine)
+    pred_mask = (probabilities > threshold).astype(np.uint8) * 255
     return Image.fromarray(pred_mask.astype(np.uint8))
\ No newline at end of file
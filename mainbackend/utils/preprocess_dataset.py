@@ -1,13 +1,14 @@
 import os
-from PIL import Image
 import numpy as np
+from image_decode import DecodedImage
+from mask_archive import save_mask_archive
 
 RAW_DIR = "data/raw"
 IMG_OUT = "data/images"
-MASK_OUT = "data/masks"
+# Masks go into one bit-packed archive: exact 0/255 edges, no JPEG decode when training
+MASK_OUT = "data/masks.bin"
 
 os.makedirs(IMG_OUT, exist_ok=True)
-os.makedirs(MASK_OUT, exist_ok=True)
 
 # Threshold below which we consider 'deep convection' cloud cluster
 CLOUD_THRESHOLD = 100
@@ -15,16 +16,18 @@ CLOUD_THRESHOLD = 100
 def create_mask(arr, threshold=CLOUD_THRESHOLD):
     return (arr < threshold).astype(np.uint8) * 255
 
-for fname in os.listdir(RAW_DIR):
+masks = {}
+for fname in sorted(os.listdir(RAW_DIR)):
     if not fname.endswith(".jpg"): continue
 
     img_path = os.path.join(RAW_DIR, fname)
-    im = Image.open(img_path).convert("L")
-    im = im.resize((256, 256))
+    # Reduced-size JPEG decode straight to 256x256 grayscale
+    im = DecodedImage(img_path).gray
     im.save(os.path.join(IMG_OUT, fname))
 
     arr = np.array(im)
-    mask = create_mask(arr)
-    Image.fromarray(mask).save(os.path.join(MASK_OUT, fname))
+    masks[fname] = create_mask(arr)
+
+save_mask_archive(masks, MASK_OUT)
 
 print("✅ Preprocessing complete. Images + masks ready.")
@@ -0,0 +1,72 @@
+import io
+import struct
+
+import numpy as np
+from PIL import Image
+
+# RLE layout: [uint16 height][uint16 width][uint32 run count]
+#             [run values, uint8 each][run lengths, uint16 each]
+RLE_HEADER = struct.Struct("<HHI")
+MAX_RUN = np.iinfo(np.uint16).max
+
+
+def quantize_probabilities(probabilities):
+    """Map sigmoid probabilities in [0, 1] to uint8 levels 0-255"""
+    return np.round(np.clip(probabilities, 0.0, 1.0) * 255).astype(np.uint8)
+
+
+def threshold_probabilities(quantized, threshold=0.5):
+    """Binary 0/255 mask from a quantized probability map"""
+    return (quantized > threshold * 255).astype(np.uint8) * 255
+
+
+def encode_probability_png(quantized):
+    buffer = io.BytesIO()
+    Image.fromarray(quantized, mode="L").save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def check_map_size(height, width, max_pixels=None):
+    # Raises before any pixel is decoded, so a small payload can't claim a huge map
+    if height <= 0 or width <= 0:
+        raise ValueError(f"Probability map has an empty shape {height}x{width}")
+    if max_pixels is not None and height * width > max_pixels:
+        raise ValueError(f"Probability map of {height}x{width} pixels exceeds the limit of {max_pixels}")
+
+
+def decode_probability_png(data, max_pixels=None):
+    image = Image.open(io.BytesIO(data))
+    check_map_size(image.height, image.width, max_pixels)
+    return np.array(image.convert("L"))
+
+
+def encode_probability_rle(quantized):
+    flat = quantized.ravel()
+    # Run boundaries: wherever the value changes, plus a forced split every MAX_RUN pixels
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    starts = np.union1d(np.concatenate(([0], change)), np.arange(0, flat.size, MAX_RUN))
+    lengths = np.diff(np.append(starts, flat.size)).astype("<u2")
+    values = flat[starts]
+    height, width = quantized.shape
+    return RLE_HEADER.pack(height, width, len(starts)) + values.tobytes() + lengths.tobytes()
+
+
+def decode_probability_rle(data, max_pixels=None):
+    if len(data) < RLE_HEADER.size:
+        raise ValueError("Probability map is shorter than its header")
+    height, width, runs = RLE_HEADER.unpack_from(data)
+    check_map_size(height, width, max_pixels)
+    offset = RLE_HEADER.size
+    if len(data) != offset + runs * 3:
+        raise ValueError(f"Probability map has {len(data)} bytes, expected {offset + runs * 3} for {runs} runs")
+    values = np.frombuffer(data, dtype=np.uint8, count=runs, offset=offset)
+    lengths = np.frombuffer(data, dtype="<u2", count=runs, offset=offset + runs)
+    # Checked before expanding: the runs must cover the map exactly
+    total = int(lengths.sum(dtype=np.int64))
+    if total != height * width:
+        raise ValueError(f"Probability map runs cover {total} pixels, expected {height * width}")
+    return np.repeat(values, lengths).reshape(height, width)
+
+
+ENCODERS = {"png": encode_probability_png, "rle": encode_probability_rle}
+DECODERS = {"png": decode_probability_png, "rle": decode_probability_rle}
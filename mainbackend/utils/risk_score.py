@@ -1,19 +1,27 @@
 import numpy as np
-from PIL import Image
+from utils.image_decode import as_mask_array
 
-def calculate_risk(mask_path):
-    mask = Image.open(mask_path).convert("L").resize((256, 256))
-    mask_array = np.array(mask)
+RISK_LEVELS = ("LOW", "MODERATE", "HIGH")
+# Coverage (%) a mask must exceed to reach MODERATE and HIGH
+RISK_COVERAGE_BOUNDS = (5, 15)
 
+def calculate_risk(mask_path, archive=None):
+    # mask_path may also be a PIL image or an already loaded uint8 array,
+    # or a mask name in a MaskArchive, whose coverage is read without unpacking
+    if archive is not None:
+        return calculate_risk_from_coverage(archive.coverage(mask_path))
+    return calculate_risk_from_array(as_mask_array(mask_path))
+
+def calculate_risk_from_array(mask_array):
     total = mask_array.size
     cloudy = (mask_array > 128).sum()
     coverage = (cloudy / total) * 100
+    return calculate_risk_from_coverage(coverage)
 
-    if coverage > 15:
-        level = "HIGH"
-    elif coverage > 5:
-        level = "MODERATE"
-    else:
-        level = "LOW"
+def calculate_risk_from_coverage(coverage):
+    level = RISK_LEVELS[risk_level_index(coverage)]
+    return level, round(coverage, 2)
 
-    return level, round(coverage, 2)
\ No newline at end of file
+def risk_level_index(coverage):
+    # Index into RISK_LEVELS for a coverage percentage or an array of them
+    return np.searchsorted(RISK_COVERAGE_BOUNDS, coverage, side="left")
\ No newline at end of file
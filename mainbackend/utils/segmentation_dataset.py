@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+from utils.image_decode import MODEL_INPUT_SIZE, DecodedImage, as_mask_array
+from utils.mask_archive import MaskArchive
+from utils.perceptual_hash import dct_hash, group_near_duplicates
+
+# Hash distance (of 64 bits) under which two dataset images count as the same scene
+DUPLICATE_DISTANCE = 8
+
+
+class SatelliteDataset(Dataset):
+    """IR images and their cloud-cluster masks, matched by file name.
+
+    mask_dir is a mask archive (utils/mask_archive.py) or a directory of
+    mask images. Images without a mask are skipped. Samples are (1 x H x W)
+    float tensors in 0-1, decoded with the same reduced-size decode the
+    backend uses.
+    """
+
+    def __init__(self, img_dir, mask_dir, size=MODEL_INPUT_SIZE, filenames=None):
+        self.img_dir = img_dir
+        self.mask_dir = mask_dir
+        self.size = tuple(size)
+        self.archive = MaskArchive(mask_dir) if os.path.isfile(mask_dir) else None
+        self.filenames = sorted(name for name in (os.listdir(img_dir) if filenames is None else filenames)
+                                if self.has_mask(name))
+
+    def has_mask(self, name):
+        if self.archive is not None:
+            return name in self.archive
+        return os.path.exists(os.path.join(self.mask_dir, name))
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def __getitem__(self, idx):
+        name = self.filenames[idx]
+        image = DecodedImage(os.path.join(self.img_dir, name), self.size).gray_array
+        image = torch.from_numpy(image.astype(np.float32)).div_(255).unsqueeze(0)
+        if self.archive is None:
+            mask = as_mask_array(os.path.join(self.mask_dir, name), self.size) > 127
+        elif self.archive.shape(name) == self.size[::-1]:
+            mask = self.archive.bits(name)  # already binary at the model size: no decode, no resize
+        else:
+            mask = as_mask_array(Image.fromarray(self.archive[name]), self.size) > 127
+        return image, torch.from_numpy(mask.astype(np.float32)).unsqueeze(0)
+
+
+def near_duplicate_split(img_dir, filenames, holdout=0.0, max_distance=DUPLICATE_DISTANCE, dedup=True, seed=0):
+    """(train, evaluation) file names, with near-duplicate images never on both sides.
+
+    Images are grouped by perceptual hash (re-encoded, resized or slightly
+    cropped copies land in one group), whole groups are assigned to a side,
+    and with dedup only the first image of each group is kept.
+    """
+    hashes = {name: dct_hash(DecodedImage(os.path.join(img_dir, name)).gray_array) for name in sorted(filenames)}
+    groups = group_near_duplicates(hashes, max_distance)
+    if dedup:
+        groups = [group[:1] for group in groups]
+    order = np.random.default_rng(seed).permutation(len(groups))
+    held_out = set(order[:int(round(len(groups) * holdout))].tolist())
+    train = sorted(name for i, group in enumerate(groups) if i not in held_out for name in group)
+    evaluation = sorted(name for i, group in enumerate(groups) if i in held_out for name in group)
+    return train, evaluation
@@ -0,0 +1,94 @@
+import numpy as np
+
+from utils.risk_score import RISK_LEVELS, risk_level_index
+
+LEVELS = 256
+
+
+def threshold_cutoffs(thresholds):
+    """First quantized level counted as positive for each threshold.
+
+    Matches threshold_probabilities: a pixel is positive when q > t * 255.
+    """
+    return np.floor(np.asarray(thresholds, dtype=np.float64) * (LEVELS - 1)).astype(np.int64) + 1
+
+
+def tail_counts(histograms, cutoffs):
+    """Pixels at or above each cutoff, from level histograms (... x 256) -> (... x T)"""
+    tails = np.zeros(histograms.shape[:-1] + (LEVELS + 1,), dtype=np.int64)
+    tails[..., :LEVELS] = np.cumsum(histograms[..., ::-1], axis=-1)[..., ::-1]
+    return tails[..., cutoffs]
+
+
+class ThresholdMetrics:
+    """Segmentation and risk metrics for many thresholds from one streaming pass.
+
+    Every batch only adds to 256-bin histograms of quantized probabilities:
+    one each for foreground and background pixels over the whole set, and
+    one per image for its risk level. Metrics for any threshold are then
+    derived from cumulative sums, so the cost does not grow with the number
+    of thresholds, and memory does not grow with the size of the set.
+    """
+
+    def __init__(self, thresholds):
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.cutoffs = threshold_cutoffs(self.thresholds)
+        self.positive = np.zeros(LEVELS, dtype=np.int64)
+        self.negative = np.zeros(LEVELS, dtype=np.int64)
+        # confusion[t, true_level, predicted_level]
+        self.confusion = np.zeros((len(self.thresholds), len(RISK_LEVELS), len(RISK_LEVELS)), dtype=np.int64)
+        self.images = 0
+
+    def update(self, quantized, truth):
+        """Add a batch: quantized probabilities (N x H x W uint8) and boolean ground truth"""
+        quantized = np.asarray(quantized, dtype=np.uint8).reshape(len(quantized), -1)
+        truth = np.asarray(truth, dtype=bool).reshape(len(quantized), -1)
+        count, pixels = quantized.shape
+
+        self.positive += np.bincount(quantized[truth], minlength=LEVELS)
+        self.negative += np.bincount(quantized[~truth], minlength=LEVELS)
+
+        # Per-image histograms in one bincount by offsetting each image's levels
+        offsets = (np.arange(count) * LEVELS)[:, None]
+        per_image = np.bincount((quantized + offsets).ravel(), minlength=count * LEVELS).reshape(count, LEVELS)
+        predicted_coverage = tail_counts(per_image, self.cutoffs) / pixels * 100  # N x T
+        predicted_level = risk_level_index(predicted_coverage)
+        true_level = risk_level_index(truth.sum(axis=1) / pixels * 100)
+
+        threshold_index = np.broadcast_to(np.arange(len(self.thresholds)), predicted_level.shape)
+        np.add.at(self.confusion, (threshold_index, np.broadcast_to(true_level[:, None], predicted_level.shape),
+                                   predicted_level), 1)
+        self.images += count
+
+    def summary(self):
+        """Per-threshold IoU, Dice, precision, recall and risk accuracy"""
+        tp = tail_counts(self.positive, self.cutoffs).astype(np.float64)
+        fp = tail_counts(self.negative, self.cutoffs).astype(np.float64)
+        fn = self.positive.sum() - tp
+        with np.errstate(divide="ignore", invalid="ignore"):
+            iou = np.where(tp + fp + fn > 0, tp / (tp + fp + fn), 1.0)
+            dice = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 1.0)
+            precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+            recall = np.where(tp + fn > 0, tp / (tp + fn), 1.0)
+        risk_accuracy = np.trace(self.confusion, axis1=1, axis2=2) / max(1, self.images)
+
+        return [{
+            "threshold": round(float(t), 4),
+            "iou": round(float(iou[i]), 4),
+            "dice": round(float(dice[i]), 4),
+            "precision": round(float(precision[i]), 4),
+            "recall": round(float(recall[i]), 4),
+            "risk_accuracy": round(float(risk_accuracy[i]), 4),
+        } for i, t in enumerate(self.thresholds)]
+
+    def best(self, metric="iou"):
+        return max(self.summary(), key=lambda row: row[metric])
+
+    def confusion_matrix(self, threshold):
+        """Risk-level confusion matrix (rows true, columns predicted) at the closest threshold"""
+        index = int(np.argmin(np.abs(self.thresholds - threshold)))
+        return {
+            "threshold": float(self.thresholds[index]),
+            "levels": list(RISK_LEVELS),
+            "matrix": self.confusion[index].tolist(),
+        }
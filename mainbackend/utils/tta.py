@@ -0,0 +1,56 @@
+import numpy as np
+
+# Dihedral transforms of a (.., H, W) array as (forward, inverse) pairs.
+# The first four (flips) work for any shape; the rest need square images.
+TRANSFORMS = [
+    ("identity", lambda a: a, lambda a: a),
+    ("flip_lr", lambda a: a[..., ::-1], lambda a: a[..., ::-1]),
+    ("flip_ud", lambda a: a[..., ::-1, :], lambda a: a[..., ::-1, :]),
+    ("rot180", lambda a: a[..., ::-1, ::-1], lambda a: a[..., ::-1, ::-1]),
+    ("rot90", lambda a: np.rot90(a, 1, axes=(-2, -1)), lambda a: np.rot90(a, -1, axes=(-2, -1))),
+    ("rot270", lambda a: np.rot90(a, -1, axes=(-2, -1)), lambda a: np.rot90(a, 1, axes=(-2, -1))),
+    ("transpose", lambda a: np.swapaxes(a, -2, -1), lambda a: np.swapaxes(a, -2, -1)),
+    ("anti_transpose", lambda a: np.rot90(a, 2, axes=(-2, -1)).swapaxes(-2, -1),
+     lambda a: np.rot90(a.swapaxes(-2, -1), -2, axes=(-2, -1))),
+]
+
+TTA_SIZES = (4, 8)
+
+
+def tta_transforms(count, shape):
+    if count not in TTA_SIZES:
+        raise ValueError(f"TTA uses {TTA_SIZES[0]} or {TTA_SIZES[1]} transforms, not {count}")
+    if count > 4 and shape[0] != shape[1]:
+        raise ValueError("Rotated TTA variants need a square image")
+    return TRANSFORMS[:count]
+
+
+def augment(gray, count=4):
+    """Stack the transformed copies of one H x W image into a K x H x W batch"""
+    return np.stack([forward(gray) for _, forward, _ in tta_transforms(count, gray.shape)])
+
+
+def align(probabilities):
+    """Undo each transform on a K x H x W batch of predictions"""
+    transforms = tta_transforms(len(probabilities), probabilities.shape[1:])
+    return np.stack([inverse(p) for p, (_, _, inverse) in zip(probabilities, transforms)])
+
+
+def predict_probabilities_tta(model, gray, engine, count=4, threshold=0.5):
+    """One batched forward pass over all variants, averaged back into a single map.
+
+    Returns (probabilities, report): the engine's report plus how much the
+    variants disagree - the share of pixels where some but not all variants
+    cross the threshold (mostly cluster edges), and the mean spread.
+    """
+    batch = augment(np.asarray(gray, dtype=np.uint8), count)
+    # align() copies, so the engine's reused output buffer can be handed over
+    aligned, report = engine.predict(model, batch, consume=align)
+    above = aligned > threshold
+    disagreement = above.any(axis=0) & ~above.all(axis=0)
+    report["tta"] = {
+        "variants": count,
+        "disagreement_percent": round(float(disagreement.mean()) * 100, 2),
+        "mean_spread": round(float((aligned.max(axis=0) - aligned.min(axis=0)).mean()), 4),
+    }
+    return aligned.mean(axis=0), report
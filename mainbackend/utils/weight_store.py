@@ -0,0 +1,123 @@
+import json
+import mmap
+import os
+import struct
+
+import torch
+
+# Flat weight file in the safetensors layout:
+#   [8-byte little-endian header length][JSON header][raw tensor bytes]
+# The header maps each tensor name to its dtype, shape and byte range, so a
+# worker can map the whole file and point tensors straight at the pages
+# instead of unpickling a private copy the way torch.load does.
+HEADER_LENGTH_BYTES = 8
+ALIGNMENT = 64
+
+DTYPE_CODES = {
+    torch.float32: "F32",
+    torch.float16: "F16",
+    torch.bfloat16: "BF16",
+    torch.float64: "F64",
+    torch.int64: "I64",
+    torch.int32: "I32",
+    torch.uint8: "U8",
+    torch.bool: "BOOL",
+}
+CODE_DTYPES = {code: dtype for dtype, code in DTYPE_CODES.items()}
+
+
+def save_flat_weights(state_dict, path, metadata=None):
+    """Write a state dict as one flat, mmap-friendly weight file"""
+    header = {}
+    offset = 0
+    tensors = []
+    for name, tensor in state_dict.items():
+        tensor = tensor.detach().cpu().contiguous()
+        if tensor.dtype not in DTYPE_CODES:
+            raise ValueError(f"Unsupported dtype {tensor.dtype} for '{name}'")
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {
+            "dtype": DTYPE_CODES[tensor.dtype],
+            "shape": list(tensor.shape),
+            "data_offsets": [offset, offset + nbytes],
+        }
+        tensors.append(tensor)
+        # Keep every tensor aligned so it can be viewed in place
+        offset += nbytes + (-nbytes % ALIGNMENT)
+    if metadata:
+        header["__metadata__"] = {k: str(v) for k, v in metadata.items()}
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-(len(header_bytes) + HEADER_LENGTH_BYTES) % ALIGNMENT)
+
+    # Write to a temp file and rename so concurrent workers never map a partial file
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        position = 0
+        for name, tensor in zip(header, tensors):
+            begin = header[name]["data_offsets"][0]
+            f.write(b"\0" * (begin - position))
+            data = tensor.view(torch.uint8) if tensor.dtype != torch.bool else tensor.to(torch.uint8)
+            f.write(data.numpy().tobytes())
+            position = begin + tensor.numel() * tensor.element_size()
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_flat_weights(path):
+    """Map a flat weight file and return a state dict of tensors backed by the mapping.
+
+    The file is mapped copy-on-write, so every process that maps it shares the
+    same physical pages until (if ever) a tensor is written to.
+    """
+    with open(path, "rb") as f:
+        (header_length,) = struct.unpack("<Q", f.read(HEADER_LENGTH_BYTES))
+        header = json.loads(f.read(header_length))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_start = HEADER_LENGTH_BYTES + header_length
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = CODE_DTYPES[info["dtype"]]
+        begin, end = info["data_offsets"]
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        if count == 0:
+            state_dict[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin)
+        state_dict[name] = tensor.reshape(info["shape"])
+    return state_dict
+
+
+def read_flat_metadata(path):
+    """The string metadata stored in a flat weight file's header"""
+    with open(path, "rb") as f:
+        (header_length,) = struct.unpack("<Q", f.read(HEADER_LENGTH_BYTES))
+        return json.loads(f.read(header_length)).get("__metadata__", {})
+
+
+def convert_checkpoint(pt_path, flat_path=None):
+    """Convert a torch.save'd state dict into a flat weight file next to it"""
+    flat_path = flat_path or os.path.splitext(pt_path)[0] + ".safetensors"
+    state_dict = torch.load(pt_path, map_location=torch.device("cpu"))
+    metadata = {"source": os.path.basename(pt_path)}
+    if "state_dict" in state_dict:
+        # Variant checkpoint: keep its architecture next to the weights
+        metadata["unet_config"] = json.dumps(state_dict.get("config", {}))
+        state_dict = state_dict["state_dict"]
+    return save_flat_weights(state_dict, flat_path, metadata=metadata)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a .pt checkpoint into a flat, mmap-able weight file")
+    parser.add_argument("checkpoint", help="Path to the torch.save'd state dict (e.g. model/unet_insat.pt)")
+    parser.add_argument("--output", help="Output path (defaults to <checkpoint>.safetensors)")
+    args = parser.parse_args()
+
+    print(f"✅ Flat weights written to {convert_checkpoint(args.checkpoint, args.output)}")